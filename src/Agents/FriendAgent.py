@@ -1,9 +1,19 @@
 from __future__ import annotations
 
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 from typing import Any
+from uuid import UUID
+
+from langchain.agents.middleware import ModelRequest, dynamic_prompt
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
 
 from Agents.InitializeAgent import build_agent
-from Utils.AgentUtils import extract_response_text
+from Utils.AgentUtils import extract_message_text, extract_response_text
+from Utils.Metrics import Metrics, get_metrics
+from Utils.PromptCacheStats import PromptCacheStats, usage_from_message
 
 FRIEND_SYSTEM_PROMPT = (
     "You are a warm, affectionate romantic partner (boyfriend/girlfriend vibe) who offers emotional support and understanding. "
@@ -14,23 +24,136 @@ FRIEND_SYSTEM_PROMPT = (
 )
 
 
+@dataclass(frozen=True)
+class FriendAgentContext:
+    system_prompt: str = FRIEND_SYSTEM_PROMPT
+
+
+@dynamic_prompt
+def personalized_system_prompt(request: ModelRequest) -> str:
+    context = request.runtime.context
+    if isinstance(context, FriendAgentContext) and context.system_prompt:
+        return context.system_prompt
+    return FRIEND_SYSTEM_PROMPT
+
+
+class _LlmTimingHandler(BaseCallbackHandler):
+    # Timed inline on the calling thread so async runs are not skewed by the
+    # executor hop LangChain uses for sync handlers.
+    run_inline = True
+
+    def __init__(self, metrics: Metrics) -> None:
+        self._metrics = metrics
+        self._started: dict[UUID, float] = {}
+        self._awaiting_first_token: set[UUID] = set()
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._started[run_id] = time.perf_counter()
+        self._awaiting_first_token.add(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id in self._awaiting_first_token and token:
+            self._awaiting_first_token.discard(run_id)
+            self._metrics.observe(
+                "llm_first_token", time.perf_counter() - self._started[run_id]
+            )
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "ok")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "error")
+
+    def _finish(self, run_id: UUID, outcome: str) -> None:
+        self._awaiting_first_token.discard(run_id)
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self._metrics.observe(
+                "llm_call", time.perf_counter() - started, outcome=outcome
+            )
+
+
 class FriendAgent:
     def __init__(self) -> None:
         self._base_system_prompt = FRIEND_SYSTEM_PROMPT
-        self._agent = build_agent(system_prompt=self._base_system_prompt)
+        # One compiled graph and chat model serve every user; the personalized
+        # system prompt is supplied per invocation through the runtime context.
+        self._agent = build_agent(
+            middleware=[personalized_system_prompt],
+            context_schema=FriendAgentContext,
+        )
+        self._prompt_cache_stats = PromptCacheStats()
+        self._metrics = get_metrics()
+        self._run_config: RunnableConfig | None = (
+            {"callbacks": [_LlmTimingHandler(self._metrics)]}
+            if isinstance(self._metrics, Metrics)
+            else None
+        )
 
     @property
     def base_system_prompt(self) -> str:
         return self._base_system_prompt
 
+    def prompt_cache_stats(self) -> dict[str, Any]:
+        return self._prompt_cache_stats.stats()
+
     def invoke(self, payload: dict[str, Any], *, system_prompt: str | None = None) -> str:
-        resolved_prompt = system_prompt or self._base_system_prompt
-        if resolved_prompt == self._base_system_prompt:
-            result = self._agent.invoke(payload)
-        else:
-            result = build_agent(system_prompt=resolved_prompt).invoke(payload)
+        with self._metrics.span("agent", mode="invoke"):
+            result = self._agent.invoke(
+                payload,
+                config=self._run_config,
+                context=self._build_context(system_prompt),
+            )
+        self._record_usage(result)
         return extract_response_text(result)
 
+    async def ainvoke(
+        self, payload: dict[str, Any], *, system_prompt: str | None = None
+    ) -> str:
+        with self._metrics.span("agent", mode="ainvoke"):
+            result = await self._agent.ainvoke(
+                payload,
+                config=self._run_config,
+                context=self._build_context(system_prompt),
+            )
+        self._record_usage(result)
+        return extract_response_text(result)
+
+    async def astream_text(
+        self, payload: dict[str, Any], *, system_prompt: str | None = None
+    ) -> AsyncIterator[str]:
+        usage: dict[str, int] | None = None
+        async for chunk, metadata in self._agent.astream(
+            payload,
+            config=self._run_config,
+            context=self._build_context(system_prompt),
+            stream_mode="messages",
+        ):
+            if metadata.get("langgraph_node") != "model":
+                continue
+            # Usage normally arrives on the final chunk only.
+            chunk_usage = usage_from_message(chunk)
+            if chunk_usage is not None:
+                usage = {
+                    key: value + (usage or {}).get(key, 0)
+                    for key, value in chunk_usage.items()
+                }
+            text = extract_message_text(chunk)
+            if isinstance(text, str) and text:
+                yield text
+        self._prompt_cache_stats.record(usage)
+
+    def _record_usage(self, result: Any) -> None:
+        messages = result.get("messages", []) if isinstance(result, dict) else []
+        self._prompt_cache_stats.record(
+            usage_from_message(messages[-1]) if messages else None
+        )
+
+    def _build_context(self, system_prompt: str | None) -> FriendAgentContext:
+        return FriendAgentContext(system_prompt=system_prompt or self._base_system_prompt)
+
 
 def build_friend_agent() -> FriendAgent:
     return FriendAgent()
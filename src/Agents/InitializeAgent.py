@@ -12,7 +12,16 @@ def build_agent(
     tools: Iterable | None = None,
     *,
     system_prompt: str | SystemMessage | None = None,
+    middleware: Iterable | None = None,
+    context_schema: type | None = None,
 ):
     tool_list = list(tools) if tools is not None else []
+    middleware_list = list(middleware) if middleware is not None else []
     model = build_chat_model()
-    return create_agent(model, tools=tool_list, system_prompt=system_prompt)
+    return create_agent(
+        model,
+        tools=tool_list,
+        system_prompt=system_prompt,
+        middleware=middleware_list,
+        context_schema=context_schema,
+    )
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from langchain.agents import create_agent  # noqa: E402
+from langchain_core.language_models.fake_chat_models import (  # noqa: E402
+    FakeListChatModel,
+)
+from langchain_openai import ChatOpenAI  # noqa: E402
+
+from Agents.FriendAgent import (  # noqa: E402
+    FRIEND_SYSTEM_PROMPT,
+    FriendAgentContext,
+    personalized_system_prompt,
+)
+
+PAYLOAD = {"messages": [{"role": "user", "content": "I had a long day."}]}
+
+
+def _fake_model() -> FakeListChatModel:
+    return FakeListChatModel(responses=["I'm here with you. What happened today?"])
+
+
+def _personalized_prompt(call_index: int) -> str:
+    return f"{FRIEND_SYSTEM_PROMPT}\n\nPersonalization:\n- Summary: user {call_index}"
+
+
+def _rebuild_per_call(call_index: int) -> None:
+    # Mirrors the previous hot path: a fresh ChatOpenAI client (and HTTP pool)
+    # plus a freshly compiled graph for every personalized prompt. The fake
+    # model answers so no network access is needed.
+    ChatOpenAI(
+        model="benchmark",
+        api_key="benchmark",
+        base_url="http://127.0.0.1:9/v1",
+        use_responses_api=True,
+    )
+    agent = create_agent(
+        _fake_model(), tools=[], system_prompt=_personalized_prompt(call_index)
+    )
+    agent.invoke(PAYLOAD)
+
+
+def _build_shared_agent() -> Callable[[int], None]:
+    agent = create_agent(
+        _fake_model(),
+        tools=[],
+        middleware=[personalized_system_prompt],
+        context_schema=FriendAgentContext,
+    )
+
+    def invoke(call_index: int) -> None:
+        agent.invoke(
+            PAYLOAD,
+            context=FriendAgentContext(system_prompt=_personalized_prompt(call_index)),
+        )
+
+    return invoke
+
+
+def _measure(label: str, call: Callable[[int], None], iterations: int) -> None:
+    call(0)
+    durations_ms: list[float] = []
+    for index in range(iterations):
+        started = time.perf_counter()
+        call(index)
+        durations_ms.append((time.perf_counter() - started) * 1000)
+    durations_ms.sort()
+    p95 = durations_ms[min(len(durations_ms) - 1, int(len(durations_ms) * 0.95))]
+    print(
+        f"{label:<28} mean={statistics.fmean(durations_ms):8.3f} ms  "
+        f"p50={statistics.median(durations_ms):8.3f} ms  p95={p95:8.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-call FriendAgent overhead with an offline fake chat model."
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    _measure("rebuild agent per call", _rebuild_per_call, args.iterations)
+    _measure("shared agent + context", _build_shared_agent(), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from Personalization.DurableWrites import atomic_write_bytes  # noqa: E402
+from Personalization.Serializers import (  # noqa: E402
+    SUPPORTED_SERIALIZERS,
+    Serializer,
+)
+
+SAMPLE_TEXTS = (
+    "I had a long day at work and just want to talk for a bit.",
+    "今天工作很累，但是和朋友吃了一顿很好吃的晚饭。",
+    "Thanks, that really helps 😊🙏 I'll try it tomorrow!",
+    "週末は家族と一緒に海へ行く予定です。楽しみ！",
+    "Can you remind me what we said about my sister's birthday? 🎂",
+)
+
+
+def _synthetic_history(message_count: int, seed: int) -> dict[str, Any]:
+    rng = random.Random(seed)
+    messages = [
+        {
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": " ".join(rng.choices(SAMPLE_TEXTS, k=rng.randint(1, 4))),
+            "timestamp": f"2025-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}Z",
+            "tokens": rng.randint(8, 120),
+            "id": index + 1,
+        }
+        for index in range(message_count)
+    ]
+    return {
+        "version": 1,
+        "user_id": f"user-{seed}",
+        "next_message_id": message_count + 1,
+        "messages": messages,
+    }
+
+
+def _legacy_codec() -> tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    return (
+        lambda data: json.dumps(data, indent=2, ensure_ascii=True).encode("utf-8"),
+        lambda raw: json.loads(raw.decode("utf-8")),
+    )
+
+
+def _available_codecs() -> dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    codecs = {"legacy (indent=2, ascii)": _legacy_codec()}
+    for name in SUPPORTED_SERIALIZERS:
+        try:
+            serializer = Serializer(name)
+        except ValueError as error:
+            print(f"skipping {name}: {error}")
+            continue
+        if serializer.name != name:
+            print(f"skipping {name}: not installed")
+            continue
+        codecs[name] = (serializer.dumps, serializer.loads)
+    return codecs
+
+
+def _measure(
+    label: str,
+    dumps: Callable[[Any], bytes],
+    loads: Callable[[bytes], Any],
+    history: dict[str, Any],
+    path: Path,
+    iterations: int,
+) -> None:
+    save_ms: list[float] = []
+    load_ms: list[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        atomic_write_bytes(path, dumps(history))
+        save_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        loaded = loads(path.read_bytes())
+        load_ms.append((time.perf_counter() - started) * 1000)
+    if loaded != history:
+        raise RuntimeError(f"{label} did not round-trip the history")
+    print(
+        f"{label:<26} size={path.stat().st_size / 1024:9.1f} KiB  "
+        f"save p50={statistics.median(save_ms):8.2f} ms  "
+        f"load p50={statistics.median(load_ms):8.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="File size and load/save time of memory serializers."
+    )
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    history = _synthetic_history(args.messages, args.seed)
+    print(f"synthetic history: {args.messages} messages")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for label, (dumps, loads) in _available_codecs().items():
+            _measure(
+                label,
+                dumps,
+                loads,
+                history,
+                Path(temp_dir) / "history.bin",
+                args.iterations,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, TypeVar
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from Personalization.StorageBackends import SUPPORTED_STORAGE_MODES  # noqa: E402
+from Utils.CommonUtils import percentile  # noqa: E402
+
+DEFAULT_SCENARIOS = "1:0,1:50000,1000:200,100000:20"
+
+STAGES = (
+    "append_user_message",
+    "load_profile",
+    "build_system_prompt",
+    "recent_context",
+    "agent_invoke",
+    "append_assistant_message",
+    "profile_update",
+    "turn",
+)
+
+SAMPLE_TEXTS = (
+    "I had a long day at work and just want to talk for a bit.",
+    "My sister's birthday is next week and I still have no idea what to get her.",
+    "Thanks, that really helps. I'll try it tomorrow!",
+    "I couldn't sleep again last night, my mind kept racing.",
+    "We finally finished the hiking trip we planned for months.",
+    "Can you remind me what we said about the job interview?",
+)
+
+SEED_PROFILE = {
+    "summary": "Works long days and likes to talk in the evening.",
+    "preferences": ["hiking", "short replies"],
+    "dislikes": ["being rushed"],
+    "important_people": ["sister"],
+    "boundaries": [],
+}
+SUMMARY_REPLY = json.dumps(
+    {
+        "preferences": {"add": ["evening chats"]},
+        "notes": {"add": ["Has a job interview coming up."]},
+    },
+    separators=(", ", ": "),
+)
+
+T = TypeVar("T")
+
+
+def _parse_scenarios(raw_value: str) -> list[tuple[int, int]]:
+    scenarios = []
+    for item in raw_value.split(","):
+        users, _, history = item.strip().partition(":")
+        scenarios.append((max(1, int(users)), max(0, int(history or 0))))
+    return scenarios
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values, default=0.0),
+    }
+
+
+def _io_counters() -> dict[str, int] | None:
+    # Linux only: rchar/wchar count every read/write call, read_bytes and
+    # write_bytes only what reached the block device.
+    try:
+        raw = Path("/proc/self/io").read_text(encoding="ascii")
+    except OSError:
+        return None
+    counters = {}
+    for line in raw.splitlines():
+        key, _, value = line.partition(":")
+        counters[key.strip()] = int(value)
+    return counters
+
+
+def _io_delta(
+    before: dict[str, int] | None, after: dict[str, int] | None
+) -> dict[str, int] | None:
+    if before is None or after is None:
+        return None
+    return {
+        key: after[key] - before[key]
+        for key in ("rchar", "wchar", "read_bytes", "write_bytes")
+        if key in before and key in after
+    }
+
+
+def _peak_rss_kib() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _directory_bytes(path: Path) -> int:
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def _synthetic_messages(message_count: int, rng: random.Random) -> list[dict[str, Any]]:
+    return [
+        {
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": rng.choice(SAMPLE_TEXTS),
+            "timestamp": f"2025-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}Z",
+            "tokens": rng.randint(8, 40),
+            "id": index + 1,
+        }
+        for index in range(message_count)
+    ]
+
+
+def _seed_population(
+    memory_store: Any, users: int, history_messages: int, seed: int
+) -> None:
+    rng = random.Random(seed)
+    for index in range(users):
+        user_id = f"bench-{index}"
+        if history_messages:
+            memory_store.save_recent_context(
+                user_id,
+                {
+                    "user_id": user_id,
+                    "next_message_id": history_messages + 1,
+                    "messages": _synthetic_messages(history_messages, rng),
+                },
+            )
+        # Seeded history counts as already summarized, so profile updates in
+        # the measured turns only see the new messages.
+        memory_store.save_personalization_profile(
+            user_id,
+            {
+                **SEED_PROFILE,
+                "notes": [],
+                "last_summarized_message_id": history_messages,
+            },
+        )
+        if history_messages:
+            # Seeded history bypasses append_message, so it is indexed here.
+            memory_store.rebuild_retrieval_index(user_id)
+    memory_store.flush()
+
+
+def _timed(durations: dict[str, list[float]], stage: str, call: Callable[[], T]) -> T:
+    started = time.perf_counter()
+    result = call()
+    durations[stage].append((time.perf_counter() - started) * 1000)
+    return result
+
+
+def _run_scenario(
+    users: int, history_messages: int, args: dict[str, Any]
+) -> dict[str, Any]:
+    from Agents.FriendAgent import build_friend_agent
+    from LLM_Providers.ProviderFactory import close_chat_models
+    from LLM_Providers.StubProvider import build_stub_chat_model, load_stub_settings
+    from Personalization.MemoryStore import MemoryStore
+    from Personalization.PromptBuilder import build_personalized_system_prompt
+
+    # Set after the provider modules load .env, so a real provider configured
+    # there is never called.
+    os.environ.pop("LLM_ENDPOINTS", None)
+    os.environ.update(
+        {
+            "LLM_PROVIDER": "stub",
+            "STUB_LLM_LATENCY_MS": str(args["llm_latency_ms"]),
+            "STUB_LLM_TOKENS_PER_SECOND": str(args["llm_tokens_per_second"]),
+            "STUB_LLM_REPLY_TOKENS": str(args["llm_reply_tokens"]),
+        }
+    )
+    summary_model = build_stub_chat_model(load_stub_settings()).model_copy(
+        update={"reply_text": SUMMARY_REPLY}
+    )
+
+    with tempfile.TemporaryDirectory(dir=args["work_dir"]) as temp_dir:
+        memory_dir = Path(temp_dir)
+        memory_store = MemoryStore(memory_dir=memory_dir, storage_mode=args["backend"])
+        agent = build_friend_agent()
+        try:
+            io_before_seed = _io_counters()
+            seed_started = time.perf_counter()
+            _seed_population(memory_store, users, history_messages, args["seed"])
+            seed_seconds = time.perf_counter() - seed_started
+            io_after_seed = _io_counters()
+
+            rng = random.Random(args["seed"] + 1)
+            durations: dict[str, list[float]] = {stage: [] for stage in STAGES}
+            profile_updates = 0
+            total_turns = args["warmup_turns"] + args["turns"]
+            turns_started = 0.0
+            io_before_turns = None
+            for turn_index in range(total_turns):
+                if turn_index == args["warmup_turns"]:
+                    # Warmup turns load the agent graph and fill caches; only
+                    # the turns after them are reported.
+                    durations = {stage: [] for stage in STAGES}
+                    profile_updates = 0
+                    io_before_turns = _io_counters()
+                    turns_started = time.perf_counter()
+                user_id = f"bench-{rng.randrange(users)}"
+                text = rng.choice(SAMPLE_TEXTS)
+
+                turn_started = time.perf_counter()
+                _timed(
+                    durations,
+                    "append_user_message",
+                    lambda: memory_store.append_message(user_id, "user", text),
+                )
+                profile = _timed(
+                    durations,
+                    "load_profile",
+                    lambda: memory_store.load_personalization_profile(user_id),
+                )
+                system_prompt = _timed(
+                    durations,
+                    "build_system_prompt",
+                    lambda: build_personalized_system_prompt(
+                        agent.base_system_prompt, profile
+                    ),
+                )
+                messages = _timed(
+                    durations,
+                    "recent_context",
+                    lambda: memory_store.get_recent_context_messages(
+                        user_id, system_prompt=system_prompt, retrieve=True
+                    ),
+                )
+                reply = _timed(
+                    durations,
+                    "agent_invoke",
+                    lambda: agent.invoke(
+                        {"messages": messages}, system_prompt=system_prompt
+                    ),
+                )
+                _timed(
+                    durations,
+                    "append_assistant_message",
+                    lambda: memory_store.append_message(user_id, "assistant", reply),
+                )
+                if _timed(
+                    durations,
+                    "profile_update",
+                    lambda: memory_store.update_personalization_profile_if_needed(
+                        user_id, summary_model
+                    ),
+                ):
+                    profile_updates += 1
+                durations["turn"].append((time.perf_counter() - turn_started) * 1000)
+            elapsed = time.perf_counter() - turns_started
+            memory_store.flush()
+            io_after_turns = _io_counters()
+            disk_bytes = _directory_bytes(memory_dir)
+        finally:
+            memory_store.close()
+            close_chat_models()
+
+    return {
+        "users": users,
+        "history_messages": history_messages,
+        "turns": args["turns"],
+        "seed_seconds": seed_seconds,
+        "elapsed_seconds": elapsed,
+        "turns_per_second": args["turns"] / elapsed if elapsed else 0.0,
+        "profile_updates": profile_updates,
+        "stages_ms": {stage: _summary(values) for stage, values in durations.items()},
+        "seed_io_bytes": _io_delta(io_before_seed, io_after_seed),
+        "turn_io_bytes": _io_delta(io_before_turns, io_after_turns),
+        "disk_bytes": disk_bytes,
+        "peak_rss_kib": _peak_rss_kib(),
+        "prompt_cache": agent.prompt_cache_stats(),
+    }
+
+
+def _print_scenario(result: dict[str, Any]) -> None:
+    print(
+        f"users={result['users']} history={result['history_messages']} "
+        f"seed={result['seed_seconds']:.1f}s "
+        f"throughput={result['turns_per_second']:.1f} turns/s "
+        f"peak_rss={result['peak_rss_kib']} KiB"
+    )
+    for stage, summary in result["stages_ms"].items():
+        print(
+            f"  {stage:<26} p50={summary['p50']:9.3f} ms  "
+            f"p95={summary['p95']:9.3f} ms  p99={summary['p99']:9.3f} ms"
+        )
+    if result["turn_io_bytes"] is not None:
+        io_bytes = result["turn_io_bytes"]
+        print(
+            f"  io per turn: read={io_bytes['rchar'] / result['turns']:.0f} B  "
+            f"written={io_bytes['wchar'] / result['turns']:.0f} B"
+        )
+
+
+def _print_comparison(
+    results: list[dict[str, Any]], baseline: dict[str, Any]
+) -> None:
+    baseline_by_scenario = {
+        (scenario["users"], scenario["history_messages"]): scenario
+        for scenario in baseline.get("scenarios", [])
+    }
+    print(
+        f"\ncompared with {baseline.get('commit') or 'baseline'} "
+        f"({baseline.get('settings', {}).get('backend')} backend):"
+    )
+    for result in results:
+        previous = baseline_by_scenario.get((result["users"], result["history_messages"]))
+        if previous is None:
+            continue
+        print(f"users={result['users']} history={result['history_messages']}")
+        for stage, summary in result["stages_ms"].items():
+            previous_summary = previous["stages_ms"].get(stage)
+            if not previous_summary or not previous_summary["p50"]:
+                continue
+            print(
+                f"  {stage:<26} p50 x{summary['p50'] / previous_summary['p50']:6.2f}  "
+                f"p95 x{summary['p95'] / max(previous_summary['p95'], 1e-9):6.2f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Offline end-to-end benchmark of the chat turn pipeline with the stub "
+            "LLM provider."
+        )
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=DEFAULT_SCENARIOS,
+        help="Comma-separated users:history_messages pairs.",
+    )
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--warmup-turns", type=int, default=20)
+    parser.add_argument(
+        "--backend", choices=SUPPORTED_STORAGE_MODES, default=SUPPORTED_STORAGE_MODES[0]
+    )
+    parser.add_argument("--llm-latency-ms", type=int, default=50)
+    parser.add_argument("--llm-tokens-per-second", type=int, default=2000)
+    parser.add_argument("--llm-reply-tokens", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--work-dir", type=Path, help="Where synthetic memory files are written."
+    )
+    parser.add_argument("--output", type=Path)
+    parser.add_argument(
+        "--baseline", type=Path, help="Earlier --output file to compare against."
+    )
+    args = parser.parse_args()
+
+    settings = {
+        "turns": max(1, args.turns),
+        "warmup_turns": max(0, args.warmup_turns),
+        "backend": args.backend,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_tokens_per_second": args.llm_tokens_per_second,
+        "llm_reply_tokens": args.llm_reply_tokens,
+        "seed": args.seed,
+        "work_dir": str(args.work_dir) if args.work_dir else None,
+    }
+    results = []
+    for users, history_messages in _parse_scenarios(args.scenarios):
+        # A fresh process per scenario keeps caches, imports and peak RSS
+        # from leaking between population sizes.
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(_run_scenario, users, history_messages, settings).result()
+        _print_scenario(result)
+        results.append(result)
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "memory_env": {
+            key: value for key, value in os.environ.items() if key.startswith("MEMORY_")
+        },
+        "scenarios": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.baseline is not None:
+        _print_comparison(results, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl
+
+import httpx
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from Utils.CommonUtils import percentile  # noqa: E402
+
+LOAD_TEST_TOKEN = "123456:LOADTEST"
+LOAD_TEST_SECRET = "load-test-secret"
+BOT_USER = {
+    "id": 123456,
+    "is_bot": True,
+    "first_name": "LoadTest",
+    "username": "load_test_bot",
+}
+SAMPLE_TEXTS = (
+    "Hey, how are you?",
+    "I had a really long day at work.",
+    "Can we talk about my weekend plans?",
+    "Thanks, that helps a lot.",
+)
+
+
+class FakeBotApi:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: dict[int, deque[float]] = defaultdict(deque)
+        self._next_message_id = 1
+        self.webhook_set = threading.Event()
+        self.reply_latencies_ms: list[float] = []
+        self.method_counts: dict[str, int] = defaultdict(int)
+
+    def expect_reply(self, chat_id: int, sent_at: float) -> None:
+        with self._lock:
+            self._pending[chat_id].append(sent_at)
+
+    def outstanding(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._pending.values())
+
+    def handle(self, method: str, params: dict[str, Any]) -> Any:
+        with self._lock:
+            self.method_counts[method] += 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "setWebhook":
+            self.webhook_set.set()
+            return True
+        if method in {"sendMessage", "editMessageText"}:
+            chat_id = int(params.get("chat_id", 0))
+            with self._lock:
+                message_id = self._next_message_id
+                self._next_message_id += 1
+                # The first message back to a chat answers its oldest update.
+                if method == "sendMessage" and self._pending[chat_id]:
+                    sent_at = self._pending[chat_id].popleft()
+                    self.reply_latencies_ms.append(
+                        (time.perf_counter() - sent_at) * 1000
+                    )
+            return {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        return True
+
+
+def _serve_fake_bot_api(api: FakeBotApi, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            method = self.path.rstrip("/").rsplit("/", 1)[-1]
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                params = json.loads(body or b"{}")
+            else:
+                params = dict(parse_qsl(body.decode("utf-8")))
+            payload = json.dumps({"ok": True, "result": api.handle(method, params)})
+            encoded = payload.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            return None
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _synthetic_update(update_id: int, user_id: int) -> dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": SAMPLE_TEXTS[update_id % len(SAMPLE_TEXTS)],
+        },
+    }
+
+
+async def _post_updates(
+    api: FakeBotApi, webhook_url: str, updates: int, users: int, concurrency: int
+) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    ack_latencies_ms: list[float] = []
+    headers = {"X-Telegram-Bot-Api-Secret-Token": LOAD_TEST_SECRET}
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=concurrency), timeout=30
+    ) as client:
+
+        async def post(update_id: int) -> None:
+            user_id = 1_000_000 + update_id % users
+            async with semaphore:
+                started = time.perf_counter()
+                api.expect_reply(user_id, started)
+                response = await client.post(
+                    webhook_url, json=_synthetic_update(update_id, user_id), headers=headers
+                )
+                ack_latencies_ms.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+
+        await asyncio.gather(*(post(update_id) for update_id in range(1, updates + 1)))
+    return ack_latencies_ms
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values, default=0.0),
+    }
+
+
+def _launch_bot(args: argparse.Namespace) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": LOAD_TEST_TOKEN,
+        "TELEGRAM_BOT_API_BASE_URL": f"http://127.0.0.1:{args.api_port}/bot",
+        "TELEGRAM_WEBHOOK_URL": f"http://127.0.0.1:{args.webhook_port}",
+        "TELEGRAM_WEBHOOK_LISTEN": "127.0.0.1",
+        "TELEGRAM_WEBHOOK_PORT": str(args.webhook_port),
+        "TELEGRAM_WEBHOOK_SECRET_TOKEN": LOAD_TEST_SECRET,
+    }
+    return subprocess.Popen([sys.executable, str(SRC_ROOT / args.bot_script)], env=env)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Load test the Telegram webhook with synthetic updates against a local "
+            "fake Bot API server."
+        )
+    )
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook-port", type=int, default=8443)
+    parser.add_argument("--bot-script", default="Bots/TelegramBot.py")
+    parser.add_argument(
+        "--no-launch",
+        action="store_true",
+        help="Target an already running bot instead of starting one.",
+    )
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--reply-timeout", type=float, default=120)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    api = FakeBotApi()
+    server = _serve_fake_bot_api(api, args.api_port)
+    bot = None if args.no_launch else _launch_bot(args)
+    try:
+        if bot is not None and not api.webhook_set.wait(args.startup_timeout):
+            raise SystemExit("The bot did not register its webhook in time.")
+        webhook_url = f"http://127.0.0.1:{args.webhook_port}/telegram"
+        started = time.perf_counter()
+        ack_latencies_ms = asyncio.run(
+            _post_updates(api, webhook_url, args.updates, args.users, args.concurrency)
+        )
+        deadline = time.monotonic() + args.reply_timeout
+        while api.outstanding() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+    finally:
+        if bot is not None:
+            bot.send_signal(signal.SIGINT)
+            try:
+                bot.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+        server.shutdown()
+
+    results = {
+        "updates": args.updates,
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "elapsed_seconds": elapsed,
+        "replies": len(api.reply_latencies_ms),
+        "missing_replies": api.outstanding(),
+        "replies_per_second": len(api.reply_latencies_ms) / elapsed if elapsed else 0.0,
+        "webhook_ack_ms": _summary(ack_latencies_ms),
+        "reply_latency_ms": _summary(api.reply_latencies_ms),
+        "bot_api_calls": dict(api.method_counts),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
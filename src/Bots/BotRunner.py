@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import os
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder
+
+from Utils.CommonUtils import get_env_int
+
+
+# Only message updates have handlers; everything else would be fetched or
+# pushed by Telegram just to be dropped.
+DEFAULT_ALLOWED_UPDATES = (Update.MESSAGE,)
+DEFAULT_WEBHOOK_LISTEN = "0.0.0.0"
+DEFAULT_WEBHOOK_PORT = 8443
+DEFAULT_WEBHOOK_PATH = "telegram"
+DEFAULT_WEBHOOK_MAX_CONNECTIONS = 40
+
+
+def allowed_updates() -> list[str]:
+    raw_value = os.getenv("TELEGRAM_ALLOWED_UPDATES", "").strip()
+    if not raw_value:
+        return list(DEFAULT_ALLOWED_UPDATES)
+    return [item.strip() for item in raw_value.split(",") if item.strip()]
+
+
+def application_builder(token: str) -> ApplicationBuilder:
+    builder = Application.builder().token(token)
+    # Lets a local fake Bot API server stand in for Telegram in load tests.
+    base_url = os.getenv("TELEGRAM_BOT_API_BASE_URL", "").strip()
+    if base_url:
+        builder = builder.base_url(base_url)
+    return builder
+
+
+def run_application(app: Application) -> None:
+    webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL", "").strip()
+    if not webhook_url:
+        app.run_polling(allowed_updates=allowed_updates())
+        return
+    url_path = os.getenv("TELEGRAM_WEBHOOK_PATH", DEFAULT_WEBHOOK_PATH).strip("/ ")
+    app.run_webhook(
+        listen=os.getenv("TELEGRAM_WEBHOOK_LISTEN", DEFAULT_WEBHOOK_LISTEN).strip(),
+        port=get_env_int("TELEGRAM_WEBHOOK_PORT", DEFAULT_WEBHOOK_PORT),
+        url_path=url_path,
+        webhook_url=f"{webhook_url.rstrip('/')}/{url_path}",
+        secret_token=os.getenv("TELEGRAM_WEBHOOK_SECRET_TOKEN", "").strip() or None,
+        allowed_updates=allowed_updates(),
+        max_connections=get_env_int(
+            "TELEGRAM_WEBHOOK_MAX_CONNECTIONS", DEFAULT_WEBHOOK_MAX_CONNECTIONS
+        ),
+    )
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from telegram import Message
+
+DEFAULT_NON_TEXT_REPLY = "I can only read text messages for now."
+
+# Checked in order; the first attribute set on the message picks the reply.
+# Animations also carry a document, so they come first.
+CANNED_NON_TEXT_REPLIES = (
+    ("sticker", "Aww, cute sticker! Tell me what's on your mind?"),
+    ("animation", "Ha, I love that. What's going on with you?"),
+    (
+        "photo",
+        "I can't see photos yet, but I'd love to hear about it. "
+        "Could you describe it for me?",
+    ),
+    (
+        "voice",
+        "I can't listen to voice messages yet. Could you type it out for me?",
+    ),
+    (
+        "video_note",
+        "I can't watch videos yet. Could you tell me about it in words?",
+    ),
+    ("video", "I can't watch videos yet. Could you tell me about it in words?"),
+    (
+        "audio",
+        "I can't listen to audio yet. What would you like to tell me about it?",
+    ),
+    (
+        "document",
+        "I can't open files yet. Could you paste the part you want to talk about?",
+    ),
+    ("location", "Thanks for sharing where you are! How are you feeling there?"),
+    ("contact", "Thanks for sharing that contact. Who are they to you?"),
+)
+
+
+def canned_reply_for(message: Message) -> tuple[str, str]:
+    for attribute, reply in CANNED_NON_TEXT_REPLIES:
+        if getattr(message, attribute, None):
+            return attribute, reply
+    return "other", DEFAULT_NON_TEXT_REPLY
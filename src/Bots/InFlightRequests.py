@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+def request_key(messages: list[dict[str, str]], system_prompt: str | None) -> str:
+    context_hash = hashlib.sha256(
+        json.dumps(messages, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()
+    return f"{context_hash}:{prompt_hash}"
+
+
+@dataclass
+class _Flight(Generic[T]):
+    task: asyncio.Future[T]
+    waiters: int = 0
+
+
+class InFlightRequests(Generic[T]):
+    def __init__(self) -> None:
+        self._flights: dict[str, _Flight[T]] = {}
+        self._counters = {"started": 0, "shared": 0}
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._counters["started"] += 1
+        else:
+            self._counters["shared"] += 1
+        flight.waiters += 1
+        try:
+            # Shielded so one cancelled caller does not cancel the call for
+            # the others waiting on it.
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+
+    def stats(self) -> dict[str, Any]:
+        return {**self._counters, "in_flight": len(self._flights)}
+
+    def _forget(self, key: str, flight: _Flight[T]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Marks a failure as seen even when every caller had already left.
+            flight.task.exception()
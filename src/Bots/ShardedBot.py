@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from Bots.BotRunner import application_builder, run_application  # noqa: E402
+from Utils.CommonUtils import get_env_int, get_required_env  # noqa: E402
+
+load_dotenv(override=True)
+
+DEFAULT_WORKER_PROCESSES = max(1, os.cpu_count() or 1)
+DEFAULT_VIRTUAL_NODES = 64
+DEFAULT_SUPERVISE_INTERVAL_SECONDS = 1
+DEFAULT_STATS_INTERVAL_SECONDS = 60
+DEFAULT_WORKER_STOP_TIMEOUT_SECONDS = 15
+
+# Counts completed updates; it sits in a later group than the bot handlers so
+# it runs after them.
+_COMPLETED_HANDLER_GROUP = 1
+
+
+class ConsistentHashRing:
+    def __init__(
+        self, shard_count: int, *, virtual_nodes: int = DEFAULT_VIRTUAL_NODES
+    ) -> None:
+        points = sorted(
+            (self._hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shard_count)
+            for replica in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+    def _hash(self, key: str) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+
+
+def _routing_key(update: Update) -> str:
+    # Everything from one user lands on one worker, which keeps that user's
+    # lock, caches and memory files local to a single process.
+    if update.effective_user is not None:
+        return f"user:{update.effective_user.id}"
+    if update.effective_chat is not None:
+        return f"chat:{update.effective_chat.id}"
+    return f"update:{update.update_id}"
+
+
+class _WorkerSlot:
+    def __init__(self, context: Any, index: int) -> None:
+        self.index = index
+        self.inbox = context.Queue()
+        self.completed = context.Value("Q", 0)
+        self.process: Any = None
+        self.dispatched = 0
+        self.restarts = 0
+        self.last_completed = 0
+        self.last_report = time.monotonic()
+
+
+class ShardedDispatcher:
+    def __init__(self, worker_count: int) -> None:
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = [
+            _WorkerSlot(self._context, index) for index in range(max(1, worker_count))
+        ]
+        self._ring = ConsistentHashRing(len(self._slots))
+        self._tasks: list[asyncio.Task[None]] = []
+        self._stopping = False
+
+    async def start(self, app: Application) -> None:
+        for slot in self._slots:
+            self._spawn(slot)
+        self._tasks = [
+            asyncio.create_task(self._supervise(), name="shard-supervisor"),
+            asyncio.create_task(self._report_stats(), name="shard-stats"),
+        ]
+
+    async def stop(self, app: Application) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for slot in self._slots:
+            slot.inbox.put(None)
+        timeout = get_env_int(
+            "TELEGRAM_WORKER_STOP_TIMEOUT_SECONDS", DEFAULT_WORKER_STOP_TIMEOUT_SECONDS
+        )
+        for slot in self._slots:
+            await asyncio.to_thread(slot.process.join, timeout)
+            if slot.process.is_alive():
+                slot.process.terminate()
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        slot = self._slots[self._ring.shard_for(_routing_key(update))]
+        slot.inbox.put(update.to_dict())
+        slot.dispatched += 1
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "worker": slot.index,
+                "alive": bool(slot.process and slot.process.is_alive()),
+                "dispatched": slot.dispatched,
+                "completed": slot.completed.value,
+                "restarts": slot.restarts,
+            }
+            for slot in self._slots
+        ]
+
+    def _spawn(self, slot: _WorkerSlot) -> None:
+        slot.process = self._context.Process(
+            target=_worker_main,
+            args=(slot.index, slot.inbox, slot.completed),
+            name=f"telegram-worker-{slot.index}",
+            daemon=False,
+        )
+        slot.process.start()
+
+    async def _supervise(self) -> None:
+        while True:
+            await asyncio.sleep(DEFAULT_SUPERVISE_INTERVAL_SECONDS)
+            for slot in self._slots:
+                if self._stopping or slot.process.is_alive():
+                    continue
+                # Updates the crashed worker had already taken are lost; the
+                # queue itself survives, so anything still waiting is kept.
+                print(
+                    f"Telegram worker {slot.index} exited with code "
+                    f"{slot.process.exitcode}; restarting.",
+                    file=sys.stderr,
+                )
+                slot.restarts += 1
+                self._spawn(slot)
+
+    async def _report_stats(self) -> None:
+        interval = get_env_int(
+            "TELEGRAM_WORKER_STATS_INTERVAL_SECONDS", DEFAULT_STATS_INTERVAL_SECONDS
+        )
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for slot in self._slots:
+                completed = slot.completed.value
+                rate = (completed - slot.last_completed) / max(now - slot.last_report, 1e-9)
+                slot.last_completed = completed
+                slot.last_report = now
+                print(
+                    f"Telegram worker {slot.index}: {rate:.2f} updates/s, "
+                    f"dispatched={slot.dispatched} completed={completed} "
+                    f"restarts={slot.restarts}",
+                    file=sys.stderr,
+                )
+
+
+def _worker_main(index: int, inbox: Any, completed: Any) -> None:
+    # Ctrl+C reaches the whole process group; shutdown is driven by the front
+    # process through the inbox instead.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_run_worker(index, inbox, completed))
+
+
+async def _run_worker(index: int, inbox: Any, completed: Any) -> None:
+    os.environ["METRICS_PORT_OFFSET"] = str(index)
+    from Bots.TelegramBot import build_application
+
+    app = build_application(get_required_env("TELEGRAM_BOT_TOKEN"))
+
+    async def count_completed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        with completed.get_lock():
+            completed.value += 1
+
+    app.add_handler(TypeHandler(Update, count_completed), group=_COMPLETED_HANDLER_GROUP)
+    await app.initialize()
+    if app.post_init is not None:
+        await app.post_init(app)
+    await app.start()
+    try:
+        while True:
+            data = await asyncio.to_thread(inbox.get)
+            if data is None:
+                break
+            await app.update_queue.put(Update.de_json(data, app.bot))
+    finally:
+        with contextlib.suppress(Exception):
+            await app.stop()
+        await app.shutdown()
+        if app.post_shutdown is not None:
+            await app.post_shutdown(app)
+
+
+def main() -> None:
+    dispatcher = ShardedDispatcher(
+        get_env_int("TELEGRAM_WORKER_PROCESSES", DEFAULT_WORKER_PROCESSES)
+    )
+    app = (
+        application_builder(get_required_env("TELEGRAM_BOT_TOKEN"))
+        .post_init(dispatcher.start)
+        .post_shutdown(dispatcher.stop)
+        .build()
+    )
+    app.add_handler(TypeHandler(Update, dispatcher.dispatch))
+    run_application(app)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import timedelta
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+from Utils.Metrics import get_metrics
+
+# Telegram rejects message texts longer than this.
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+
+class ProgressiveReply:
+    def __init__(
+        self,
+        source_message: Message,
+        *,
+        min_edit_interval_seconds: float,
+        min_edit_chars: int,
+    ) -> None:
+        self._source_message = source_message
+        self._min_edit_interval_seconds = min_edit_interval_seconds
+        self._min_edit_chars = min_edit_chars
+        self._sent_message: Message | None = None
+        self._shown_text = ""
+        self._last_edit_at = 0.0
+        self._metrics = get_metrics()
+
+    @property
+    def started(self) -> bool:
+        return self._sent_message is not None
+
+    async def update(self, text: str) -> None:
+        preview = text[:TELEGRAM_MAX_MESSAGE_LENGTH]
+        if not preview.strip():
+            return
+        if self._sent_message is None:
+            with self._metrics.span("telegram_send", method="reply_text"):
+                self._sent_message = await self._source_message.reply_text(preview)
+            self._shown_text = preview
+            self._last_edit_at = time.monotonic()
+            return
+        elapsed = time.monotonic() - self._last_edit_at
+        if elapsed < self._min_edit_interval_seconds:
+            return
+        if len(preview) - len(self._shown_text) < self._min_edit_chars:
+            return
+        await self._edit(preview)
+
+    async def finish(self, text: str) -> None:
+        final_text = text[:TELEGRAM_MAX_MESSAGE_LENGTH]
+        if self._sent_message is None:
+            with self._metrics.span("telegram_send", method="reply_text"):
+                self._sent_message = await self._source_message.reply_text(final_text)
+            self._shown_text = final_text
+        elif final_text != self._shown_text:
+            await self._edit(final_text, final=True)
+        overflow = text[TELEGRAM_MAX_MESSAGE_LENGTH:]
+        while overflow:
+            await self._source_message.reply_text(
+                overflow[:TELEGRAM_MAX_MESSAGE_LENGTH]
+            )
+            overflow = overflow[TELEGRAM_MAX_MESSAGE_LENGTH:]
+
+    async def discard(self) -> None:
+        if self._sent_message is None:
+            return
+        try:
+            await self._sent_message.delete()
+        except BadRequest:
+            pass
+        self._sent_message = None
+        self._shown_text = ""
+
+    async def _edit(self, text: str, *, final: bool = False) -> None:
+        try:
+            with self._metrics.span("telegram_send", method="edit_text"):
+                await self._sent_message.edit_text(text)
+        except RetryAfter as error:
+            # Intermediate edits are best effort; the final edit must land.
+            if not final:
+                return
+            retry_after = error.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            await asyncio.sleep(retry_after)
+            await self._sent_message.edit_text(text)
+        except BadRequest as error:
+            if "not modified" not in str(error).lower():
+                raise
+        self._shown_text = text
+        self._last_edit_at = time.monotonic()
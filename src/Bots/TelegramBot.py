@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 import asyncio
-import os
 import sys
-from collections import defaultdict
+import time
 from pathlib import Path
 
 from dotenv import load_dotenv
-from telegram import Update
+from telegram import Message, Update
 from telegram.constants import ChatAction
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
@@ -18,67 +17,235 @@ if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
 from Agents.FriendAgent import build_friend_agent  # noqa: E402
-from Personalization.MemoryStore import MemoryStore  # noqa: E402
+from Bots.BotRunner import application_builder, run_application  # noqa: E402
+from Bots.CannedReplies import canned_reply_for  # noqa: E402
+from Bots.InFlightRequests import InFlightRequests, request_key  # noqa: E402
+from Bots.StreamingReply import ProgressiveReply  # noqa: E402
+from Bots.TurnCoalescer import DEFAULT_QUIET_WINDOW_MS, TurnCoalescer  # noqa: E402
+from Bots.UpdateDeduplicator import (  # noqa: E402
+    DEFAULT_DEDUP_MAX_ENTRIES,
+    DEFAULT_DEDUP_TTL_SECONDS,
+    UpdateDeduplicator,
+)
+from LLM_Providers.ProviderFactory import (  # noqa: E402
+    aclose_chat_models,
+    get_chat_model_registry,
+)
+from Personalization.MemoryStore import MemoryStore, PreparedTurn  # noqa: E402
+from Personalization.ProfileUpdateQueue import (  # noqa: E402
+    DEFAULT_MAX_PENDING,
+    DEFAULT_WORKER_COUNT,
+    ProfileUpdateQueue,
+)
 from Personalization.PromptBuilder import (  # noqa: E402
     build_personalized_system_prompt,
 )
+from Utils.CommonUtils import get_env_bool, get_env_int, get_required_env  # noqa: E402
+from Utils.Metrics import (  # noqa: E402
+    MetricsServer,
+    Sample,
+    counter_samples,
+    get_metrics,
+    start_metrics_server,
+)
+from Utils.UserLockRegistry import UserLockRegistry  # noqa: E402
 
 load_dotenv(override=True)
 
-def _get_required_env(name: str) -> str:
-    value = os.getenv(name, "").strip()
-    if not value:
-        raise ValueError(f"Missing required environment variable: {name}")
-    return value
+DEFAULT_MAX_CONCURRENT_LLM_CALLS = 64
+DEFAULT_MAX_CONCURRENT_UPDATES = 256
+DEFAULT_STREAM_EDIT_INTERVAL_MS = 700
+DEFAULT_STREAM_EDIT_MIN_CHARS = 40
+DEFAULT_PROFILE_UPDATE_DRAIN_SECONDS = 10
 
 
+metrics = get_metrics()
 memory_store = MemoryStore(memory_dir=PROJECT_ROOT / "Memory")
-user_locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+user_locks = UserLockRegistry()
 agent = build_friend_agent()
+llm_call_semaphore = asyncio.Semaphore(
+    get_env_int("TELEGRAM_MAX_CONCURRENT_LLM_CALLS", DEFAULT_MAX_CONCURRENT_LLM_CALLS)
+)
+profile_update_queue = ProfileUpdateQueue(
+    memory_store,
+    worker_count=get_env_int("PROFILE_UPDATE_WORKERS", DEFAULT_WORKER_COUNT),
+    max_pending=get_env_int("PROFILE_UPDATE_MAX_PENDING", DEFAULT_MAX_PENDING),
+    llm_semaphore=llm_call_semaphore,
+    lock_for=lambda user_id: user_locks.lock(int(user_id)),
+    idle_check_seconds=memory_store.profile_update_policy.idle_seconds,
+)
+stream_responses = get_env_bool("TELEGRAM_STREAM_RESPONSES")
+stream_edit_interval_seconds = (
+    get_env_int("TELEGRAM_STREAM_EDIT_INTERVAL_MS", DEFAULT_STREAM_EDIT_INTERVAL_MS)
+    / 1000
+)
+stream_edit_min_chars = get_env_int(
+    "TELEGRAM_STREAM_EDIT_MIN_CHARS", DEFAULT_STREAM_EDIT_MIN_CHARS
+)
+turn_coalescer: TurnCoalescer[Message] = TurnCoalescer(
+    lambda user_id, messages, turn: _respond_to_turn(user_id, messages, turn),
+    item_key=lambda message: (message.chat_id, message.message_id),
+    begin_turn=lambda user_id, messages: _prepare_turn(user_id, messages),
+    quiet_window_seconds=get_env_int(
+        "TELEGRAM_COALESCE_WINDOW_MS", DEFAULT_QUIET_WINDOW_MS, minimum=0
+    )
+    / 1000,
+    cancel_in_flight=get_env_bool("TELEGRAM_COALESCE_CANCEL_IN_FLIGHT"),
+)
+update_deduplicator = UpdateDeduplicator(
+    max_entries=get_env_int("TELEGRAM_DEDUP_MAX_ENTRIES", DEFAULT_DEDUP_MAX_ENTRIES),
+    ttl_seconds=get_env_int(
+        "TELEGRAM_DEDUP_TTL_SECONDS", DEFAULT_DEDUP_TTL_SECONDS, minimum=0
+    ),
+)
+share_identical_requests = get_env_bool("TELEGRAM_SHARE_IDENTICAL_REQUESTS", True)
+in_flight_requests: InFlightRequests[str] = InFlightRequests()
+
+
+def _collect_runtime_metrics() -> list[Sample]:
+    samples: list[Sample] = []
+    for cache_name, cache_stats in memory_store.cache_stats().items():
+        lookups = cache_stats["hits"] + cache_stats["misses"]
+        samples.extend(
+            counter_samples(
+                "memory_cache_events",
+                {key: cache_stats[key] for key in ("hits", "misses", "evictions")},
+                cache=cache_name,
+            )
+        )
+        samples.append(
+            ("memory_cache_entries", "gauge", {"cache": cache_name}, cache_stats["size"])
+        )
+        samples.append(
+            (
+                "memory_cache_hit_ratio",
+                "gauge",
+                {"cache": cache_name},
+                cache_stats["hits"] / lookups if lookups else 0.0,
+            )
+        )
+    prompt_cache = agent.prompt_cache_stats()
+    samples.extend(
+        counter_samples(
+            "llm_tokens",
+            {
+                key: prompt_cache[key]
+                for key in ("input_tokens", "cached_tokens", "output_tokens")
+            },
+        )
+    )
+    samples.extend(
+        counter_samples(
+            "llm_calls",
+            {
+                key: prompt_cache[key]
+                for key in ("calls", "calls_with_usage", "calls_with_cache_hit")
+            },
+        )
+    )
+    samples.append(
+        ("llm_cached_token_ratio", "gauge", {}, prompt_cache["cached_token_ratio"])
+    )
+    queue_stats = profile_update_queue.stats()
+    samples.append(
+        ("profile_update_queue_depth", "gauge", {}, queue_stats["queue_depth"])
+    )
+    samples.extend(
+        counter_samples(
+            "profile_update_jobs",
+            {
+                key: value
+                for key, value in queue_stats.items()
+                if key not in {"queue_depth", "running", "workers", "idle_timers"}
+            },
+        )
+    )
+    coalescer_stats = turn_coalescer.stats()
+    samples.append(
+        ("coalescer_active_users", "gauge", {}, coalescer_stats["active_users"])
+    )
+    samples.extend(
+        counter_samples(
+            "coalescer_events",
+            {
+                key: coalescer_stats[key]
+                for key in ("messages", "turns", "cancelled", "failed")
+            },
+        )
+    )
+    samples.append(("user_locks_active", "gauge", {}, len(user_locks)))
+    dedup_stats = update_deduplicator.stats()
+    samples.extend(
+        counter_samples(
+            "telegram_updates",
+            {key: dedup_stats[key] for key in ("accepted", "replayed")},
+        )
+    )
+    in_flight_stats = in_flight_requests.stats()
+    samples.extend(
+        counter_samples(
+            "agent_requests",
+            {key: in_flight_stats[key] for key in ("started", "shared")},
+        )
+    )
+    for endpoint in get_chat_model_registry().routed_stats():
+        samples.extend(
+            counter_samples(
+                "llm_endpoint_events",
+                {
+                    key: endpoint[key]
+                    for key in ("requests", "failures", "failovers")
+                },
+                endpoint=endpoint["endpoint"],
+            )
+        )
+    return samples
 
 
-def _get_user_lock(user_id: int) -> asyncio.Lock:
-    return user_locks[user_id]
+metrics.register_collector(_collect_runtime_metrics)
 
 
 async def _append_message(user_id: int, role: str, content: str) -> None:
-    async with _get_user_lock(user_id):
-        await asyncio.to_thread(
-            memory_store.append_message, str(user_id), role, content
-        )
-
-
-async def _get_recent_context_messages(user_id: int) -> list[dict[str, str]]:
-    async with _get_user_lock(user_id):
-        return await asyncio.to_thread(
-            memory_store.get_recent_context_messages, str(user_id)
-        )
+    with metrics.span("turn_stage", stage=f"append_{role}_message"):
+        async with user_locks.lock(user_id):
+            await asyncio.to_thread(
+                memory_store.append_message, str(user_id), role, content
+            )
 
 
-async def _load_personalization_profile(user_id: int) -> dict:
-    async with _get_user_lock(user_id):
-        return await asyncio.to_thread(
-            memory_store.load_personalization_profile, str(user_id)
-        )
+async def _prepare_turn(user_id: int, messages: list[Message]) -> PreparedTurn:
+    # Storing the new messages and reading the context happen in one locked
+    # call, so no other handler can run in between.
+    with metrics.span("turn_stage", stage="prepare_turn"):
+        async with user_locks.lock(user_id):
+            return await asyncio.to_thread(
+                memory_store.prepare_turn,
+                str(user_id),
+                lambda profile: build_personalized_system_prompt(
+                    agent.base_system_prompt, profile
+                ),
+                user_messages=[message.text for message in messages],
+            )
 
 
 async def _reset_recent_context(user_id: int) -> None:
-    async with _get_user_lock(user_id):
+    async with user_locks.lock(user_id):
         await asyncio.to_thread(memory_store.reset_recent_context, str(user_id))
 
 
-async def _update_personalization_profile_if_needed(user_id: int) -> None:
-    try:
-        async with _get_user_lock(user_id):
-            await asyncio.to_thread(
-                memory_store.update_personalization_profile_if_needed, str(user_id)
-            )
-    except Exception:
-        print("Failed to update personalization profile summary.", file=sys.stderr)
+def _schedule_personalization_profile_update(user_id: int) -> None:
+    if not profile_update_queue.schedule(str(user_id)):
+        print("Profile update queue is full; skipping this trigger.", file=sys.stderr)
+
+
+def _is_replay(update: Update) -> bool:
+    # Retried webhook deliveries and re-fetched updates must not reach memory
+    # or the LLM a second time.
+    return not update_deduplicator.first_delivery(update)
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if update.message is None:
+    if update.message is None or _is_replay(update):
         return
     await update.message.reply_text(
         "Hi, I am here for you. Send me a message and I will respond."
@@ -86,7 +253,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 
 async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if update.message is None:
+    if update.message is None or _is_replay(update):
         return
     user = update.effective_user
     if user is None:
@@ -95,16 +262,69 @@ async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     await update.message.reply_text("Your conversation has been reset.")
 
 
+async def _acquire_llm_slot() -> None:
+    started = time.perf_counter()
+    await llm_call_semaphore.acquire()
+    metrics.observe("lock_wait", time.perf_counter() - started, lock="llm_semaphore")
+
+
 async def _run_agent(
     messages: list[dict[str, str]], system_prompt: str | None = None
 ) -> str:
-    return await asyncio.to_thread(
-        agent.invoke, {"messages": messages}, system_prompt=system_prompt
+    if not share_identical_requests:
+        return await _invoke_agent(messages, system_prompt)
+    # Identical context and prompt, e.g. the same first message from two new
+    # users, are answered by one agent call.
+    return await in_flight_requests.run(
+        request_key(messages, system_prompt),
+        lambda: _invoke_agent(messages, system_prompt),
     )
 
 
+async def _invoke_agent(
+    messages: list[dict[str, str]], system_prompt: str | None
+) -> str:
+    await _acquire_llm_slot()
+    try:
+        return await agent.ainvoke({"messages": messages}, system_prompt=system_prompt)
+    finally:
+        llm_call_semaphore.release()
+
+
+async def _stream_agent_reply(
+    message: Message,
+    messages: list[dict[str, str]],
+    system_prompt: str | None = None,
+) -> str:
+    reply = ProgressiveReply(
+        message,
+        min_edit_interval_seconds=stream_edit_interval_seconds,
+        min_edit_chars=stream_edit_min_chars,
+    )
+    streamed_text = ""
+    try:
+        await _acquire_llm_slot()
+        try:
+            with metrics.span("agent", mode="stream"):
+                async for chunk in agent.astream_text(
+                    {"messages": messages}, system_prompt=system_prompt
+                ):
+                    streamed_text += chunk
+                    await reply.update(streamed_text)
+        finally:
+            llm_call_semaphore.release()
+    except asyncio.CancelledError:
+        # Newer input superseded this turn; drop the half-streamed draft.
+        await asyncio.shield(reply.discard())
+        raise
+    response_text = streamed_text.strip()
+    if response_text:
+        await reply.finish(response_text)
+    return response_text
+
+
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if update.message is None:
+    if update.message is None or _is_replay(update):
         return
 
     user = update.effective_user
@@ -113,48 +333,134 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     text = update.message.text
     if not text:
-        await update.message.reply_text("I can only read text messages for now.")
+        await _send_canned_reply(update.message)
         return
 
-    await _append_message(user.id, "user", text)
-    recent_context = await _get_recent_context_messages(user.id)
-    personalization_profile = await _load_personalization_profile(user.id)
-    system_prompt = build_personalized_system_prompt(
-        agent.base_system_prompt, personalization_profile
-    )
+    # Stored by the coalescer when its turn starts, so a message sent while a
+    # reply is generating lands after that reply in the history.
+    turn_coalescer.submit(user.id, update.message)
+
+
+async def non_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # Answered without touching memory or the LLM: nothing here is stored, so
+    # a sticker does not cost a history append or an agent call.
+    if update.message is None or _is_replay(update):
+        return
+    await _send_canned_reply(update.message)
+
+
+async def _send_canned_reply(message: Message) -> None:
+    kind, reply_text = canned_reply_for(message)
+    metrics.increment("canned_replies", kind=kind)
+    with metrics.span("telegram_send", method="reply_text"):
+        await message.reply_text(reply_text)
+
+
+async def _respond_to_turn(
+    user_id: int, messages: list[Message], turn: PreparedTurn
+) -> None:
+    with metrics.span("turn"):
+        await _run_turn(user_id, messages, turn)
+
+
+async def _run_turn(
+    user_id: int, messages: list[Message], turn: PreparedTurn
+) -> None:
+    # Every message of the burst has been stored by now, so one agent call over
+    # the recent context answers all of them; the reply threads to the last.
+    message = messages[-1]
 
     try:
-        await context.bot.send_chat_action(
-            chat_id=update.effective_chat.id, action=ChatAction.TYPING
-        )
-        response_text = await _run_agent(
-            recent_context, system_prompt=system_prompt
-        )
+        with metrics.span("telegram_send", method="send_chat_action"):
+            await message.get_bot().send_chat_action(
+                chat_id=message.chat_id, action=ChatAction.TYPING
+            )
+        if stream_responses:
+            response_text = await _stream_agent_reply(
+                message, turn.messages, system_prompt=turn.system_prompt
+            )
+        else:
+            response_text = await _run_agent(
+                turn.messages, system_prompt=turn.system_prompt
+            )
     except Exception:
-        await update.message.reply_text(
+        await message.reply_text(
             "Sorry, I hit an error generating a response. Please try again."
         )
         return
 
     if not response_text:
-        await update.message.reply_text("Sorry, I did not get a response. Try again?")
+        await message.reply_text("Sorry, I did not get a response. Try again?")
         return
 
-    await _append_message(user.id, "assistant", response_text)
-    await update.message.reply_text(response_text)
-    await _update_personalization_profile_if_needed(user.id)
-
-
-def main() -> None:
-    token = _get_required_env("TELEGRAM_BOT_TOKEN")
-    app = Application.builder().token(token).build()
+    delivery = asyncio.ensure_future(_deliver_reply(user_id, message, response_text))
+    try:
+        await asyncio.shield(delivery)
+    except asyncio.CancelledError:
+        # Once the reply exists it is delivered rather than regenerated; the
+        # newer messages get their own turn afterwards.
+        await delivery
+
+
+async def _deliver_reply(user_id: int, message: Message, response_text: str) -> None:
+    await _append_message(user_id, "assistant", response_text)
+    if not stream_responses:
+        with metrics.span("telegram_send", method="reply_text"):
+            await message.reply_text(response_text)
+    _schedule_personalization_profile_update(user_id)
+
+
+async def _startup(app: Application) -> None:
+    await profile_update_queue.start()
+    metrics_server = start_metrics_server()
+    app.bot_data["metrics_server"] = metrics_server
+    if metrics_server is not None:
+        print(f"Serving metrics on port {metrics_server.port}.", file=sys.stderr)
+
+
+async def _shutdown(app: Application) -> None:
+    await turn_coalescer.aclose()
+    await profile_update_queue.stop(
+        drain_timeout_seconds=get_env_int(
+            "PROFILE_UPDATE_DRAIN_SECONDS",
+            DEFAULT_PROFILE_UPDATE_DRAIN_SECONDS,
+            minimum=0,
+        )
+    )
+    endpoint_stats = get_chat_model_registry().routed_stats()
+    await aclose_chat_models()
+    memory_store.close()
+    print(f"Prompt cache usage: {agent.prompt_cache_stats()}", file=sys.stderr)
+    if endpoint_stats:
+        print(f"LLM endpoint usage: {endpoint_stats}", file=sys.stderr)
+    metrics_server: MetricsServer | None = app.bot_data.get("metrics_server")
+    if metrics_server is not None:
+        metrics_server.close()
+
+
+def build_application(token: str) -> Application:
+    app = (
+        application_builder(token)
+        .concurrent_updates(
+            get_env_int(
+                "TELEGRAM_MAX_CONCURRENT_UPDATES", DEFAULT_MAX_CONCURRENT_UPDATES
+            )
+        )
+        .post_init(_startup)
+        .post_shutdown(_shutdown)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("reset", reset_command))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
-    app.add_handler(MessageHandler(~filters.TEXT & ~filters.COMMAND, message_handler))
+    app.add_handler(MessageHandler(~filters.TEXT & ~filters.COMMAND, non_text_handler))
+    return app
 
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+
+def main() -> None:
+    app = build_application(get_required_env("TELEGRAM_BOT_TOKEN"))
+    run_application(app)
 
 
 if __name__ == "__main__":
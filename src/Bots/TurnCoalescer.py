@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+from Utils.Metrics import get_metrics
+
+# Messages sent while a reply is being generated are always folded into the
+# next turn. A quiet window before the first reply is opt-in: it delays every
+# single-message turn by its full length.
+DEFAULT_QUIET_WINDOW_MS = 0
+
+T = TypeVar("T")
+
+
+@dataclass
+class _UserTurnState(Generic[T]):
+    pending: list[T] = field(default_factory=list)
+    in_flight: list[T] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+    task: asyncio.Task[None] | None = None
+    pending_since: float | None = None
+    # Keys of items already persisted by begin_turn, so a cancelled batch
+    # folded back into pending is not stored twice.
+    stored: set[Hashable] = field(default_factory=set)
+
+
+class TurnCoalescer(Generic[T]):
+    def __init__(
+        self,
+        run_turn: Callable[[int, list[T], Any], Awaitable[None]],
+        *,
+        item_key: Callable[[T], Hashable],
+        begin_turn: Callable[[int, list[T]], Awaitable[Any]] | None = None,
+        quiet_window_seconds: float = DEFAULT_QUIET_WINDOW_MS / 1000,
+        cancel_in_flight: bool = False,
+    ) -> None:
+        self._run_turn = run_turn
+        self._item_key = item_key
+        self._begin_turn = begin_turn
+        self._quiet_window_seconds = max(0.0, quiet_window_seconds)
+        self._cancel_in_flight = cancel_in_flight
+        self._states: dict[int, _UserTurnState[T]] = {}
+        self._counters = {"messages": 0, "turns": 0, "cancelled": 0, "failed": 0}
+        self._metrics = get_metrics()
+
+    def submit(self, user_id: int, item: T) -> None:
+        state = self._states.setdefault(user_id, _UserTurnState())
+        if state.pending_since is None:
+            state.pending_since = time.perf_counter()
+        state.pending.append(item)
+        self._counters["messages"] += 1
+        if state.task is not None and not state.task.done():
+            if not self._cancel_in_flight:
+                # The running turn picks these up as soon as it finishes.
+                return
+            # The cancelled batch is folded back in front of the new input,
+            # so the restarted turn answers all of it at once.
+            if not state.task.cancelling():
+                state.task.cancel()
+                self._counters["cancelled"] += 1
+        self._arm(user_id, state)
+
+    def stats(self) -> dict[str, Any]:
+        turns = self._counters["turns"]
+        return {
+            "active_users": len(self._states),
+            **self._counters,
+            "messages_per_turn": self._counters["messages"] / turns if turns else 0.0,
+        }
+
+    async def aclose(self) -> None:
+        tasks = []
+        for state in self._states.values():
+            if state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+            if state.task is not None:
+                tasks.append(state.task)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Input that never got its turn is still kept, just unanswered; the
+        # turn begun to store it is dropped.
+        for user_id, state in list(self._states.items()):
+            if not state.pending:
+                continue
+            try:
+                await self._begin(user_id, state, state.pending)
+            except Exception as error:
+                print(f"Storing pending messages failed: {error!r}", file=sys.stderr)
+        self._states.clear()
+
+    def _arm(self, user_id: int, state: _UserTurnState[T]) -> None:
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        if self._quiet_window_seconds <= 0:
+            self._start(user_id)
+            return
+        state.timer = asyncio.get_running_loop().call_later(
+            self._quiet_window_seconds, self._start, user_id
+        )
+
+    def _start(self, user_id: int) -> None:
+        state = self._states.get(user_id)
+        if state is None:
+            return
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        if state.task is not None and not state.task.done():
+            return
+        if not state.pending:
+            self._states.pop(user_id, None)
+            return
+        state.in_flight, state.pending = state.pending, []
+        if state.pending_since is not None:
+            self._metrics.observe(
+                "queue_wait",
+                time.perf_counter() - state.pending_since,
+                queue="coalescer",
+            )
+            state.pending_since = None
+        self._counters["turns"] += 1
+        state.task = asyncio.create_task(
+            self._run_batch(user_id, state, list(state.in_flight)),
+            name=f"turn-{user_id}",
+        )
+        state.task.add_done_callback(lambda task: self._on_turn_done(user_id, task))
+
+    async def _run_batch(
+        self, user_id: int, state: _UserTurnState[T], batch: list[T]
+    ) -> None:
+        # Items are stored only when their turn starts: anything that arrives
+        # meanwhile stays pending, so it lands after this turn's reply.
+        prepared = await self._begin(user_id, state, batch)
+        await self._run_turn(user_id, batch, prepared)
+
+    async def _begin(
+        self, user_id: int, state: _UserTurnState[T], items: list[T]
+    ) -> Any:
+        if self._begin_turn is None:
+            return None
+        unstored = [
+            item for item in items if self._item_key(item) not in state.stored
+        ]
+        begin = asyncio.ensure_future(self._begin_turn(user_id, unstored))
+        try:
+            prepared = await asyncio.shield(begin)
+        except asyncio.CancelledError:
+            # A half-finished store would be repeated by the restarted turn.
+            await begin
+            state.stored.update(self._item_key(item) for item in unstored)
+            raise
+        state.stored.update(self._item_key(item) for item in unstored)
+        return prepared
+
+    def _on_turn_done(self, user_id: int, task: asyncio.Task[None]) -> None:
+        state = self._states.get(user_id)
+        if state is None or state.task is not task:
+            return
+        state.task = None
+        if task.cancelled():
+            state.pending[:0] = state.in_flight
+            if state.pending_since is None:
+                state.pending_since = time.perf_counter()
+        else:
+            state.stored.difference_update(
+                self._item_key(item) for item in state.in_flight
+            )
+            if task.exception() is not None:
+                self._counters["failed"] += 1
+                print(f"Coalesced turn failed: {task.exception()!r}", file=sys.stderr)
+        state.in_flight = []
+        if state.timer is None:
+            # Messages that arrived during the turn already waited for it, so
+            # the follow-up turn starts without another quiet window.
+            self._start(user_id)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any
+
+from telegram import Update
+
+DEFAULT_DEDUP_MAX_ENTRIES = 10000
+DEFAULT_DEDUP_TTL_SECONDS = 600
+
+
+class UpdateDeduplicator:
+    def __init__(
+        self,
+        *,
+        max_entries: int = DEFAULT_DEDUP_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_DEDUP_TTL_SECONDS,
+    ) -> None:
+        self._max_entries = max(1, max_entries)
+        self._ttl_seconds = max(0.0, ttl_seconds)
+        # Insertion order is arrival order, so expired keys sit at the front.
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._counters = {"accepted": 0, "replayed": 0}
+
+    def first_delivery(self, update: Update) -> bool:
+        keys = [f"update:{update.update_id}"]
+        message = update.effective_message
+        if message is not None:
+            # Webhook retries reuse the update id; the same message can also
+            # come back under a new one after a restart.
+            keys.append(f"message:{message.chat_id}:{message.message_id}")
+        now = time.monotonic()
+        self._expire(now)
+        if any(key in self._seen for key in keys):
+            self._counters["replayed"] += 1
+            return False
+        for key in keys:
+            self._seen[key] = now
+        while len(self._seen) > self._max_entries:
+            self._seen.popitem(last=False)
+        self._counters["accepted"] += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return {**self._counters, "tracked": len(self._seen)}
+
+    def _expire(self, now: float) -> None:
+        if not self._ttl_seconds:
+            return
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if now - seen_at <= self._ttl_seconds:
+                break
+            del self._seen[key]
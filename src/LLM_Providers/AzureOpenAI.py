@@ -1,29 +1,51 @@
 from __future__ import annotations
 
-import os
+from dataclasses import dataclass
 
+import httpx
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 
+from Utils.CommonUtils import get_required_env
+
 load_dotenv(override=True)
 
 
-def _get_required_env(name: str) -> str:
-    value = os.getenv(name, "").strip()
-    if not value:
-        raise ValueError(f"Missing required environment variable: {name}")
-    return value
+@dataclass(frozen=True)
+class AzureOpenAISettings:
+    api_key: str
+    base_url: str
+    model_name: str
+
+
+def load_azure_openai_settings(env_prefix: str = "") -> AzureOpenAISettings:
+    return AzureOpenAISettings(
+        api_key=get_required_env(f"{env_prefix}AZURE_OPENAI_API_KEY"),
+        base_url=get_required_env(f"{env_prefix}AZURE_OPENAI_ENDPOINT"),
+        model_name=get_required_env(f"{env_prefix}AZURE_DEPLOYMENT_NAME"),
+    )
 
 
-def build_azure_openai_chat_model() -> ChatOpenAI:
-    api_key = _get_required_env("AZURE_OPENAI_API_KEY")
-    base_url = _get_required_env("AZURE_OPENAI_ENDPOINT")
-    model_name = _get_required_env("AZURE_DEPLOYMENT_NAME")
+def build_azure_openai_chat_model(
+    settings: AzureOpenAISettings | None = None,
+    *,
+    http_client: httpx.Client | None = None,
+    http_async_client: httpx.AsyncClient | None = None,
+    timeout: float | None = None,
+    max_retries: int | None = None,
+) -> ChatOpenAI:
+    resolved_settings = settings or load_azure_openai_settings()
 
     # Azure OpenAI OpenAI-compatible endpoint (/openai/v1)
     return ChatOpenAI(
-        model=model_name,
-        api_key=api_key,
-        base_url=base_url,
+        model=resolved_settings.model_name,
+        api_key=resolved_settings.api_key,
+        base_url=resolved_settings.base_url,
         use_responses_api=True,
-    )
\ No newline at end of file
+        # Streamed replies report usage (including cached prompt tokens) too.
+        stream_usage=True,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        timeout=timeout,
+        **({"max_retries": max_retries} if max_retries is not None else {}),
+    )
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+DEFAULT_BREAKER_FAILURE_THRESHOLD = 3
+DEFAULT_BREAKER_RESET_SECONDS = 30.0
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    if isinstance(
+        error,
+        (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+            httpx.TimeoutException,
+            httpx.TransportError,
+            TimeoutError,
+        ),
+    ):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = DEFAULT_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = DEFAULT_BREAKER_RESET_SECONDS,
+    ) -> None:
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def allow_request(self) -> bool:
+        return self.acquire() is not None
+
+    def acquire(self) -> str | None:
+        # Returns the state the request was admitted under; a caller admitted
+        # as the half-open trial must record an outcome or release the trial.
+        with self._lock:
+            self._refresh()
+            if self._state == BREAKER_CLOSED:
+                return BREAKER_CLOSED
+            if self._state == BREAKER_HALF_OPEN and not self._trial_in_flight:
+                # One trial request decides whether the endpoint recovered.
+                self._trial_in_flight = True
+                return BREAKER_HALF_OPEN
+            return None
+
+    def release_trial(self) -> None:
+        # The trial ended without a verdict (e.g. it was cancelled); the next
+        # request may try again.
+        with self._lock:
+            if self._state == BREAKER_HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if (
+                self._state == BREAKER_HALF_OPEN
+                or self._consecutive_failures >= self._failure_threshold
+            ):
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+
+    def _refresh(self) -> None:
+        if (
+            self._state == BREAKER_OPEN
+            and time.monotonic() - self._opened_at >= self._reset_seconds
+        ):
+            self._state = BREAKER_HALF_OPEN
+            self._trial_in_flight = False
+
+
+@dataclass
+class RoutedEndpoint:
+    name: str
+    model: BaseChatModel
+    weight: float = 1.0
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    counters: dict[str, int] = field(
+        default_factory=lambda: {
+            "requests": 0,
+            "failures": 0,
+            "rejected": 0,
+            "failovers": 0,
+        }
+    )
+
+
+class AllEndpointsUnavailableError(RuntimeError):
+    pass
+
+
+class RoutedChatModel(BaseChatModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    endpoints: list[RoutedEndpoint]
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    def endpoint_stats(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "endpoint": endpoint.name,
+                "weight": endpoint.weight,
+                "breaker": endpoint.breaker.state,
+                **endpoint.counters,
+            }
+            for endpoint in self.endpoints
+        ]
+
+    def bind_tools(
+        self,
+        tools: Sequence[dict[str, Any] | type | Callable | BaseTool],
+        **kwargs: Any,
+    ) -> Runnable:
+        # Tool definitions travel as call kwargs, so every endpoint receives
+        # the same tools whichever one ends up serving the request.
+        return self.bind(
+            tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        last_error: BaseException | None = None
+        for endpoint, trial in self._attempts():
+            try:
+                message = endpoint.model.invoke(messages, stop=stop, **kwargs)
+            except Exception as error:
+                last_error = self._handle_failure(endpoint, error)
+                continue
+            else:
+                endpoint.breaker.record_success()
+                return ChatResult(generations=[ChatGeneration(message=message)])
+            finally:
+                if trial:
+                    endpoint.breaker.release_trial()
+        raise self._exhausted(last_error)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        last_error: BaseException | None = None
+        for endpoint, trial in self._attempts():
+            try:
+                message = await endpoint.model.ainvoke(messages, stop=stop, **kwargs)
+            except Exception as error:
+                last_error = self._handle_failure(endpoint, error)
+                continue
+            else:
+                endpoint.breaker.record_success()
+                return ChatResult(generations=[ChatGeneration(message=message)])
+            finally:
+                # Covers cancellation too: it says nothing about the endpoint.
+                if trial:
+                    endpoint.breaker.release_trial()
+        raise self._exhausted(last_error)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        last_error: BaseException | None = None
+        for endpoint, trial in self._attempts():
+            started = False
+            try:
+                for chunk in endpoint.model.stream(messages, stop=stop, **kwargs):
+                    started = True
+                    generation = ChatGenerationChunk(message=chunk)
+                    if run_manager is not None:
+                        run_manager.on_llm_new_token(generation.text, chunk=generation)
+                    yield generation
+            except Exception as error:
+                # Text already shown to the user cannot be taken back, so only
+                # failures before the first chunk move on to another endpoint.
+                if started:
+                    endpoint.breaker.record_failure()
+                    raise
+                last_error = self._handle_failure(endpoint, error)
+                continue
+            else:
+                endpoint.breaker.record_success()
+                return
+            finally:
+                # Also reached when the consumer stops iterating early.
+                if trial:
+                    endpoint.breaker.release_trial()
+        raise self._exhausted(last_error)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        last_error: BaseException | None = None
+        for endpoint, trial in self._attempts():
+            started = False
+            try:
+                async for chunk in endpoint.model.astream(messages, stop=stop, **kwargs):
+                    started = True
+                    generation = ChatGenerationChunk(message=chunk)
+                    if run_manager is not None:
+                        await run_manager.on_llm_new_token(
+                            generation.text, chunk=generation
+                        )
+                    yield generation
+            except Exception as error:
+                if started:
+                    endpoint.breaker.record_failure()
+                    raise
+                last_error = self._handle_failure(endpoint, error)
+                continue
+            else:
+                endpoint.breaker.record_success()
+                return
+            finally:
+                if trial:
+                    endpoint.breaker.release_trial()
+        raise self._exhausted(last_error)
+
+    def _attempts(self) -> Iterator[tuple[RoutedEndpoint, bool]]:
+        available = [
+            endpoint
+            for endpoint in self.endpoints
+            if endpoint.breaker.state != BREAKER_OPEN
+        ]
+        if not available:
+            return
+        # The first endpoint is drawn by weight; the rest follow by weight as
+        # the failover chain.
+        first = random.choices(
+            available, weights=[max(endpoint.weight, 1e-9) for endpoint in available]
+        )[0]
+        rest = sorted(
+            (endpoint for endpoint in available if endpoint is not first),
+            key=lambda endpoint: endpoint.weight,
+            reverse=True,
+        )
+        for endpoint in (first, *rest):
+            # Checked lazily so a half-open trial is only claimed when the
+            # endpoint is actually called.
+            admitted = endpoint.breaker.acquire()
+            if admitted is None:
+                continue
+            endpoint.counters["requests"] += 1
+            yield endpoint, admitted == BREAKER_HALF_OPEN
+
+    def _handle_failure(
+        self, endpoint: RoutedEndpoint, error: Exception
+    ) -> Exception:
+        if not is_retryable_error(error):
+            # Bad requests, filtered content and auth errors come from the
+            # caller, not the deployment, so they never trip the breaker.
+            endpoint.counters["rejected"] += 1
+            raise error
+        endpoint.counters["failures"] += 1
+        endpoint.breaker.record_failure()
+        endpoint.counters["failovers"] += 1
+        return error
+
+    def _exhausted(self, last_error: BaseException | None) -> Exception:
+        if last_error is None:
+            return AllEndpointsUnavailableError(
+                "Every LLM endpoint has an open circuit breaker."
+            )
+        return AllEndpointsUnavailableError(
+            f"Every LLM endpoint failed; last error: {last_error!r}"
+        )
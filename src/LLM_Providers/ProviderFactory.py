@@ -1,20 +1,273 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from collections.abc import Callable
+import threading
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
 from typing import Final
 
-from langchain_openai import ChatOpenAI
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
 
-from LLM_Providers.AzureOpenAI import build_azure_openai_chat_model
+from LLM_Providers.AzureOpenAI import (
+    build_azure_openai_chat_model,
+    load_azure_openai_settings,
+)
+from LLM_Providers.FailoverRouting import (
+    DEFAULT_BREAKER_FAILURE_THRESHOLD,
+    DEFAULT_BREAKER_RESET_SECONDS,
+    CircuitBreaker,
+    RoutedChatModel,
+    RoutedEndpoint,
+)
+from LLM_Providers.StubProvider import build_stub_chat_model, load_stub_settings
+from Utils.CommonUtils import get_env_number
 
 DEFAULT_PROVIDER: Final[str] = "azure_openai"
 
-_PROVIDER_BUILDERS: Final[dict[str, Callable[[], ChatOpenAI]]] = {
-    "azure_openai": build_azure_openai_chat_model,
+DEFAULT_HTTP_MAX_CONNECTIONS: Final[int] = 100
+DEFAULT_HTTP_MAX_KEEPALIVE_CONNECTIONS: Final[int] = 20
+DEFAULT_HTTP_KEEPALIVE_EXPIRY_SECONDS: Final[float] = 30.0
+DEFAULT_HTTP_TIMEOUT_SECONDS: Final[float] = 60.0
+DEFAULT_HTTP_CONNECT_TIMEOUT_SECONDS: Final[float] = 10.0
+# Routed endpoints fail over instead of retrying the same endpoint.
+DEFAULT_ENDPOINT_MAX_RETRIES: Final[int] = 0
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    load_settings: Callable[[str], Hashable]
+    build: Callable[..., BaseChatModel]
+
+
+@dataclass(frozen=True)
+class EndpointSettings:
+    name: str
+    provider_name: str
+    env_prefix: str
+    weight: float
+    max_retries: int
+
+
+@dataclass(frozen=True)
+class HttpClientSettings:
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    timeout: float
+    connect_timeout: float
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+_PROVIDER_BUILDERS: Final[dict[str, ProviderSpec]] = {
+    "azure_openai": ProviderSpec(
+        load_settings=load_azure_openai_settings,
+        build=build_azure_openai_chat_model,
+    ),
+    "stub": ProviderSpec(
+        load_settings=load_stub_settings,
+        build=build_stub_chat_model,
+    ),
 }
 
 
+def load_http_client_settings() -> HttpClientSettings:
+    return HttpClientSettings(
+        max_connections=int(
+            get_env_number(
+                "LLM_HTTP_MAX_CONNECTIONS", DEFAULT_HTTP_MAX_CONNECTIONS, minimum=1
+            )
+        ),
+        max_keepalive_connections=int(
+            get_env_number(
+                "LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS",
+                DEFAULT_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            )
+        ),
+        keepalive_expiry=get_env_number(
+            "LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", DEFAULT_HTTP_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=get_env_number(
+            "LLM_HTTP_TIMEOUT_SECONDS", DEFAULT_HTTP_TIMEOUT_SECONDS, minimum=1
+        ),
+        connect_timeout=get_env_number(
+            "LLM_HTTP_CONNECT_TIMEOUT_SECONDS",
+            DEFAULT_HTTP_CONNECT_TIMEOUT_SECONDS,
+            minimum=1,
+        ),
+    )
+
+
+def _endpoint_env_prefix(endpoint_name: str) -> str:
+    return f"LLM_ENDPOINT_{endpoint_name.upper()}_"
+
+
+def load_endpoint_settings() -> list[EndpointSettings]:
+    endpoints: list[EndpointSettings] = []
+    for raw_name in os.getenv("LLM_ENDPOINTS", "").split(","):
+        name = raw_name.strip().replace("-", "_")
+        if not name:
+            continue
+        env_prefix = _endpoint_env_prefix(name)
+        endpoints.append(
+            EndpointSettings(
+                name=name,
+                provider_name=_normalize_provider_name(
+                    os.getenv(f"{env_prefix}PROVIDER") or os.getenv("LLM_PROVIDER")
+                ),
+                env_prefix=env_prefix,
+                weight=get_env_number(f"{env_prefix}WEIGHT", 1.0),
+                max_retries=int(
+                    get_env_number(
+                        f"{env_prefix}MAX_RETRIES", DEFAULT_ENDPOINT_MAX_RETRIES
+                    )
+                ),
+            )
+        )
+    return endpoints
+
+
+class ChatModelRegistry:
+    def __init__(self, http_settings: HttpClientSettings | None = None) -> None:
+        self._http_settings = http_settings or load_http_client_settings()
+        self._lock = threading.Lock()
+        self._models: dict[tuple[str, Hashable, int | None], BaseChatModel] = {}
+        self._routed_models: dict[tuple[EndpointSettings, ...], RoutedChatModel] = {}
+        self._http_client: httpx.Client | None = None
+        self._http_async_client: httpx.AsyncClient | None = None
+
+    @property
+    def http_settings(self) -> HttpClientSettings:
+        return self._http_settings
+
+    def get(
+        self,
+        provider_name: str,
+        spec: ProviderSpec,
+        *,
+        env_prefix: str = "",
+        max_retries: int | None = None,
+    ) -> BaseChatModel:
+        key = (provider_name, spec.load_settings(env_prefix), max_retries)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = spec.build(
+                    key[1],
+                    http_client=self._shared_http_client(),
+                    http_async_client=self._shared_http_async_client(),
+                    timeout=self._http_settings.timeout,
+                    max_retries=max_retries,
+                )
+                self._models[key] = model
+            return model
+
+    def get_routed(self, endpoints: list[EndpointSettings]) -> RoutedChatModel:
+        key = tuple(endpoints)
+        with self._lock:
+            routed_model = self._routed_models.get(key)
+        if routed_model is not None:
+            return routed_model
+
+        routed_endpoints = [
+            RoutedEndpoint(
+                name=endpoint.name,
+                model=self.get(
+                    endpoint.provider_name,
+                    _get_provider_spec(endpoint.provider_name),
+                    env_prefix=endpoint.env_prefix,
+                    max_retries=endpoint.max_retries,
+                ),
+                weight=endpoint.weight,
+                breaker=CircuitBreaker(
+                    failure_threshold=int(
+                        get_env_number(
+                            "LLM_BREAKER_FAILURE_THRESHOLD",
+                            DEFAULT_BREAKER_FAILURE_THRESHOLD,
+                            minimum=1,
+                        )
+                    ),
+                    reset_seconds=get_env_number(
+                        "LLM_BREAKER_RESET_SECONDS", DEFAULT_BREAKER_RESET_SECONDS
+                    ),
+                ),
+            )
+            for endpoint in endpoints
+        ]
+        with self._lock:
+            # Breaker state lives on the routed model, so concurrent callers
+            # must all end up sharing the first one built.
+            return self._routed_models.setdefault(
+                key, RoutedChatModel(endpoints=routed_endpoints)
+            )
+
+    def routed_stats(self) -> list[dict[str, object]]:
+        with self._lock:
+            routed_models = list(self._routed_models.values())
+        return [
+            stats for model in routed_models for stats in model.endpoint_stats()
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            http_async_client, self._http_async_client = self._http_async_client, None
+            self._models.clear()
+            self._routed_models.clear()
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                asyncio.run(http_async_client.aclose())
+            else:
+                raise RuntimeError(
+                    "close() cannot release the async HTTP client inside a running "
+                    "event loop; await aclose() instead."
+                )
+
+    async def aclose(self) -> None:
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            http_async_client, self._http_async_client = self._http_async_client, None
+            self._models.clear()
+            self._routed_models.clear()
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
+
+    def _shared_http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                limits=self._http_settings.limits(),
+                timeout=self._http_settings.timeouts(),
+            )
+        return self._http_client
+
+    def _shared_http_async_client(self) -> httpx.AsyncClient:
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(
+                limits=self._http_settings.limits(),
+                timeout=self._http_settings.timeouts(),
+            )
+        return self._http_async_client
+
+
+_registry = ChatModelRegistry()
+
+
 def _normalize_provider_name(provider_name: str | None) -> str:
     if not provider_name:
         return DEFAULT_PROVIDER
@@ -27,14 +280,35 @@ def get_provider_name() -> str:
     return _normalize_provider_name(os.getenv("LLM_PROVIDER"))
 
 
-def build_chat_model(provider_name: str | None = None) -> ChatOpenAI:
-    resolved_name = _normalize_provider_name(provider_name or os.getenv("LLM_PROVIDER"))
-    builder = _PROVIDER_BUILDERS.get(resolved_name)
+def get_chat_model_registry() -> ChatModelRegistry:
+    return _registry
 
-    if builder is None:
+
+def _get_provider_spec(provider_name: str) -> ProviderSpec:
+    spec = _PROVIDER_BUILDERS.get(provider_name)
+
+    if spec is None:
         supported = ", ".join(sorted(_PROVIDER_BUILDERS.keys()))
         raise ValueError(
-            f"Unsupported LLM provider: {resolved_name}. Supported providers: {supported}"
+            f"Unsupported LLM provider: {provider_name}. Supported providers: {supported}"
         )
 
-    return builder()
\ No newline at end of file
+    return spec
+
+
+def build_chat_model(provider_name: str | None = None) -> BaseChatModel:
+    if provider_name is None:
+        endpoints = load_endpoint_settings()
+        if endpoints:
+            return _registry.get_routed(endpoints)
+
+    resolved_name = _normalize_provider_name(provider_name or os.getenv("LLM_PROVIDER"))
+    return _registry.get(resolved_name, _get_provider_spec(resolved_name))
+
+
+def close_chat_models() -> None:
+    _registry.close()
+
+
+async def aclose_chat_models() -> None:
+    await _registry.aclose()
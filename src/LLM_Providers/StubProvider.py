@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import random
+import time
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from Utils.CommonUtils import get_env_number
+
+DEFAULT_STUB_LATENCY_MS = 200
+DEFAULT_STUB_TOKENS_PER_SECOND = 50
+DEFAULT_STUB_REPLY_TOKENS = 40
+
+_STUB_REPLY_WORDS = (
+    "I", "hear", "you", "and", "that", "sounds", "like", "a", "lot", "to", "carry",
+    "today", "it", "makes", "sense", "to", "feel", "this", "way", "you", "are",
+    "not", "alone", "in", "this", "take", "a", "slow", "breath", "with", "me",
+)
+
+
+@dataclass(frozen=True)
+class StubSettings:
+    latency_ms: int
+    tokens_per_second: int
+    reply_tokens: int
+    error_rate: float
+
+
+def load_stub_settings(env_prefix: str = "") -> StubSettings:
+    return StubSettings(
+        latency_ms=int(
+            get_env_number(f"{env_prefix}STUB_LLM_LATENCY_MS", DEFAULT_STUB_LATENCY_MS)
+        ),
+        tokens_per_second=int(
+            get_env_number(
+                f"{env_prefix}STUB_LLM_TOKENS_PER_SECOND",
+                DEFAULT_STUB_TOKENS_PER_SECOND,
+                minimum=1,
+            )
+        ),
+        reply_tokens=int(
+            get_env_number(
+                f"{env_prefix}STUB_LLM_REPLY_TOKENS",
+                DEFAULT_STUB_REPLY_TOKENS,
+                minimum=1,
+            )
+        ),
+        error_rate=min(1.0, get_env_number(f"{env_prefix}STUB_LLM_ERROR_RATE", 0.0)),
+    )
+
+
+class StubChatModel(BaseChatModel):
+    latency_ms: int = DEFAULT_STUB_LATENCY_MS
+    tokens_per_second: int = DEFAULT_STUB_TOKENS_PER_SECOND
+    reply_tokens: int = DEFAULT_STUB_REPLY_TOKENS
+    error_rate: float = 0.0
+    reply_text: str | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        time.sleep(self._total_seconds(len(tokens)))
+        return self._result(messages, tokens)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        await asyncio.sleep(self._total_seconds(len(tokens)))
+        return self._result(messages, tokens)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = self._reply_tokens(messages)
+        time.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(messages, tokens):
+            time.sleep(1 / self.tokens_per_second)
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Any = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._reply_tokens(messages)
+        await asyncio.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(messages, tokens):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def _reply_tokens(self, messages: list[BaseMessage]) -> list[str]:
+        if self.error_rate and random.random() < self.error_rate:
+            # Looks like a provider timeout so failover paths can be exercised.
+            raise openai.APITimeoutError(request=httpx.Request("POST", "stub://chat"))
+        if self.reply_text is not None:
+            return self.reply_text.split(" ")
+        # Seeded by the prompt so the same conversation always gets the same
+        # reply, which keeps benchmark runs comparable.
+        seed = hashlib.blake2b(
+            str(messages[-1].content if messages else "").encode("utf-8"), digest_size=8
+        ).digest()
+        rng = random.Random(seed)
+        tokens = [rng.choice(_STUB_REPLY_WORDS) for _ in range(self.reply_tokens)]
+        tokens[-1] += "?"
+        return tokens
+
+    def _total_seconds(self, token_count: int) -> float:
+        return self.latency_ms / 1000 + token_count / self.tokens_per_second
+
+    def _usage(self, messages: list[BaseMessage], token_count: int) -> dict[str, int]:
+        input_tokens = sum(len(str(message.content).split()) for message in messages)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": token_count,
+            "total_tokens": input_tokens + token_count,
+        }
+
+    def _result(self, messages: list[BaseMessage], tokens: list[str]) -> ChatResult:
+        message = AIMessage(
+            content=" ".join(tokens),
+            usage_metadata=self._usage(messages, len(tokens)),
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(
+        self, messages: list[BaseMessage], tokens: list[str]
+    ) -> Iterator[ChatGenerationChunk]:
+        for index, token in enumerate(tokens):
+            last = index == len(tokens) - 1
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=token if index == 0 else f" {token}",
+                    usage_metadata=self._usage(messages, len(tokens)) if last else None,
+                )
+            )
+
+
+def build_stub_chat_model(
+    settings: StubSettings | None = None,
+    *,
+    http_client: httpx.Client | None = None,
+    http_async_client: httpx.AsyncClient | None = None,
+    timeout: float | None = None,
+    max_retries: int | None = None,
+) -> StubChatModel:
+    resolved_settings = settings or load_stub_settings()
+    return StubChatModel(
+        latency_ms=resolved_settings.latency_ms,
+        tokens_per_second=resolved_settings.tokens_per_second,
+        reply_tokens=resolved_settings.reply_tokens,
+        error_rate=resolved_settings.error_rate,
+    )
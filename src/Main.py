@@ -3,38 +3,50 @@ from __future__ import annotations
 from pathlib import Path
 
 from Agents.FriendAgent import build_friend_agent
+from LLM_Providers.ProviderFactory import close_chat_models
 from Personalization.MemoryStore import MemoryStore
 from Personalization.PromptBuilder import build_personalized_system_prompt
 
 
 def main() -> None:
+    try:
+        _run()
+    finally:
+        close_chat_models()
+
+
+def _run() -> None:
     project_root = Path(__file__).resolve().parents[1]
     memory_store = MemoryStore(memory_dir=project_root / "Memory")
-    user_id = memory_store.default_user_id
-    agent = build_friend_agent()
-    query = input("You: ").strip()
-    if not query:
-        print("No input provided.")
-        return
-    memory_store.append_message(user_id, "user", query)
-    recent_context = memory_store.get_recent_context_messages(user_id)
-    personalization_profile = memory_store.load_personalization_profile(user_id)
-    system_prompt = build_personalized_system_prompt(
-        agent.base_system_prompt, personalization_profile
-    )
-    response_text = agent.invoke(
-        {"messages": recent_context}, system_prompt=system_prompt
-    )
-
-    if response_text:
-        memory_store.append_message(user_id, "assistant", response_text)
-        try:
-            memory_store.update_personalization_profile_if_needed(user_id)
-        except Exception:
-            print("Failed to update personalization profile summary.")
-        print(response_text)
-    else:
-        print("No response received from the agent.")
+    try:
+        user_id = memory_store.default_user_id
+        agent = build_friend_agent()
+        query = input("You: ").strip()
+        if not query:
+            print("No input provided.")
+            return
+        turn = memory_store.prepare_turn(
+            user_id,
+            lambda profile: build_personalized_system_prompt(
+                agent.base_system_prompt, profile
+            ),
+            user_messages=[query],
+        )
+        response_text = agent.invoke(
+            {"messages": turn.messages}, system_prompt=turn.system_prompt
+        )
+
+        if response_text:
+            memory_store.append_message(user_id, "assistant", response_text)
+            try:
+                memory_store.update_personalization_profile_if_needed(user_id)
+            except Exception:
+                print("Failed to update personalization profile summary.")
+            print(response_text)
+        else:
+            print("No response received from the agent.")
+    finally:
+        memory_store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Any
+
+from Utils.TokenCounter import MESSAGE_OVERHEAD_TOKENS, count_message_tokens, count_tokens
+
+
+OVERFLOW_SUMMARY_HEADER = "Earlier in this conversation (condensed):"
+OVERFLOW_SNIPPET_MAX_CHARS = 160
+
+
+def select_context_messages(
+    messages: list[dict[str, Any]], *, token_budget: int, reserved_tokens: int = 0
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    available_tokens = token_budget - reserved_tokens
+    selected: list[dict[str, Any]] = []
+    used_tokens = 0
+    for message in reversed(messages):
+        message_tokens = count_message_tokens(message)
+        # The newest message is always kept so the model sees what it is
+        # replying to, even when it alone exceeds the budget.
+        if selected and used_tokens + message_tokens > available_tokens:
+            break
+        selected.append(message)
+        used_tokens += message_tokens
+    selected.reverse()
+    overflow = messages[: len(messages) - len(selected)]
+    return selected, overflow
+
+
+def build_overflow_summary(
+    overflow: list[dict[str, Any]], *, token_budget: int
+) -> dict[str, str] | None:
+    available_tokens = (
+        token_budget - count_tokens(OVERFLOW_SUMMARY_HEADER) - MESSAGE_OVERHEAD_TOKENS
+    )
+    lines: list[str] = []
+    for message in reversed(overflow):
+        line = f"- {message['role']}: {_snippet(message['content'])}"
+        line_tokens = count_tokens(line)
+        if line_tokens > available_tokens:
+            break
+        lines.append(line)
+        available_tokens -= line_tokens
+    if not lines:
+        return None
+    lines.reverse()
+    return {
+        "role": "system",
+        "content": "\n".join([OVERFLOW_SUMMARY_HEADER, *lines]),
+    }
+
+
+def _snippet(content: str) -> str:
+    collapsed = " ".join(content.split())
+    if len(collapsed) <= OVERFLOW_SNIPPET_MAX_CHARS:
+        return collapsed
+    return collapsed[: OVERFLOW_SNIPPET_MAX_CHARS - 3].rstrip() + "..."
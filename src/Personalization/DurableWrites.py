@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import atexit
+import contextlib
+import os
+import threading
+from pathlib import Path
+
+
+FSYNC_ALWAYS = "always"
+FSYNC_BATCHED = "batched"
+FSYNC_NEVER = "never"
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_BATCHED, FSYNC_NEVER)
+
+# Writes are group-committed: a turn's user message and reply land in one
+# atomic write and fsync. The cost is that a crash can lose up to one window
+# of writes; the "always" policy writes through instead.
+DEFAULT_FSYNC_POLICY = FSYNC_BATCHED
+DEFAULT_GROUP_COMMIT_WINDOW_MS = 30
+
+
+def atomic_write_bytes(path: Path, payload: bytes, *, fsync: bool = False) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        with temp_path.open("wb") as handle:
+            handle.write(payload)
+            if fsync:
+                handle.flush()
+                os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            temp_path.unlink()
+        raise
+    if fsync:
+        _fsync_directory(path.parent)
+
+
+def fsync_path(path: Path) -> None:
+    with contextlib.suppress(FileNotFoundError), path.open("rb") as handle:
+        os.fsync(handle.fileno())
+
+
+def _fsync_directory(directory: Path) -> None:
+    # The rename is only durable once the directory entry is flushed; not
+    # every platform allows opening a directory, so this is best effort.
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        *,
+        fsync_policy: str = DEFAULT_FSYNC_POLICY,
+        window_seconds: float = DEFAULT_GROUP_COMMIT_WINDOW_MS / 1000,
+    ) -> None:
+        normalized = fsync_policy.strip().lower()
+        if normalized not in FSYNC_POLICIES:
+            supported = ", ".join(FSYNC_POLICIES)
+            raise ValueError(
+                f"Unsupported fsync policy: {normalized}. Supported: {supported}"
+            )
+        self._fsync_policy = normalized
+        self._window_seconds = max(0.0, window_seconds)
+        self._pending: dict[Path, bytes] = {}
+        self._unsynced: set[Path] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._counters = {"writes": 0, "coalesced": 0, "flushes": 0, "fsyncs": 0}
+        if self.buffered:
+            # Buffered writes must not be lost when the process exits without
+            # an explicit close.
+            atexit.register(self.flush)
+
+    @property
+    def fsync_policy(self) -> str:
+        return self._fsync_policy
+
+    @property
+    def buffered(self) -> bool:
+        return self._fsync_policy != FSYNC_ALWAYS and self._window_seconds > 0
+
+    def write(self, path: Path, payload: bytes) -> None:
+        if not self.buffered:
+            self.write_through(path, payload)
+            return
+        with self._lock:
+            self._counters["writes"] += 1
+            if path in self._pending:
+                self._counters["coalesced"] += 1
+            self._pending[path] = payload
+            self._schedule_flush()
+
+    def write_through(self, path: Path, payload: bytes) -> None:
+        fsync = self._fsync_policy != FSYNC_NEVER
+        atomic_write_bytes(path, payload, fsync=fsync)
+        with self._lock:
+            self._counters["writes"] += 1
+            self._counters["fsyncs"] += int(fsync)
+
+    def read(self, path: Path) -> bytes | None:
+        with self._lock:
+            return self._pending.get(path)
+
+    def pending_paths(self) -> list[Path]:
+        with self._lock:
+            return list(self._pending)
+
+    def mark_appended(self, path: Path) -> None:
+        if self._fsync_policy == FSYNC_NEVER:
+            return
+        if not self.buffered:
+            fsync_path(path)
+            with self._lock:
+                self._counters["fsyncs"] += 1
+            return
+        with self._lock:
+            self._unsynced.add(path)
+            self._schedule_flush()
+
+    def flush(self) -> None:
+        # Flushes are serialized so an older snapshot can never land on disk
+        # after a newer one for the same path.
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                pending = dict(self._pending)
+                unsynced = self._unsynced - pending.keys()
+                self._unsynced = set()
+            fsync = self._fsync_policy == FSYNC_BATCHED
+            for path, payload in pending.items():
+                atomic_write_bytes(path, payload, fsync=fsync)
+                with self._lock:
+                    if self._pending.get(path) is payload:
+                        del self._pending[path]
+            for path in unsynced:
+                fsync_path(path)
+            with self._lock:
+                if pending or unsynced:
+                    self._counters["flushes"] += 1
+                self._counters["fsyncs"] += (len(pending) if fsync else 0) + len(unsynced)
+
+    def close(self) -> None:
+        self.flush()
+        if self.buffered:
+            atexit.unregister(self.flush)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"pending": len(self._pending), **self._counters}
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            return
+        # Shutdown is covered by close() and the atexit flush, so the timer
+        # never holds the interpreter open.
+        self._timer = threading.Timer(self._window_seconds, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
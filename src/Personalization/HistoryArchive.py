@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import gzip
+import json
+import re
+import shutil
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from Personalization.DurableWrites import atomic_write_bytes
+
+
+ARCHIVE_DIR_NAME = "archive"
+DEFAULT_ARCHIVE_COMPRESSION = "gzip"
+
+_SEGMENT_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+_SEGMENT_NAME_PATTERN = re.compile(r"^(\d+)-(\d+)\.jsonl\.(gz|zst)$")
+
+
+def _load_zstandard():
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ValueError(
+            "zstd archive compression requires the 'zstandard' package."
+        ) from error
+    return zstandard
+
+
+class HistoryArchive:
+    def __init__(
+        self, archive_dir: Path, *, compression: str = DEFAULT_ARCHIVE_COMPRESSION
+    ) -> None:
+        normalized = compression.strip().lower()
+        if normalized not in _SEGMENT_SUFFIXES:
+            supported = ", ".join(sorted(_SEGMENT_SUFFIXES))
+            raise ValueError(
+                f"Unsupported archive compression: {normalized}. Supported: {supported}"
+            )
+        if normalized == "zstd":
+            _load_zstandard()
+        self._archive_dir = archive_dir
+        self._compression = normalized
+
+    def write_segment(self, user_id: str, messages: list[dict[str, Any]]) -> Path | None:
+        message_ids = [
+            message["id"] for message in messages if isinstance(message.get("id"), int)
+        ]
+        if not message_ids:
+            return None
+        user_dir = self._archive_dir / user_id
+        user_dir.mkdir(parents=True, exist_ok=True)
+        suffix = _SEGMENT_SUFFIXES[self._compression]
+        path = user_dir / f"{min(message_ids):010d}-{max(message_ids):010d}{suffix}"
+        payload = "".join(
+            json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for message in messages
+        ).encode("utf-8")
+        # Always synced: the live record drops these messages right after.
+        atomic_write_bytes(path, self._compress(payload), fsync=True)
+        return path
+
+    def get_messages(
+        self, user_id: str, *, before_message_id: int | None = None, limit: int = 50
+    ) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        page: list[dict[str, Any]] = []
+        # Segments are visited newest first and only decompressed when the
+        # requested page reaches into them.
+        for first_id, _, path in reversed(self._segments(user_id)):
+            if before_message_id is not None and first_id >= before_message_id:
+                continue
+            segment_messages = [
+                message
+                for message in self._read_segment(path)
+                if before_message_id is None
+                or (isinstance(message.get("id"), int) and message["id"] < before_message_id)
+            ]
+            page[:0] = segment_messages
+            if len(page) >= limit:
+                break
+        return page[-limit:]
+
+    def iter_messages(self, user_id: str) -> Iterator[dict[str, Any]]:
+        for _, _, path in self._segments(user_id):
+            yield from self._read_segment(path)
+
+    def segment_count(self, user_id: str) -> int:
+        return len(self._segments(user_id))
+
+    def delete_user(self, user_id: str) -> None:
+        shutil.rmtree(self._archive_dir / user_id, ignore_errors=True)
+
+    def _segments(self, user_id: str) -> list[tuple[int, int, Path]]:
+        user_dir = self._archive_dir / user_id
+        if not user_dir.is_dir():
+            return []
+        segments: list[tuple[int, int, Path]] = []
+        for path in user_dir.iterdir():
+            match = _SEGMENT_NAME_PATTERN.match(path.name)
+            if match:
+                segments.append((int(match.group(1)), int(match.group(2)), path))
+        segments.sort()
+        return segments
+
+    def _read_segment(self, path: Path) -> list[dict[str, Any]]:
+        raw = path.read_bytes()
+        if path.name.endswith(".zst"):
+            content = _load_zstandard().ZstdDecompressor().decompress(raw)
+        else:
+            content = gzip.decompress(raw)
+        messages: list[dict[str, Any]] = []
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(message, dict):
+                messages.append(message)
+        return messages
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self._compression == "zstd":
+            return _load_zstandard().ZstdCompressor().compress(payload)
+        return gzip.compress(payload)
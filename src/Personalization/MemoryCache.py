@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+class LruTtlCache:
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max(0, max_entries)
+        self._ttl_seconds = max(0.0, ttl_seconds)
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+
+    def get(self, key: str) -> Any | None:
+        return self._lookup(key, record=True)
+
+    def peek(self, key: str) -> Any | None:
+        return self._lookup(key, record=False)
+
+    def _lookup(self, key: str, *, record: bool) -> Any | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self._ttl_seconds and time.monotonic() - stored_at > self._ttl_seconds:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                if record:
+                    self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self._hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import asyncio
+import copy
 import json
 import os
 import re
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
@@ -10,28 +14,99 @@ from typing import Any
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from LLM_Providers.ProviderFactory import build_chat_model
+from Personalization.ContextWindow import (
+    build_overflow_summary,
+    select_context_messages,
+)
+from Personalization.DurableWrites import (
+    DEFAULT_FSYNC_POLICY,
+    DEFAULT_GROUP_COMMIT_WINDOW_MS,
+)
+from Personalization.HistoryArchive import (
+    ARCHIVE_DIR_NAME,
+    DEFAULT_ARCHIVE_COMPRESSION,
+    HistoryArchive,
+)
+from Personalization.MemoryCache import LruTtlCache
+from Personalization.ProfileUpdatePolicy import (
+    DEFAULT_IDLE_SECONDS,
+    DEFAULT_MAX_USER_MESSAGES,
+    DEFAULT_MIN_NEW_TOKENS,
+    ProfileUpdatePolicy,
+)
+from Personalization.ProfileDelta import (
+    DEFAULT_PROFILE_MAX_ITEMS,
+    DEFAULT_PROFILE_MAX_NOTES,
+    EVICTED_ITEM_LABELS,
+    PROFILE_LIST_FIELDS,
+    apply_field_delta,
+    normalize_profile_delta,
+)
+from Personalization.PromptBuilder import (
+    DEFAULT_PROMPT_MAX_CHARS,
+    DEFAULT_PROMPT_MAX_NOTES,
+    attach_prompt_block,
+    render_retrieved_memories,
+)
+from Personalization.RetrievalIndex import (
+    DEFAULT_RETRIEVAL_DIMENSIONS,
+    DEFAULT_RETRIEVAL_MODE,
+    DEFAULT_RETRIEVAL_TOP_K,
+    RETRIEVAL_INDEX_DIR_NAME,
+    RetrievalIndex,
+)
+from Personalization.Serializers import DEFAULT_SERIALIZER
+from Personalization.StorageBackends import (
+    RECENT_CONTEXT_VERSION,
+    MemoryBackend,
+    TimedMemoryBackend,
+    build_memory_backend,
+)
 from Utils.AgentUtils import extract_message_text
+from Utils.CommonUtils import get_env_bool, get_env_int
+from Utils.Metrics import get_metrics
+from Utils.TokenCounter import MESSAGE_OVERHEAD_TOKENS, count_tokens
 
 
 DEFAULT_MEMORY_DIR = "Memory"
-DEFAULT_RECENT_CONTEXT_MAX_MESSAGES = 20
-DEFAULT_PERSONALIZATION_PROFILE_UPDATE_EVERY_USER_MESSAGES = 1
+DEFAULT_RECENT_CONTEXT_MAX_MESSAGES = 40
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+DEFAULT_CONTEXT_OVERFLOW_SUMMARY_TOKENS = 0
+DEFAULT_PERSONALIZATION_PROFILE_UPDATE_EVERY_USER_MESSAGES = DEFAULT_MAX_USER_MESSAGES
+DEFAULT_BULK_SUMMARY_CHUNK_SIZE = 256
+DEFAULT_BULK_SUMMARY_MAX_CONCURRENCY = 8
 DEFAULT_USER_ID = "cli"
+DEFAULT_STORAGE_MODE = "json"
+DEFAULT_CACHE_MAX_USERS = 1024
+DEFAULT_CACHE_TTL_SECONDS = 300
+DEFAULT_HOT_TAIL_MESSAGES = 200
+DEFAULT_COMPACTION_THRESHOLD_MESSAGES = 400
+DEFAULT_ARCHIVE_PAGE_SIZE = 50
 
-RECENT_CONTEXT_DIR_NAME = "recent_context"
-PERSONALIZATION_PROFILE_DIR_NAME = "personalization_profile"
+# The cached recent-context window keeps a little more than the prompt needs
+# so unsummarized messages can usually be served without touching storage.
+RECENT_CONTEXT_CACHE_WINDOW_FACTOR = 2
 
-RECENT_CONTEXT_VERSION = 1
 PERSONALIZATION_PROFILE_VERSION = 1
 
 SUMMARY_SYSTEM_PROMPT = (
     "You update a user's long-term memory profile for a supportive chat agent. "
-    "Return only valid JSON. Do not include markdown or extra text. "
-    "The JSON must include these keys: summary (string), preferences (array of strings), "
-    "dislikes (array of strings), important_people (array of strings), "
-    "boundaries (array of strings), notes (array of strings). "
-    "Use empty arrays when unknown."
+    "Return only valid JSON describing what the new messages change; never repeat "
+    "unchanged items. Do not include markdown or extra text. "
+    "Optional keys: summary (string, only when the summary should be rewritten), and "
+    "preferences, dislikes, important_people, boundaries, notes, each an object with "
+    "optional add (array of new strings), remove (array of existing strings that are "
+    'no longer true) and update (array of {"from": existing string, "to": corrected '
+    "string}). Omit fields that did not change; return {} when nothing changed."
+)
+
+ROLLING_SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a long conversation between a user and a "
+    "supportive chat agent. Combine the previous summary with the older messages "
+    "and return a concise plain-text summary of what was discussed, decisions made "
+    "and open threads. Do not include markdown."
 )
+ROLLING_SUMMARY_PREFIX = "Summary of the earlier conversation:"
 
 _SAFE_USER_ID_PATTERN = re.compile(r"[^A-Za-z0-9_.-]")
 
@@ -45,21 +120,36 @@ def _utc_now_iso() -> str:
     )
 
 
-def _utc_now_compact() -> str:
-    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+def _trailing_user_message_count(messages: list[dict[str, Any]]) -> int:
+    count = 0
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            break
+        count += 1
+    return count
+
+
+@dataclass(frozen=True)
+class ProfileUpdateSnapshot:
+    user_id: str
+    profile: dict[str, Any]
+    new_messages: list[dict[str, Any]]
+    trigger: str
+
+
+@dataclass(frozen=True)
+class PreparedTurn:
+    user_id: str
+    profile: dict[str, Any]
+    system_prompt: str
+    messages: list[dict[str, str]]
 
 
-def _get_env_int(name: str, default: int, *, minimum: int = 1) -> int:
-    raw_value = os.getenv(name, "").strip()
-    if not raw_value:
-        return default
-    try:
-        parsed = int(raw_value)
-    except ValueError:
-        return default
-    if parsed < minimum:
-        return default
-    return parsed
+@dataclass(frozen=True)
+class CompactionPlan:
+    user_id: str
+    archived_messages: list[dict[str, Any]]
+    previous_summary: str
 
 
 class MemoryStore:
@@ -68,7 +158,23 @@ class MemoryStore:
         memory_dir: str | Path | None = None,
         *,
         recent_context_max_messages: int | None = None,
+        context_token_budget: int | None = None,
+        context_overflow_summary_tokens: int | None = None,
         personalization_profile_update_every_user_messages: int | None = None,
+        storage_mode: str | None = None,
+        backend: MemoryBackend | None = None,
+        cache_max_users: int | None = None,
+        cache_ttl_seconds: int | None = None,
+        profile_update_policy: ProfileUpdatePolicy | None = None,
+        hot_tail_messages: int | None = None,
+        compaction_threshold_messages: int | None = None,
+        archive_compression: str | None = None,
+        retrieval_mode: str | None = None,
+        retrieval_top_k: int | None = None,
+        profile_max_items: int | None = None,
+        profile_max_notes: int | None = None,
+        prompt_max_notes: int | None = None,
+        prompt_max_chars: int | None = None,
     ) -> None:
         resolved_dir = (
             Path(memory_dir)
@@ -76,103 +182,461 @@ class MemoryStore:
             else Path(os.getenv("MEMORY_DIR", DEFAULT_MEMORY_DIR))
         )
         self._memory_dir = resolved_dir
-        self._recent_context_dir = self._memory_dir / RECENT_CONTEXT_DIR_NAME
-        self._personalization_profile_dir = (
-            self._memory_dir / PERSONALIZATION_PROFILE_DIR_NAME
-        )
-        self._recent_context_dir.mkdir(parents=True, exist_ok=True)
-        self._personalization_profile_dir.mkdir(parents=True, exist_ok=True)
+        if backend is None:
+            resolved_mode = (
+                (storage_mode or os.getenv("MEMORY_STORAGE_MODE") or DEFAULT_STORAGE_MODE)
+                .strip()
+                .lower()
+            )
+            sqlite_path = os.getenv("MEMORY_SQLITE_PATH", "").strip()
+            backend = build_memory_backend(
+                resolved_mode,
+                self._memory_dir,
+                sqlite_path=Path(sqlite_path) if sqlite_path else None,
+                fsync_policy=os.getenv("MEMORY_FSYNC_POLICY") or DEFAULT_FSYNC_POLICY,
+                group_commit_window_ms=get_env_int(
+                    "MEMORY_GROUP_COMMIT_WINDOW_MS",
+                    DEFAULT_GROUP_COMMIT_WINDOW_MS,
+                    minimum=0,
+                ),
+                serializer=os.getenv("MEMORY_SERIALIZER") or DEFAULT_SERIALIZER,
+            )
+        metrics = get_metrics()
+        if metrics.enabled:
+            backend = TimedMemoryBackend(backend, metrics)
+        self._backend = backend
 
         self._recent_context_max_messages = (
             recent_context_max_messages
             if recent_context_max_messages is not None
-            else _get_env_int(
+            else get_env_int(
                 "MEMORY_SHORT_TERM_MAX_MESSAGES", DEFAULT_RECENT_CONTEXT_MAX_MESSAGES
             )
         )
-        self._personalization_profile_update_every_user_messages = (
-            personalization_profile_update_every_user_messages
-            if personalization_profile_update_every_user_messages is not None
-            else _get_env_int(
-                "MEMORY_LONG_TERM_UPDATE_EVERY_USER_MESSAGES",
-                DEFAULT_PERSONALIZATION_PROFILE_UPDATE_EVERY_USER_MESSAGES,
+        # The message count is only a ceiling; the token budget decides how
+        # much of that window actually goes into the prompt.
+        self._context_token_budget = (
+            context_token_budget
+            if context_token_budget is not None
+            else get_env_int(
+                "MEMORY_CONTEXT_TOKEN_BUDGET", DEFAULT_CONTEXT_TOKEN_BUDGET, minimum=0
+            )
+        )
+        self._context_overflow_summary_tokens = (
+            context_overflow_summary_tokens
+            if context_overflow_summary_tokens is not None
+            else get_env_int(
+                "MEMORY_CONTEXT_OVERFLOW_SUMMARY_TOKENS",
+                DEFAULT_CONTEXT_OVERFLOW_SUMMARY_TOKENS,
+                minimum=0,
+            )
+        )
+        self._profile_update_policy = profile_update_policy or ProfileUpdatePolicy(
+            max_user_messages=(
+                personalization_profile_update_every_user_messages
+                if personalization_profile_update_every_user_messages is not None
+                else get_env_int(
+                    "MEMORY_LONG_TERM_UPDATE_EVERY_USER_MESSAGES",
+                    DEFAULT_PERSONALIZATION_PROFILE_UPDATE_EVERY_USER_MESSAGES,
+                )
+            ),
+            min_new_tokens=get_env_int(
+                "MEMORY_LONG_TERM_UPDATE_MIN_NEW_TOKENS",
+                DEFAULT_MIN_NEW_TOKENS,
+                minimum=0,
+            ),
+            idle_seconds=get_env_int(
+                "MEMORY_LONG_TERM_UPDATE_IDLE_SECONDS", DEFAULT_IDLE_SECONDS, minimum=0
+            ),
+            detect_profile_statements=get_env_bool(
+                "MEMORY_LONG_TERM_UPDATE_DETECT_STATEMENTS", True
+            ),
+        )
+        # Per-field caps on the profile; 0 disables a cap.
+        self._profile_max_items = (
+            profile_max_items
+            if profile_max_items is not None
+            else get_env_int(
+                "MEMORY_PROFILE_MAX_ITEMS", DEFAULT_PROFILE_MAX_ITEMS, minimum=0
+            )
+        )
+        self._profile_max_notes = (
+            profile_max_notes
+            if profile_max_notes is not None
+            else get_env_int(
+                "MEMORY_PROFILE_MAX_NOTES", DEFAULT_PROFILE_MAX_NOTES, minimum=0
+            )
+        )
+        self._prompt_max_notes = (
+            prompt_max_notes
+            if prompt_max_notes is not None
+            else get_env_int(
+                "PERSONALIZATION_PROMPT_MAX_NOTES", DEFAULT_PROMPT_MAX_NOTES, minimum=0
+            )
+        )
+        self._prompt_max_chars = (
+            prompt_max_chars
+            if prompt_max_chars is not None
+            else get_env_int(
+                "PERSONALIZATION_PROMPT_MAX_CHARS", DEFAULT_PROMPT_MAX_CHARS
             )
         )
         self._default_user_id = os.getenv("MEMORY_DEFAULT_USER_ID", DEFAULT_USER_ID)
 
+        resolved_cache_max_users = (
+            cache_max_users
+            if cache_max_users is not None
+            else get_env_int(
+                "MEMORY_CACHE_MAX_USERS", DEFAULT_CACHE_MAX_USERS, minimum=0
+            )
+        )
+        resolved_cache_ttl_seconds = (
+            cache_ttl_seconds
+            if cache_ttl_seconds is not None
+            else get_env_int(
+                "MEMORY_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS, minimum=0
+            )
+        )
+        self._recent_context_cache = LruTtlCache(
+            resolved_cache_max_users, resolved_cache_ttl_seconds
+        )
+        self._profile_cache = LruTtlCache(
+            resolved_cache_max_users, resolved_cache_ttl_seconds
+        )
+        self._recent_context_cache_window = (
+            self._recent_context_max_messages * RECENT_CONTEXT_CACHE_WINDOW_FACTOR
+        )
+
+        # The live record never shrinks below the cached window, so compaction
+        # cannot pull messages out from under the prompt.
+        self._hot_tail_messages = max(
+            self._recent_context_cache_window,
+            hot_tail_messages
+            if hot_tail_messages is not None
+            else get_env_int("MEMORY_HOT_TAIL_MESSAGES", DEFAULT_HOT_TAIL_MESSAGES),
+        )
+        self._compaction_threshold_messages = (
+            compaction_threshold_messages
+            if compaction_threshold_messages is not None
+            else get_env_int(
+                "MEMORY_COMPACTION_THRESHOLD_MESSAGES",
+                DEFAULT_COMPACTION_THRESHOLD_MESSAGES,
+                minimum=0,
+            )
+        )
+        self._history_archive = HistoryArchive(
+            self._memory_dir / ARCHIVE_DIR_NAME,
+            compression=(
+                archive_compression
+                or os.getenv("MEMORY_ARCHIVE_COMPRESSION")
+                or DEFAULT_ARCHIVE_COMPRESSION
+            ),
+        )
+        self._retrieval_index = RetrievalIndex(
+            self._memory_dir / RETRIEVAL_INDEX_DIR_NAME,
+            mode=(
+                retrieval_mode
+                or os.getenv("MEMORY_RETRIEVAL_MODE")
+                or DEFAULT_RETRIEVAL_MODE
+            ),
+            dimensions=get_env_int(
+                "MEMORY_RETRIEVAL_DIMENSIONS", DEFAULT_RETRIEVAL_DIMENSIONS
+            ),
+        )
+        self._retrieval_top_k = (
+            retrieval_top_k
+            if retrieval_top_k is not None
+            else get_env_int(
+                "MEMORY_RETRIEVAL_TOP_K", DEFAULT_RETRIEVAL_TOP_K, minimum=0
+            )
+        )
+
+    @property
+    def storage_mode(self) -> str:
+        return self._backend.name
+
+    @property
+    def backend(self) -> MemoryBackend:
+        return self._backend
+
+    @property
+    def profile_update_policy(self) -> ProfileUpdatePolicy:
+        return self._profile_update_policy
+
+    @property
+    def compaction_enabled(self) -> bool:
+        return self._compaction_threshold_messages > 0
+
+    @property
+    def retrieval_index(self) -> RetrievalIndex:
+        return self._retrieval_index
+
+    def flush(self) -> None:
+        self._backend.flush()
+
+    def close(self) -> None:
+        self._backend.close()
+        self._retrieval_index.close()
+
+    def cache_stats(self) -> dict[str, dict[str, int]]:
+        return {
+            "recent_context": self._recent_context_cache.stats(),
+            "personalization_profile": self._profile_cache.stats(),
+        }
+
     @property
     def default_user_id(self) -> str:
         return self._safe_user_id(self._default_user_id) or DEFAULT_USER_ID
 
-    def get_recent_context_messages(self, user_id: str) -> list[dict[str, str]]:
-        recent_context = self.load_recent_context(user_id)
-        messages = recent_context.get("messages", [])
-        if not isinstance(messages, list):
-            return []
-        tail = messages[-self._recent_context_max_messages :]
-        context: list[dict[str, str]] = []
-        for message in tail:
-            if not isinstance(message, dict):
-                continue
-            role = message.get("role")
-            content = message.get("content")
-            if isinstance(role, str) and isinstance(content, str) and content.strip():
-                context.append({"role": role, "content": content})
+    def get_recent_context_messages(
+        self,
+        user_id: str,
+        *,
+        system_prompt: str | None = None,
+        retrieve: bool = False,
+    ) -> list[dict[str, str]]:
+        resolved_user_id = self._safe_user_id(user_id)
+        window = self._recent_context_window(resolved_user_id)
+        cached_messages = window["messages"]
+        rolling_summary = self._rolling_summary_message(window.get("rolling_summary"))
+        tail = [
+            message
+            for message in cached_messages[-self._recent_context_max_messages :]
+            if isinstance(message, dict)
+            and isinstance(message.get("role"), str)
+            and isinstance(message.get("content"), str)
+            and message["content"].strip()
+        ]
+        retrieved_memories = (
+            self._retrieved_memories_message(resolved_user_id, tail) if retrieve else None
+        )
+        overflow_summary = None
+        if self._context_token_budget:
+            reserved_tokens = sum(
+                count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+                for text in (
+                    system_prompt,
+                    rolling_summary["content"] if rolling_summary else None,
+                    retrieved_memories["content"] if retrieved_memories else None,
+                )
+                if text
+            )
+            selected, overflow = select_context_messages(
+                tail,
+                token_budget=self._context_token_budget,
+                reserved_tokens=reserved_tokens,
+            )
+            if overflow and self._context_overflow_summary_tokens:
+                selected, overflow = select_context_messages(
+                    tail,
+                    token_budget=self._context_token_budget,
+                    reserved_tokens=reserved_tokens
+                    + self._context_overflow_summary_tokens,
+                )
+                overflow_summary = build_overflow_summary(
+                    overflow, token_budget=self._context_overflow_summary_tokens
+                )
+            tail = selected
+        context: list[dict[str, str]] = [
+            {"role": message["role"], "content": message["content"]} for message in tail
+        ]
+        if overflow_summary is not None:
+            context.insert(0, overflow_summary)
+        if rolling_summary is not None:
+            context.insert(0, rolling_summary)
+        if retrieved_memories is not None:
+            context.insert(
+                len(context) - _trailing_user_message_count(context), retrieved_memories
+            )
         return context
 
+    def prepare_turn(
+        self,
+        user_id: str,
+        build_system_prompt: Callable[[dict[str, Any]], str],
+        *,
+        user_messages: Sequence[str] = (),
+    ) -> PreparedTurn:
+        # One call stores the turn's input and covers everything a reply needs,
+        # so callers take the user lock once and the reads hit warm caches.
+        resolved_user_id = self._safe_user_id(user_id)
+        for content in user_messages:
+            self.append_message(resolved_user_id, "user", content)
+        profile = self.load_personalization_profile(resolved_user_id)
+        system_prompt = build_system_prompt(profile)
+        return PreparedTurn(
+            user_id=resolved_user_id,
+            profile=profile,
+            system_prompt=system_prompt,
+            messages=self.get_recent_context_messages(
+                resolved_user_id, system_prompt=system_prompt, retrieve=True
+            ),
+        )
+
     def append_message(self, user_id: str, role: str, content: str) -> dict[str, Any]:
         resolved_user_id = self._safe_user_id(user_id)
-        recent_context = self.load_recent_context(resolved_user_id)
-        message_id = recent_context.get("next_message_id", 1)
-        if not isinstance(message_id, int) or message_id < 1:
-            message_id = 1
-        recent_context.setdefault("messages", []).append(
+        message = self._backend.append_message(
+            resolved_user_id,
             {
-                "id": message_id,
                 "role": role,
                 "content": content,
                 "timestamp": _utc_now_iso(),
-            }
+                "tokens": count_tokens(content) + MESSAGE_OVERHEAD_TOKENS,
+            },
         )
-        recent_context["next_message_id"] = message_id + 1
-        self.save_recent_context(resolved_user_id, recent_context)
-        return recent_context
+        cached_window = self._recent_context_cache.peek(resolved_user_id)
+        if cached_window is not None:
+            cached_window["messages"].append(message)
+            overflow = len(cached_window["messages"]) - self._recent_context_cache_window
+            if overflow > 0:
+                del cached_window["messages"][:overflow]
+                cached_window["complete"] = False
+        self._retrieval_index.add_message(resolved_user_id, message)
+        return message
 
     def reset_recent_context(self, user_id: str) -> None:
         resolved_user_id = self._safe_user_id(user_id)
-        recent_context = self.load_recent_context(resolved_user_id)
-        recent_context["messages"] = []
-        self.save_recent_context(resolved_user_id, recent_context)
+        self._backend.reset_messages(resolved_user_id)
+        self._recent_context_cache.invalidate(resolved_user_id)
+        # Archived history is part of the context being reset; leaving it would
+        # bring the old messages back through paging and index rebuilds.
+        self._history_archive.delete_user(resolved_user_id)
+        self._retrieval_index.reset(resolved_user_id)
 
     def load_recent_context(self, user_id: str) -> dict[str, Any]:
         resolved_user_id = self._safe_user_id(user_id)
-        default_data = self._default_recent_context(resolved_user_id)
-        data = self._read_json(self._recent_context_path(resolved_user_id), default_data)
+        data = self._backend.load_recent_context(resolved_user_id)
+        if data is None:
+            data = self._default_recent_context(resolved_user_id)
         return self._normalize_recent_context(resolved_user_id, data)
 
     def save_recent_context(self, user_id: str, data: dict[str, Any]) -> None:
         resolved_user_id = self._safe_user_id(user_id)
         normalized = self._normalize_recent_context(resolved_user_id, data)
-        self._write_json(self._recent_context_path(resolved_user_id), normalized)
+        self._backend.save_recent_context(resolved_user_id, normalized)
+        self._recent_context_cache.invalidate(resolved_user_id)
 
     def load_personalization_profile(self, user_id: str) -> dict[str, Any]:
         resolved_user_id = self._safe_user_id(user_id)
-        default_data = self._default_personalization_profile(resolved_user_id)
-        data = self._read_json(
-            self._personalization_profile_path(resolved_user_id), default_data
+        cached_profile = self._profile_cache.get(resolved_user_id)
+        if cached_profile is not None:
+            return copy.deepcopy(cached_profile)
+        data = self._backend.load_profile(resolved_user_id)
+        if data is None:
+            data = self._default_personalization_profile(resolved_user_id)
+        normalized = self._attach_prompt_block(
+            self._normalize_personalization_profile(resolved_user_id, data)
         )
-        return self._normalize_personalization_profile(resolved_user_id, data)
+        self._profile_cache.put(resolved_user_id, copy.deepcopy(normalized))
+        return normalized
 
     def save_personalization_profile(self, user_id: str, data: dict[str, Any]) -> None:
         resolved_user_id = self._safe_user_id(user_id)
         normalized = self._normalize_personalization_profile(resolved_user_id, data)
-        self._write_json(self._personalization_profile_path(resolved_user_id), normalized)
+        # Saved content may differ under the same updated_at, so the block is
+        # always rendered afresh here.
+        normalized.pop("prompt_block", None)
+        self._attach_prompt_block(normalized)
+        self._profile_cache.invalidate(resolved_user_id)
+        self._backend.save_profile(resolved_user_id, normalized)
+        self._profile_cache.put(resolved_user_id, copy.deepcopy(normalized))
+        # Notes stay retrievable after a later summary drops them.
+        self._retrieval_index.add_notes(
+            resolved_user_id, [note["note"] for note in normalized["notes"]]
+        )
+
+    def rebuild_retrieval_index(self, user_id: str) -> int:
+        resolved_user_id = self._safe_user_id(user_id)
+        self._retrieval_index.reset(resolved_user_id)
+        live_messages = self.load_recent_context(resolved_user_id)["messages"]
+        live_ids = {message.get("id") for message in live_messages}
+        # A crash during compaction can leave a message both archived and live.
+        indexed = self._retrieval_index.add_messages(
+            resolved_user_id,
+            (
+                message
+                for message in self._history_archive.iter_messages(resolved_user_id)
+                if message.get("id") not in live_ids
+            ),
+        )
+        indexed += self._retrieval_index.add_messages(resolved_user_id, live_messages)
+        profile = self.load_personalization_profile(resolved_user_id)
+        indexed += self._retrieval_index.add_notes(
+            resolved_user_id, [note["note"] for note in profile["notes"]]
+        )
+        return indexed
 
     def update_personalization_profile_if_needed(
-        self, user_id: str, model: Any | None = None
+        self, user_id: str, model: Any | None = None, *, force: bool = False
+    ) -> bool:
+        snapshot = self.snapshot_profile_update(user_id, force=force)
+        if snapshot is None:
+            return False
+        summary_update = self._summarize_profile(
+            snapshot.profile, snapshot.new_messages, model
+        )
+        return self.commit_profile_update(snapshot, summary_update)
+
+    async def aupdate_personalization_profile_if_needed(
+        self, user_id: str, model: Any | None = None, *, force: bool = False
     ) -> bool:
+        snapshot = await asyncio.to_thread(
+            self.snapshot_profile_update, user_id, force=force
+        )
+        if snapshot is None:
+            return False
+        summary_update = await self.asummarize_profile_update(snapshot, model)
+        return await asyncio.to_thread(
+            self.commit_profile_update, snapshot, summary_update
+        )
+
+    async def asummarize_dirty_users(
+        self,
+        model: Any | None = None,
+        *,
+        max_concurrency: int = DEFAULT_BULK_SUMMARY_MAX_CONCURRENCY,
+        chunk_size: int = DEFAULT_BULK_SUMMARY_CHUNK_SIZE,
+    ) -> int:
+        chat_model = model or build_chat_model()
+        user_ids = await asyncio.to_thread(self._backend.list_user_ids)
+        committed = 0
+        for start in range(0, len(user_ids), chunk_size):
+            snapshots = [
+                snapshot
+                for snapshot in [
+                    await asyncio.to_thread(
+                        self.snapshot_profile_update, user_id, force=True
+                    )
+                    for user_id in user_ids[start : start + chunk_size]
+                ]
+                if snapshot is not None
+            ]
+            if not snapshots:
+                continue
+            responses = await chat_model.abatch(
+                [
+                    self._summary_prompt_messages(snapshot.profile, snapshot.new_messages)
+                    for snapshot in snapshots
+                ],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True,
+            )
+            for snapshot, response in zip(snapshots, responses):
+                if isinstance(response, Exception):
+                    continue
+                summary_update = self._parse_summary_response(
+                    extract_message_text(response).strip()
+                )
+                if await asyncio.to_thread(
+                    self.commit_profile_update, snapshot, summary_update
+                ):
+                    committed += 1
+        return committed
+
+    def snapshot_profile_update(
+        self, user_id: str, *, force: bool = False
+    ) -> ProfileUpdateSnapshot | None:
         resolved_user_id = self._safe_user_id(user_id)
-        recent_context = self.load_recent_context(resolved_user_id)
         personalization_profile = self.load_personalization_profile(resolved_user_id)
 
         last_summarized_id = personalization_profile.get(
@@ -181,45 +645,272 @@ class MemoryStore:
         if not isinstance(last_summarized_id, int) or last_summarized_id < 0:
             last_summarized_id = 0
 
-        new_messages = [
-            message
-            for message in recent_context.get("messages", [])
-            if isinstance(message, dict)
-            and isinstance(message.get("id"), int)
-            and message["id"] > last_summarized_id
-        ]
+        new_messages = self._messages_after(resolved_user_id, last_summarized_id)
         if not new_messages:
-            return False
-
-        user_message_count = sum(
-            1 for message in new_messages if message.get("role") == "user"
+            return None
+        trigger = self._profile_update_policy.trigger_reason(new_messages, force=force)
+        if trigger is None:
+            return None
+        return ProfileUpdateSnapshot(
+            user_id=resolved_user_id,
+            profile=personalization_profile,
+            new_messages=new_messages,
+            trigger=trigger,
         )
-        if (
-            user_message_count
-            < self._personalization_profile_update_every_user_messages
-        ):
-            return False
 
-        summary_update = self._summarize_profile(
-            personalization_profile, new_messages, model
+    async def asummarize_profile_update(
+        self, snapshot: ProfileUpdateSnapshot, model: Any | None = None
+    ) -> dict[str, Any] | None:
+        return await self._asummarize_profile(
+            snapshot.profile, snapshot.new_messages, model
         )
+
+    def commit_profile_update(
+        self, snapshot: ProfileUpdateSnapshot, summary_update: dict[str, Any] | None
+    ) -> bool:
         if summary_update is None:
             return False
 
-        updated_profile = self._merge_profile(
-            resolved_user_id, personalization_profile, summary_update
+        # Optimistic check: another summary may have been committed while this
+        # one was being generated from the same snapshot.
+        current_profile = self.load_personalization_profile(snapshot.user_id)
+        if current_profile.get("last_summarized_message_id") != snapshot.profile.get(
+            "last_summarized_message_id"
+        ):
+            return False
+
+        updated_profile, evicted_texts = self._apply_profile_delta(
+            snapshot.user_id, current_profile, summary_update
         )
         updated_profile["updated_at"] = _utc_now_iso()
         updated_profile["last_summarized_message_id"] = max(
-            message.get("id", 0) for message in new_messages
+            message.get("id", 0) for message in snapshot.new_messages
+        )
+        self.save_personalization_profile(snapshot.user_id, updated_profile)
+        # Evicted items leave the prompt but stay retrievable.
+        self._retrieval_index.add_notes(snapshot.user_id, evicted_texts)
+        return True
+
+    def get_archived_messages(
+        self,
+        user_id: str,
+        *,
+        before_message_id: int | None = None,
+        limit: int = DEFAULT_ARCHIVE_PAGE_SIZE,
+    ) -> list[dict[str, Any]]:
+        return self._history_archive.get_messages(
+            self._safe_user_id(user_id),
+            before_message_id=before_message_id,
+            limit=limit,
+        )
+
+    def compact_recent_context(self, user_id: str, model: Any | None = None) -> bool:
+        plan = self.plan_compaction(user_id)
+        if plan is None:
+            return False
+        summary_text = self._summarize_compaction(plan, model)
+        return self.commit_compaction(plan, summary_text)
+
+    async def acompact_recent_context(
+        self, user_id: str, model: Any | None = None
+    ) -> bool:
+        plan = await asyncio.to_thread(self.plan_compaction, user_id)
+        if plan is None:
+            return False
+        summary_text = await self.asummarize_compaction(plan, model)
+        return await asyncio.to_thread(self.commit_compaction, plan, summary_text)
+
+    def plan_compaction(self, user_id: str) -> CompactionPlan | None:
+        if not self.compaction_enabled:
+            return None
+        resolved_user_id = self._safe_user_id(user_id)
+        message_count = self._backend.count_messages(resolved_user_id)
+        if message_count < max(
+            self._compaction_threshold_messages, self._hot_tail_messages + 1
+        ):
+            return None
+        data = self.load_recent_context(resolved_user_id)
+        messages = data["messages"]
+        last_summarized_id = self.load_personalization_profile(resolved_user_id).get(
+            "last_summarized_message_id", 0
+        )
+        # Only messages the profile summary has already consumed are archived,
+        # otherwise the next profile update would never see them.
+        archived_messages = [
+            message
+            for message in messages[: max(0, len(messages) - self._hot_tail_messages)]
+            if isinstance(message.get("id"), int)
+            and message["id"] <= last_summarized_id
+        ]
+        if not archived_messages:
+            return None
+        rolling_summary = data.get("rolling_summary") or {}
+        return CompactionPlan(
+            user_id=resolved_user_id,
+            archived_messages=archived_messages,
+            previous_summary=rolling_summary.get("text", ""),
         )
-        self.save_personalization_profile(resolved_user_id, updated_profile)
+
+    async def asummarize_compaction(
+        self, plan: CompactionPlan, model: Any | None = None
+    ) -> str:
+        try:
+            chat_model = model or build_chat_model()
+            response = await chat_model.ainvoke(self._rolling_summary_prompt_messages(plan))
+        except Exception:
+            return plan.previous_summary
+        return extract_message_text(response).strip() or plan.previous_summary
+
+    def commit_compaction(self, plan: CompactionPlan, summary_text: str) -> bool:
+        data = self.load_recent_context(plan.user_id)
+        archived_ids = {message["id"] for message in plan.archived_messages}
+        last_archived_id = max(archived_ids)
+        current_ids = {
+            message.get("id")
+            for message in data["messages"]
+            if isinstance(message.get("id"), int) and message["id"] <= last_archived_id
+        }
+        # A reset or a concurrent compaction changed the old messages since the
+        # plan was made; the next pass will plan again from the new state.
+        if current_ids != archived_ids:
+            return False
+
+        # The segment is durable before the live record drops the messages, so
+        # a crash in between leaves duplicates rather than a gap.
+        self._history_archive.write_segment(plan.user_id, plan.archived_messages)
+        data["messages"] = [
+            message
+            for message in data["messages"]
+            if not (isinstance(message.get("id"), int) and message["id"] <= last_archived_id)
+        ]
+        if summary_text:
+            data["rolling_summary"] = {
+                "text": summary_text,
+                "through_message_id": last_archived_id,
+                "updated_at": _utc_now_iso(),
+            }
+        self.save_recent_context(plan.user_id, data)
         return True
 
+    def _summarize_compaction(self, plan: CompactionPlan, model: Any | None) -> str:
+        try:
+            chat_model = model or build_chat_model()
+            response = chat_model.invoke(self._rolling_summary_prompt_messages(plan))
+        except Exception:
+            return plan.previous_summary
+        return extract_message_text(response).strip() or plan.previous_summary
+
+    def _rolling_summary_prompt_messages(
+        self, plan: CompactionPlan
+    ) -> list[SystemMessage | HumanMessage]:
+        prompt_payload = {
+            "previous_summary": plan.previous_summary,
+            "older_messages": [
+                {"role": message.get("role"), "content": message.get("content")}
+                for message in plan.archived_messages
+            ],
+        }
+        return [
+            SystemMessage(content=ROLLING_SUMMARY_SYSTEM_PROMPT),
+            HumanMessage(
+                content=json.dumps(
+                    prompt_payload, ensure_ascii=False, separators=(",", ":")
+                )
+            ),
+        ]
+
+    def _rolling_summary_message(self, rolling_summary: Any) -> dict[str, str] | None:
+        if not isinstance(rolling_summary, dict):
+            return None
+        text = self._coerce_string(rolling_summary.get("text"))
+        if not text:
+            return None
+        return {"role": "system", "content": f"{ROLLING_SUMMARY_PREFIX}\n{text}"}
+
+    def _retrieved_memories_message(
+        self, user_id: str, tail: list[dict[str, Any]]
+    ) -> dict[str, str] | None:
+        if not self._retrieval_top_k or not self._retrieval_index.enabled:
+            return None
+        query_count = _trailing_user_message_count(tail)
+        if not query_count:
+            return None
+        query = "\n".join(message["content"] for message in tail[-query_count:])
+        # Messages still in the window are already in the prompt.
+        oldest_id = tail[0].get("id")
+        profile = self.load_personalization_profile(user_id)
+        snippets = self._retrieval_index.search(
+            user_id,
+            query,
+            k=self._retrieval_top_k,
+            max_message_id=oldest_id - 1 if isinstance(oldest_id, int) else None,
+            exclude_texts=[note["note"] for note in profile["notes"]],
+        )
+        content = render_retrieved_memories(snippets)
+        if not content:
+            return None
+        return {"role": "system", "content": content}
+
+    def _recent_context_window(self, user_id: str) -> dict[str, Any]:
+        cached_window = self._recent_context_cache.get(user_id)
+        if cached_window is not None:
+            return cached_window
+        messages = [
+            message
+            for message in self._backend.tail_messages(
+                user_id, self._recent_context_cache_window
+            )
+            if isinstance(message, dict)
+        ]
+        window = {
+            "messages": messages,
+            "complete": len(messages) < self._recent_context_cache_window,
+            "rolling_summary": self._backend.load_rolling_summary(user_id),
+        }
+        self._recent_context_cache.put(user_id, window)
+        return window
+
+    def _messages_after(self, user_id: str, message_id: int) -> list[dict[str, Any]]:
+        window = self._recent_context_window(user_id)
+        cached_messages = window["messages"]
+        first_id = cached_messages[0].get("id") if cached_messages else None
+        if window["complete"] or (
+            isinstance(first_id, int) and first_id <= message_id + 1
+        ):
+            candidates = cached_messages
+        else:
+            candidates = self._backend.messages_after(user_id, message_id)
+        return [
+            message
+            for message in candidates
+            if isinstance(message, dict)
+            and isinstance(message.get("id"), int)
+            and message["id"] > message_id
+        ]
+
     def _summarize_profile(
         self, existing_profile: dict[str, Any], new_messages: list[dict[str, Any]], model: Any
     ) -> dict[str, Any] | None:
         chat_model = model or build_chat_model()
+        response = chat_model.invoke(
+            self._summary_prompt_messages(existing_profile, new_messages)
+        )
+        response_text = extract_message_text(response).strip()
+        return self._parse_summary_response(response_text)
+
+    async def _asummarize_profile(
+        self, existing_profile: dict[str, Any], new_messages: list[dict[str, Any]], model: Any
+    ) -> dict[str, Any] | None:
+        chat_model = model or build_chat_model()
+        response = await chat_model.ainvoke(
+            self._summary_prompt_messages(existing_profile, new_messages)
+        )
+        response_text = extract_message_text(response).strip()
+        return self._parse_summary_response(response_text)
+
+    def _summary_prompt_messages(
+        self, existing_profile: dict[str, Any], new_messages: list[dict[str, Any]]
+    ) -> list[SystemMessage | HumanMessage]:
         prompt_payload = {
             "existing_profile": self._profile_for_prompt(existing_profile),
             "new_messages": [
@@ -232,13 +923,11 @@ class MemoryStore:
             ],
         }
         human_message = HumanMessage(
-            content=json.dumps(prompt_payload, ensure_ascii=True, indent=2)
-        )
-        response = chat_model.invoke(
-            [SystemMessage(content=SUMMARY_SYSTEM_PROMPT), human_message]
+            content=json.dumps(
+                prompt_payload, ensure_ascii=False, separators=(",", ":")
+            )
         )
-        response_text = extract_message_text(response).strip()
-        return self._parse_summary_response(response_text)
+        return [SystemMessage(content=SUMMARY_SYSTEM_PROMPT), human_message]
 
     def _parse_summary_response(self, response_text: str) -> dict[str, Any] | None:
         if not response_text:
@@ -249,34 +938,34 @@ class MemoryStore:
             return None
         if not isinstance(parsed, dict):
             return None
-        return self._normalize_summary_update(parsed)
-
-    def _normalize_summary_update(self, data: dict[str, Any]) -> dict[str, Any]:
-        return {
-            "summary": self._coerce_string(data.get("summary")),
-            "preferences": self._coerce_string_list(data.get("preferences")),
-            "dislikes": self._coerce_string_list(data.get("dislikes")),
-            "important_people": self._coerce_string_list(data.get("important_people")),
-            "boundaries": self._coerce_string_list(data.get("boundaries")),
-            "notes": self._coerce_notes(data.get("notes")),
-        }
+        return normalize_profile_delta(parsed)
 
-    def _merge_profile(
-        self, user_id: str, existing: dict[str, Any], update: dict[str, Any]
-    ) -> dict[str, Any]:
+    def _apply_profile_delta(
+        self, user_id: str, existing: dict[str, Any], delta: dict[str, Any]
+    ) -> tuple[dict[str, Any], list[str]]:
         merged = self._normalize_personalization_profile(user_id, existing)
-        for key in (
-            "summary",
-            "preferences",
-            "dislikes",
-            "important_people",
-            "boundaries",
-            "notes",
-        ):
-            value = update.get(key)
-            if self._has_meaningful_value(value):
-                merged[key] = value
-        return merged
+        if delta["summary"]:
+            merged["summary"] = delta["summary"]
+        evicted_texts: list[str] = []
+        for key in PROFILE_LIST_FIELDS:
+            merged[key], evicted = apply_field_delta(
+                merged[key],
+                delta[key],
+                text_of=lambda item: item,
+                make_item=lambda text: text,
+                max_items=self._profile_max_items,
+            )
+            evicted_texts.extend(f"{EVICTED_ITEM_LABELS[key]}: {item}" for item in evicted)
+        timestamp = _utc_now_iso()
+        merged["notes"], evicted_notes = apply_field_delta(
+            merged["notes"],
+            delta["notes"],
+            text_of=lambda note: note["note"],
+            make_item=lambda text: {"timestamp": timestamp, "note": text},
+            max_items=self._profile_max_notes,
+        )
+        evicted_texts.extend(note["note"] for note in evicted_notes)
+        return merged, evicted_texts
 
     def _profile_for_prompt(self, profile: dict[str, Any]) -> dict[str, Any]:
         notes = profile.get("notes", [])
@@ -330,13 +1019,6 @@ class MemoryStore:
                     notes.append({"timestamp": _utc_now_iso(), "note": note_text})
         return notes
 
-    def _has_meaningful_value(self, value: Any) -> bool:
-        if isinstance(value, str):
-            return bool(value.strip())
-        if isinstance(value, list):
-            return len(value) > 0
-        return value is not None
-
     def _normalize_recent_context(
         self, user_id: str, data: dict[str, Any]
     ) -> dict[str, Any]:
@@ -356,8 +1038,20 @@ class MemoryStore:
         next_message_id = data.get("next_message_id")
         if isinstance(next_message_id, int) and next_message_id >= 1:
             normalized["next_message_id"] = next_message_id
+        rolling_summary = data.get("rolling_summary")
+        if isinstance(rolling_summary, dict) and isinstance(
+            rolling_summary.get("text"), str
+        ):
+            normalized["rolling_summary"] = rolling_summary
         return normalized
 
+    def _attach_prompt_block(self, profile: dict[str, Any]) -> dict[str, Any]:
+        return attach_prompt_block(
+            profile,
+            max_notes=self._prompt_max_notes,
+            max_chars=self._prompt_max_chars,
+        )
+
     def _normalize_personalization_profile(
         self, user_id: str, data: dict[str, Any]
     ) -> dict[str, Any]:
@@ -385,6 +1079,9 @@ class MemoryStore:
         last_summarized = data.get("last_summarized_message_id")
         if isinstance(last_summarized, int) and last_summarized >= 0:
             normalized["last_summarized_message_id"] = last_summarized
+        prompt_block = data.get("prompt_block")
+        if isinstance(prompt_block, dict):
+            normalized["prompt_block"] = prompt_block
         return normalized
 
     def _default_recent_context(self, user_id: str) -> dict[str, Any]:
@@ -409,30 +1106,6 @@ class MemoryStore:
             "notes": [],
         }
 
-    def _recent_context_path(self, user_id: str) -> Path:
-        return self._recent_context_dir / f"{user_id}.json"
-
-    def _personalization_profile_path(self, user_id: str) -> Path:
-        return self._personalization_profile_dir / f"{user_id}.json"
-
-    def _read_json(self, path: Path, default: dict[str, Any]) -> dict[str, Any]:
-        if not path.exists():
-            return default
-        try:
-            content = path.read_text(encoding="utf-8")
-            return json.loads(content)
-        except (OSError, json.JSONDecodeError):
-            backup_path = path.with_name(f"{path.name}.corrupt-{_utc_now_compact()}")
-            try:
-                path.replace(backup_path)
-            except OSError:
-                pass
-            return default
-
-    def _write_json(self, path: Path, data: dict[str, Any]) -> None:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(data, indent=2, ensure_ascii=True), encoding="utf-8")
-
     def _safe_user_id(self, user_id: str) -> str:
         cleaned = _SAFE_USER_ID_PATTERN.sub("_", str(user_id).strip())
         return cleaned or DEFAULT_USER_ID
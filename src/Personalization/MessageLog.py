@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from Personalization.DurableWrites import GroupCommitWriter
+
+
+MESSAGE_LOG_VERSION = 1
+
+_TAIL_READ_BLOCK_SIZE = 64 * 1024
+
+
+class AppendOnlyMessageLog:
+    def __init__(
+        self,
+        log_path: Path,
+        header_path: Path,
+        user_id: str,
+        *,
+        writer: GroupCommitWriter | None = None,
+    ) -> None:
+        self._log_path = log_path
+        self._header_path = header_path
+        self._user_id = user_id
+        self._writer = writer or GroupCommitWriter(window_seconds=0)
+
+    @property
+    def log_path(self) -> Path:
+        return self._log_path
+
+    @property
+    def header_path(self) -> Path:
+        return self._header_path
+
+    def exists(self) -> bool:
+        return self._log_path.exists() or self._header_path.exists()
+
+    def next_message_id(self) -> int:
+        # The header is only written on creation and reset; between those the
+        # next id comes from the last log line so an append stays one write.
+        header_next_id = self.read_header().get("next_message_id", 1)
+        last_message = self._read_last_message()
+        last_id = last_message.get("id") if last_message else None
+        if isinstance(last_id, int) and last_id >= header_next_id:
+            return last_id + 1
+        return header_next_id
+
+    def append(self, message: dict[str, Any]) -> None:
+        self._log_path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._log_path.open("ab") as handle:
+            if handle.tell() > 0 and not self._ends_with_newline():
+                # A previous append was cut short; start a fresh line so the
+                # partial record is skipped instead of corrupting this one.
+                line = "\n" + line
+            handle.write(line.encode("utf-8"))
+        self._writer.mark_appended(self._log_path)
+
+    def read_all(self) -> list[dict[str, Any]]:
+        if not self._log_path.exists():
+            return []
+        messages: list[dict[str, Any]] = []
+        with self._log_path.open("rb") as handle:
+            for raw_line in handle:
+                message = self._parse_line(raw_line)
+                if message is not None:
+                    messages.append(message)
+        return messages
+
+    def read_tail(self, limit: int) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        tail: list[dict[str, Any]] = []
+        for message in self._iter_reversed():
+            tail.append(message)
+            if len(tail) >= limit:
+                break
+        tail.reverse()
+        return tail
+
+    def read_after(self, message_id: int) -> list[dict[str, Any]]:
+        newer: list[dict[str, Any]] = []
+        for message in self._iter_reversed():
+            current_id = message.get("id")
+            if isinstance(current_id, int) and current_id <= message_id:
+                break
+            newer.append(message)
+        newer.reverse()
+        return newer
+
+    def line_count(self) -> int:
+        if not self._log_path.exists():
+            return 0
+        count = 0
+        with self._log_path.open("rb") as handle:
+            while block := handle.read(_TAIL_READ_BLOCK_SIZE):
+                count += block.count(b"\n")
+        return count
+
+    def rewrite(
+        self,
+        messages: list[dict[str, Any]],
+        next_message_id: int,
+        *,
+        rolling_summary: dict[str, Any] | None = None,
+    ) -> None:
+        lines = "".join(
+            json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for message in messages
+        )
+        # Rewrites bypass the group-commit buffer: appends go straight to the
+        # log file, so a buffered rewrite could land on top of newer lines.
+        self._writer.write_through(self._log_path, lines.encode("utf-8"))
+        self._write_header(next_message_id, rolling_summary)
+
+    def reset(self, next_message_id: int) -> None:
+        self.rewrite([], next_message_id)
+
+    def read_header(self) -> dict[str, Any]:
+        header = {
+            "version": MESSAGE_LOG_VERSION,
+            "user_id": self._user_id,
+            "next_message_id": 1,
+        }
+        if not self._header_path.exists():
+            return header
+        try:
+            data = json.loads(self._header_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return header
+        if isinstance(data, dict):
+            next_message_id = data.get("next_message_id")
+            if isinstance(next_message_id, int) and next_message_id >= 1:
+                header["next_message_id"] = next_message_id
+            if isinstance(data.get("rolling_summary"), dict):
+                header["rolling_summary"] = data["rolling_summary"]
+        return header
+
+    def _write_header(
+        self, next_message_id: int, rolling_summary: dict[str, Any] | None = None
+    ) -> None:
+        header: dict[str, Any] = {
+            "version": MESSAGE_LOG_VERSION,
+            "user_id": self._user_id,
+            "next_message_id": next_message_id,
+        }
+        if rolling_summary:
+            header["rolling_summary"] = rolling_summary
+        self._writer.write_through(
+            self._header_path,
+            json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        )
+
+    def _read_last_message(self) -> dict[str, Any] | None:
+        return next(self._iter_reversed(), None)
+
+    def _ends_with_newline(self) -> bool:
+        with self._log_path.open("rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            return handle.read(1) == b"\n"
+
+    def _iter_reversed(self):
+        if not self._log_path.exists():
+            return
+        with self._log_path.open("rb") as handle:
+            handle.seek(0, os.SEEK_END)
+            position = handle.tell()
+            remainder = b""
+            while position > 0:
+                read_size = min(_TAIL_READ_BLOCK_SIZE, position)
+                position -= read_size
+                handle.seek(position)
+                block = handle.read(read_size) + remainder
+                lines = block.split(b"\n")
+                # The first piece may be the end of a line that continues in
+                # the previous block; keep it until that block is read.
+                remainder = lines.pop(0)
+                for raw_line in reversed(lines):
+                    message = self._parse_line(raw_line)
+                    if message is not None:
+                        yield message
+            if remainder:
+                message = self._parse_line(remainder)
+                if message is not None:
+                    yield message
+
+    def _parse_line(self, raw_line: bytes) -> dict[str, Any] | None:
+        stripped = raw_line.strip()
+        if not stripped:
+            return None
+        try:
+            message = json.loads(stripped)
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+        if (
+            isinstance(message, dict)
+            and isinstance(message.get("role"), str)
+            and isinstance(message.get("content"), str)
+        ):
+            return message
+        return None
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from Personalization.StorageBackends import (  # noqa: E402
+    DEFAULT_SQLITE_FILE_NAME,
+    RECENT_CONTEXT_DIR_NAME,
+    JsonFileBackend,
+    JsonlLogBackend,
+    MemoryBackend,
+    SqliteBackend,
+)
+
+
+def migrate_memory_dir(memory_dir: Path, target: MemoryBackend) -> int:
+    json_backend = JsonFileBackend(memory_dir)
+    jsonl_backend = JsonlLogBackend(memory_dir)
+    recent_context_dir = memory_dir / RECENT_CONTEXT_DIR_NAME
+
+    migrated = 0
+    for user_id in jsonl_backend.list_user_ids():
+        # Prefer the append-only log when a user has one; it is always at
+        # least as new as the legacy JSON file it was imported from.
+        source = (
+            jsonl_backend
+            if (recent_context_dir / f"{user_id}.jsonl").exists()
+            else json_backend
+        )
+        recent_context = source.load_recent_context(user_id)
+        if isinstance(recent_context, dict):
+            target.save_recent_context(user_id, recent_context)
+        profile = source.load_profile(user_id)
+        if isinstance(profile, dict):
+            target.save_profile(user_id, profile)
+        migrated += 1
+    return migrated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Move a file-based Memory/ tree into the SQLite memory backend."
+    )
+    parser.add_argument(
+        "--memory-dir",
+        type=Path,
+        default=PROJECT_ROOT / "Memory",
+        help="Memory directory containing recent_context/ and personalization_profile/.",
+    )
+    parser.add_argument(
+        "--database",
+        type=Path,
+        default=None,
+        help=f"SQLite database path (default: <memory-dir>/{DEFAULT_SQLITE_FILE_NAME}).",
+    )
+    args = parser.parse_args()
+
+    database_path = args.database or args.memory_dir / DEFAULT_SQLITE_FILE_NAME
+    target = SqliteBackend(database_path)
+    try:
+        migrated = migrate_memory_dir(args.memory_dir, target)
+    finally:
+        target.close()
+    print(f"Migrated {migrated} users into {database_path}.")
+
+
+if __name__ == "__main__":
+    main()
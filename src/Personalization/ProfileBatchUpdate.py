@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from LLM_Providers.ProviderFactory import aclose_chat_models  # noqa: E402
+from Personalization.MemoryStore import (  # noqa: E402
+    DEFAULT_BULK_SUMMARY_MAX_CONCURRENCY,
+    MemoryStore,
+)
+
+
+async def _run(memory_dir: Path, max_concurrency: int) -> int:
+    memory_store = MemoryStore(memory_dir=memory_dir)
+    try:
+        return await memory_store.asummarize_dirty_users(
+            max_concurrency=max_concurrency
+        )
+    finally:
+        memory_store.close()
+        await aclose_chat_models()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Summarize every user with unsummarized messages in one batch pass."
+    )
+    parser.add_argument("--memory-dir", type=Path, default=PROJECT_ROOT / "Memory")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=DEFAULT_BULK_SUMMARY_MAX_CONCURRENCY
+    )
+    args = parser.parse_args()
+
+    updated = asyncio.run(_run(args.memory_dir, args.max_concurrency))
+    print(f"Updated {updated} personalization profiles.")
+
+
+if __name__ == "__main__":
+    main()
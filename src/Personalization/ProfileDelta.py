@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+
+PROFILE_LIST_FIELDS = ("preferences", "dislikes", "important_people", "boundaries")
+PROFILE_DELTA_FIELDS = (*PROFILE_LIST_FIELDS, "notes")
+
+DEFAULT_PROFILE_MAX_ITEMS = 20
+DEFAULT_PROFILE_MAX_NOTES = 50
+
+# Labels for evicted items, which are kept retrievable as notes.
+EVICTED_ITEM_LABELS = {
+    "preferences": "Preference",
+    "dislikes": "Dislike",
+    "important_people": "Important person",
+    "boundaries": "Boundary",
+}
+
+T = TypeVar("T")
+
+
+def item_key(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def normalize_profile_delta(data: dict[str, Any]) -> dict[str, Any]:
+    delta: dict[str, Any] = {"summary": _coerce_string(data.get("summary"))}
+    for field in PROFILE_DELTA_FIELDS:
+        delta[field] = _normalize_field_delta(data.get(field))
+    return delta
+
+
+def apply_field_delta(
+    items: list[T],
+    field_delta: dict[str, Any],
+    *,
+    text_of: Callable[[T], str],
+    make_item: Callable[[str], T],
+    max_items: int,
+) -> tuple[list[T], list[T]]:
+    removed = {item_key(text) for text in field_delta["remove"]}
+    replaced = {item_key(old_text) for old_text, _ in field_delta["update"]}
+    # Insertion order is recency order: re-mentioned and updated items move to
+    # the end, so eviction drops whatever was confirmed longest ago.
+    kept: dict[str, T] = {}
+    for item in items:
+        key = item_key(text_of(item))
+        if not key or key in removed or key in replaced:
+            continue
+        kept.pop(key, None)
+        kept[key] = item
+    for text in [new_text for _, new_text in field_delta["update"]] + field_delta["add"]:
+        key = item_key(text)
+        if key in removed:
+            continue
+        kept.pop(key, None)
+        kept[key] = make_item(" ".join(text.split()))
+    ordered = list(kept.values())
+    overflow = len(ordered) - max_items if max_items else 0
+    if overflow <= 0:
+        return ordered, []
+    return ordered[overflow:], ordered[:overflow]
+
+
+def _normalize_field_delta(value: Any) -> dict[str, Any]:
+    # A bare list is the old full-field reply; treating it as additions never
+    # drops items the model forgot to repeat.
+    if isinstance(value, list):
+        value = {"add": value}
+    if not isinstance(value, dict):
+        value = {}
+    updates: list[tuple[str, str]] = []
+    raw_updates = value.get("update")
+    if isinstance(raw_updates, list):
+        for item in raw_updates:
+            if not isinstance(item, dict):
+                continue
+            old_text = _coerce_item_text(item.get("from"))
+            new_text = _coerce_item_text(item.get("to"))
+            if old_text and new_text:
+                updates.append((old_text, new_text))
+    return {
+        "add": _coerce_item_texts(value.get("add")),
+        "remove": _coerce_item_texts(value.get("remove")),
+        "update": updates,
+    }
+
+
+def _coerce_item_texts(value: Any) -> list[str]:
+    if not isinstance(value, list):
+        return []
+    texts: list[str] = []
+    for item in value:
+        text = _coerce_item_text(item)
+        if text:
+            texts.append(text)
+    return texts
+
+
+def _coerce_item_text(value: Any) -> str:
+    if isinstance(value, dict):
+        value = value.get("note")
+    return _coerce_string(value)
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value.strip()
+    return ""
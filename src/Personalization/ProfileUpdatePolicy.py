@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+from Utils.TokenCounter import count_message_tokens
+
+
+TRIGGER_FORCED = "forced"
+TRIGGER_PROFILE_STATEMENT = "profile_statement"
+TRIGGER_TOKEN_BUDGET = "token_budget"
+TRIGGER_IDLE = "idle"
+TRIGGER_MESSAGE_COUNT = "message_count"
+
+DEFAULT_MAX_USER_MESSAGES = 8
+DEFAULT_MIN_NEW_TOKENS = 300
+DEFAULT_IDLE_SECONDS = 900
+
+# Cheap signals that a user message probably carries profile-worthy facts.
+_PROFILE_STATEMENT_PATTERNS = (
+    re.compile(r"\b(?:my name is|call me|i go by)\b", re.IGNORECASE),
+    re.compile(r"\bpronouns?\b", re.IGNORECASE),
+    re.compile(
+        r"\bi\s+(?:really\s+|don't\s+|do not\s+|never\s+)?"
+        r"(?:love|like|hate|prefer|enjoy|dislike|can't stand)\b",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"\bmy\s+(?:mom|mother|dad|father|sister|brother|partner|boyfriend|girlfriend|"
+        r"wife|husband|friend|best friend|son|daughter|boss|dog|cat)\b",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"\b(?:please\s+)?(?:don't|do not|never|stop)\s+"
+        r"(?:call|mention|bring up|talk about|ask about)\b",
+        re.IGNORECASE,
+    ),
+    re.compile(r"\bi(?:'m| am)\s+(?:allergic|vegan|vegetarian|from)\b", re.IGNORECASE),
+    re.compile(r"\bi\s+(?:work|live|study)\b", re.IGNORECASE),
+)
+
+
+@dataclass(frozen=True)
+class ProfileUpdatePolicy:
+    max_user_messages: int = DEFAULT_MAX_USER_MESSAGES
+    min_new_tokens: int = DEFAULT_MIN_NEW_TOKENS
+    idle_seconds: int = DEFAULT_IDLE_SECONDS
+    detect_profile_statements: bool = True
+
+    def trigger_reason(
+        self,
+        new_messages: list[dict[str, Any]],
+        *,
+        now: datetime | None = None,
+        force: bool = False,
+    ) -> str | None:
+        # A forced run always has a reason; whether there is anything to
+        # summarize is the caller's call.
+        if force:
+            return TRIGGER_FORCED
+        user_messages = [
+            message for message in new_messages if message.get("role") == "user"
+        ]
+        if not user_messages:
+            return None
+        if self.detect_profile_statements and any(
+            _looks_like_profile_statement(message.get("content"))
+            for message in user_messages
+        ):
+            return TRIGGER_PROFILE_STATEMENT
+        if self.min_new_tokens and (
+            sum(count_message_tokens(message) for message in new_messages)
+            >= self.min_new_tokens
+        ):
+            return TRIGGER_TOKEN_BUDGET
+        # Checked right after a reply, the newest message is seconds old, so
+        # this only fires for a gap inside the backlog. A pause after the last
+        # message is left to the queue's idle timer, which forces a run once
+        # idle_seconds pass without a new message.
+        if self.idle_seconds and _has_idle_gap(
+            new_messages, self.idle_seconds, now or datetime.now(timezone.utc)
+        ):
+            return TRIGGER_IDLE
+        if len(user_messages) >= self.max_user_messages:
+            return TRIGGER_MESSAGE_COUNT
+        return None
+
+
+def _looks_like_profile_statement(content: Any) -> bool:
+    if not isinstance(content, str):
+        return False
+    return any(pattern.search(content) for pattern in _PROFILE_STATEMENT_PATTERNS)
+
+
+def _has_idle_gap(
+    messages: list[dict[str, Any]], idle_seconds: int, now: datetime
+) -> bool:
+    # A long pause either after the last message or between two unsummarized
+    # messages marks the end of a session worth summarizing.
+    timestamps = [
+        parsed
+        for parsed in (_parse_timestamp(message.get("timestamp")) for message in messages)
+        if parsed is not None
+    ]
+    if not timestamps:
+        return False
+    checkpoints = [*timestamps, now]
+    return any(
+        (later - earlier).total_seconds() >= idle_seconds
+        for earlier, later in zip(checkpoints, checkpoints[1:])
+    )
+
+
+def _parse_timestamp(value: Any) -> datetime | None:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import statistics
+import sys
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any, AsyncContextManager
+
+from Personalization.MemoryStore import MemoryStore
+from Utils.CommonUtils import percentile
+from Utils.Metrics import get_metrics
+
+
+DEFAULT_WORKER_COUNT = 4
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_LATENCY_SAMPLE_SIZE = 1000
+
+
+class ProfileUpdateQueue:
+    def __init__(
+        self,
+        memory_store: MemoryStore,
+        *,
+        worker_count: int = DEFAULT_WORKER_COUNT,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        llm_semaphore: asyncio.Semaphore | None = None,
+        lock_for: Callable[[str], AsyncContextManager[Any]] | None = None,
+        idle_check_seconds: float = 0,
+    ) -> None:
+        self._memory_store = memory_store
+        self._worker_count = max(1, worker_count)
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max(1, max_pending))
+        self._llm_semaphore = llm_semaphore
+        self._lock_for = lock_for
+        self._idle_check_seconds = idle_check_seconds
+        self._idle_timers: dict[str, asyncio.TimerHandle] = {}
+        self._workers: list[asyncio.Task[None]] = []
+        self._pending: dict[str, float] = {}
+        self._forced: set[str] = set()
+        self._running: set[str] = set()
+        self._rerun: dict[str, bool] = {}
+        self._latencies_ms: deque[float] = deque(maxlen=DEFAULT_LATENCY_SAMPLE_SIZE)
+        self._metrics = get_metrics()
+        self._counters = {
+            "scheduled": 0,
+            "idle_triggers": 0,
+            "merged": 0,
+            "dropped": 0,
+            "completed": 0,
+            "committed": 0,
+            "conflicts": 0,
+            "compactions": 0,
+            "failed": 0,
+        }
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"profile-update-{index}")
+            for index in range(self._worker_count)
+        ]
+
+    async def stop(self, *, drain_timeout_seconds: float = 0) -> None:
+        for timer in self._idle_timers.values():
+            timer.cancel()
+        self._idle_timers.clear()
+        if drain_timeout_seconds > 0:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._queue.join(), drain_timeout_seconds)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def schedule(self, user_id: str, *, force: bool = False) -> bool:
+        if not force:
+            self._arm_idle_timer(user_id)
+        if user_id in self._pending:
+            # A job for this user is already waiting; it will read every
+            # message since the last summary, so this trigger merges into it.
+            if force:
+                self._forced.add(user_id)
+            self._counters["merged"] += 1
+            return True
+        if user_id in self._running:
+            self._rerun[user_id] = self._rerun.get(user_id, False) or force
+            self._counters["merged"] += 1
+            return True
+        try:
+            self._queue.put_nowait(user_id)
+        except asyncio.QueueFull:
+            self._counters["dropped"] += 1
+            return False
+        self._pending[user_id] = time.monotonic()
+        if force:
+            self._forced.add(user_id)
+        self._counters["scheduled"] += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        latencies = list(self._latencies_ms)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "running": len(self._running),
+            "workers": len(self._workers),
+            "idle_timers": len(self._idle_timers),
+            **self._counters,
+            "job_latency_ms": {
+                "count": len(latencies),
+                "mean": statistics.fmean(latencies) if latencies else 0.0,
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "max": max(latencies, default=0.0),
+            },
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            user_id = await self._queue.get()
+            enqueued_at = self._pending.pop(user_id, time.monotonic())
+            force = user_id in self._forced
+            self._forced.discard(user_id)
+            self._running.add(user_id)
+            self._metrics.observe(
+                "queue_wait", time.monotonic() - enqueued_at, queue="profile_update"
+            )
+            try:
+                with self._metrics.span("profile_update_job"):
+                    await self._run_job(user_id, force=force)
+                self._counters["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._counters["failed"] += 1
+                print("Failed to update personalization profile summary.", file=sys.stderr)
+            finally:
+                self._running.discard(user_id)
+                self._latencies_ms.append((time.monotonic() - enqueued_at) * 1000)
+                self._queue.task_done()
+            if user_id in self._rerun:
+                rerun_forced = self._rerun.pop(user_id)
+                self.schedule(user_id, force=rerun_forced)
+
+    async def _run_job(self, user_id: str, *, force: bool) -> None:
+        async with self._user_lock(user_id):
+            snapshot = await asyncio.to_thread(
+                self._memory_store.snapshot_profile_update, user_id, force=force
+            )
+        if snapshot is None:
+            return
+
+        # The LLM call runs without the user lock so the user's next message
+        # is never queued behind a summary request.
+        async with self._llm_slot():
+            summary_update = await self._memory_store.asummarize_profile_update(
+                snapshot
+            )
+        if summary_update is None:
+            return
+
+        async with self._user_lock(user_id):
+            committed = await asyncio.to_thread(
+                self._memory_store.commit_profile_update, snapshot, summary_update
+            )
+        self._counters["committed" if committed else "conflicts"] += 1
+        if committed and self._memory_store.compaction_enabled:
+            await self._run_compaction(user_id)
+
+    async def _run_compaction(self, user_id: str) -> None:
+        # Compaction follows a profile commit because only summarized messages
+        # may leave the live record.
+        async with self._user_lock(user_id):
+            plan = await asyncio.to_thread(self._memory_store.plan_compaction, user_id)
+        if plan is None:
+            return
+        async with self._llm_slot():
+            summary_text = await self._memory_store.asummarize_compaction(plan)
+        async with self._user_lock(user_id):
+            compacted = await asyncio.to_thread(
+                self._memory_store.commit_compaction, plan, summary_text
+            )
+        if compacted:
+            self._counters["compactions"] += 1
+
+    def _arm_idle_timer(self, user_id: str) -> None:
+        if self._idle_check_seconds <= 0:
+            return
+        existing = self._idle_timers.pop(user_id, None)
+        if existing is not None:
+            existing.cancel()
+        self._idle_timers[user_id] = asyncio.get_running_loop().call_later(
+            self._idle_check_seconds, self._on_idle, user_id
+        )
+
+    def _on_idle(self, user_id: str) -> None:
+        # The conversation went quiet: summarize whatever is still pending.
+        self._idle_timers.pop(user_id, None)
+        self._counters["idle_triggers"] += 1
+        self.schedule(user_id, force=True)
+
+    def _user_lock(self, user_id: str) -> AsyncContextManager[Any]:
+        if self._lock_for is None:
+            return contextlib.nullcontext()
+        return self._lock_for(user_id)
+
+    def _llm_slot(self) -> AsyncContextManager[Any]:
+        if self._llm_semaphore is None:
+            return contextlib.nullcontext()
+        return self._llm_semaphore
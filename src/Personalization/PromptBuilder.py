@@ -3,6 +3,26 @@ from __future__ import annotations
 import re
 from typing import Any
 
+from Personalization.RetrievalIndex import NOTE_ROLE, RetrievedSnippet
+
+
+# Bump when the rendering below changes so persisted blocks are re-rendered.
+PROMPT_BLOCK_VERSION = 2
+DEFAULT_PROMPT_MAX_NOTES = 20
+DEFAULT_PROMPT_MAX_CHARS = 2000
+
+PERSONALIZATION_HEADER = (
+    "Personalization (use only when relevant; prefer latest user statements):"
+)
+RETRIEVED_MEMORIES_HEADER = (
+    "Possibly related memories from earlier conversations "
+    "(use only when relevant; the current conversation takes precedence):"
+)
+_RETRIEVED_ROLE_LABELS = {
+    "user": "User said",
+    "assistant": "You said",
+    NOTE_ROLE: "Earlier note",
+}
 
 _NAME_PATTERNS = (
     re.compile(r"\bmy name is\s+([A-Za-z][^,.;!\n]{0,60})", re.IGNORECASE),
@@ -16,12 +36,83 @@ _PRONOUNS_PATTERN = re.compile(
 def build_personalized_system_prompt(
     base_prompt: str, profile: dict[str, Any]
 ) -> str:
+    # Layout for provider prefix caching: the fixed base prompt first, then a
+    # deterministic personalization block; history follows in the messages.
+    personalization_block = cached_personalization_block(profile)
+    if personalization_block is None:
+        personalization_block = render_personalization_block(profile)
+    if not personalization_block:
+        return base_prompt
+    return f"{base_prompt}\n\n{PERSONALIZATION_HEADER}\n{personalization_block}"
+
+
+def prompt_block_key(
+    profile: dict[str, Any],
+    *,
+    max_notes: int = DEFAULT_PROMPT_MAX_NOTES,
+    max_chars: int = DEFAULT_PROMPT_MAX_CHARS,
+) -> str:
+    return f"{_profile_version_key(profile)}:{max_notes}:{max_chars}"
+
+
+def cached_personalization_block(profile: dict[str, Any]) -> str | None:
+    # Any block rendered for this profile version is used as is: the limits it
+    # was rendered with are the owning MemoryStore's, checked when attached.
+    prompt_block = profile.get("prompt_block")
+    if not isinstance(prompt_block, dict) or not isinstance(
+        prompt_block.get("text"), str
+    ):
+        return None
+    key = prompt_block.get("key")
+    if not isinstance(key, str) or key.rsplit(":", 2)[0] != _profile_version_key(
+        profile
+    ):
+        return None
+    return prompt_block["text"]
+
+
+def attach_prompt_block(
+    profile: dict[str, Any],
+    *,
+    max_notes: int = DEFAULT_PROMPT_MAX_NOTES,
+    max_chars: int = DEFAULT_PROMPT_MAX_CHARS,
+) -> dict[str, Any]:
+    # Rendered once per profile version and stored with it, so building the
+    # prompt for each message is a key comparison instead of a re-render.
+    key = prompt_block_key(profile, max_notes=max_notes, max_chars=max_chars)
+    prompt_block = profile.get("prompt_block")
+    if (
+        not isinstance(prompt_block, dict)
+        or prompt_block.get("key") != key
+        or not isinstance(prompt_block.get("text"), str)
+    ):
+        profile["prompt_block"] = {
+            "key": key,
+            "text": render_personalization_block(
+                profile, max_notes=max_notes, max_chars=max_chars
+            ),
+        }
+    return profile
+
+
+def render_personalization_block(
+    profile: dict[str, Any],
+    *,
+    max_notes: int = DEFAULT_PROMPT_MAX_NOTES,
+    max_chars: int = DEFAULT_PROMPT_MAX_CHARS,
+) -> str:
+    note_texts = _extract_note_texts(profile.get("notes", []))
+    if max_notes:
+        recent_notes = note_texts[-max_notes:]
+    else:
+        recent_notes = []
+
     lines: list[str] = []
     summary = _coerce_string(profile.get("summary"))
     if summary:
         lines.append(f"- Summary: {summary}")
 
-    identity_line = _identity_line_from_notes(profile.get("notes", []))
+    identity_line = _identity_line_from_notes(note_texts)
     if identity_line:
         lines.append(f"- Identity: {identity_line}")
 
@@ -30,23 +121,56 @@ def build_personalized_system_prompt(
     _append_list_line(lines, "Important people", profile.get("important_people"))
     _append_list_line(lines, "Boundaries", profile.get("boundaries"))
 
-    notes = _extract_note_texts(profile.get("notes", []))
-    if notes:
-        lines.append(f"- Notes: {', '.join(notes)}")
+    if recent_notes:
+        lines.append(f"- Notes: {', '.join(recent_notes)}")
+
+    return _fit_lines(lines, max_chars)
 
+
+def render_retrieved_memories(snippets: list[RetrievedSnippet]) -> str:
+    # Sent as its own message next to the newest user turn, not in the system
+    # prompt: it changes every turn and would break the cached prompt prefix.
+    lines = [
+        f"- {_RETRIEVED_ROLE_LABELS.get(snippet.role, 'Earlier')}: {snippet.text}"
+        for snippet in snippets
+        if snippet.text
+    ]
     if not lines:
-        return base_prompt
+        return ""
+    return "\n".join([RETRIEVED_MEMORIES_HEADER, *lines])
+
+
+def _profile_version_key(profile: dict[str, Any]) -> str:
+    updated_at = profile.get("updated_at")
+    return f"v{PROMPT_BLOCK_VERSION}:{updated_at if isinstance(updated_at, str) else ''}"
+
 
-    personalization_block = "\n".join(lines)
-    return (
-        f"{base_prompt}\n\n"
-        "Personalization (use only when relevant; prefer latest user statements):\n"
-        f"{personalization_block}"
-    )
+def _fit_lines(lines: list[str], max_chars: int) -> str:
+    kept: list[str] = []
+    used = 0
+    for line in lines:
+        needed = len(line) + (1 if kept else 0)
+        if used + needed <= max_chars:
+            kept.append(line)
+            used += needed
+            continue
+        # Lines that do not fit are cut rather than dropped so a long summary
+        # still contributes its beginning.
+        remaining = max_chars - used - (1 if kept else 0)
+        if remaining > len("- ...:"):
+            kept.append(line[: remaining - 3].rstrip() + "...")
+        break
+    return "\n".join(kept)
 
 
 def _append_list_line(lines: list[str], label: str, value: Any) -> None:
-    items = _coerce_string_list(value)
+    # Sorted and de-duplicated so the same facts always render to the same
+    # bytes, whatever order the summarizer returned them in.
+    unique_items: dict[str, str] = {}
+    for item in _coerce_string_list(value):
+        collapsed = " ".join(item.split())
+        unique_items.setdefault(collapsed.casefold(), collapsed)
+    items = [unique_items[key] for key in sorted(unique_items)]
     if items:
         lines.append(f"- {label}: {', '.join(items)}")
 
@@ -85,8 +209,7 @@ def _extract_note_texts(notes: Any) -> list[str]:
     return texts
 
 
-def _identity_line_from_notes(notes: Any) -> str:
-    note_texts = _extract_note_texts(notes)
+def _identity_line_from_notes(note_texts: list[str]) -> str:
     if not note_texts:
         return ""
     name = _extract_identity_value(note_texts, _NAME_PATTERNS)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from Personalization.MemoryStore import MemoryStore  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Rebuild the retrieval index from archived and live history, e.g. "
+            "after a migration or a change of MEMORY_RETRIEVAL_MODE."
+        )
+    )
+    parser.add_argument("--memory-dir", type=Path, default=PROJECT_ROOT / "Memory")
+    parser.add_argument(
+        "--user-id",
+        action="append",
+        default=None,
+        help="Only rebuild these users (repeatable; default: every user).",
+    )
+    args = parser.parse_args()
+
+    memory_store = MemoryStore(memory_dir=args.memory_dir)
+    try:
+        if not memory_store.retrieval_index.enabled:
+            print("Retrieval is disabled (MEMORY_RETRIEVAL_MODE=off); nothing to do.")
+            return
+        user_ids = args.user_id or memory_store.backend.list_user_ids()
+        indexed = 0
+        for user_id in user_ids:
+            indexed += memory_store.rebuild_retrieval_index(user_id)
+    finally:
+        memory_store.close()
+    print(
+        f"Indexed {indexed} snippets for {len(user_ids)} users "
+        f"({memory_store.retrieval_index.mode})."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import re
+import shutil
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from Utils.UserLockRegistry import ThreadLockRegistry
+
+
+RETRIEVAL_INDEX_DIR_NAME = "retrieval_index"
+
+RETRIEVAL_MODE_AUTO = "auto"
+RETRIEVAL_MODE_HASHED = "hashed"
+RETRIEVAL_MODE_BM25 = "bm25"
+RETRIEVAL_MODE_OFF = "off"
+SUPPORTED_RETRIEVAL_MODES = (
+    RETRIEVAL_MODE_AUTO,
+    RETRIEVAL_MODE_HASHED,
+    RETRIEVAL_MODE_BM25,
+    RETRIEVAL_MODE_OFF,
+)
+
+DEFAULT_RETRIEVAL_MODE = RETRIEVAL_MODE_AUTO
+DEFAULT_RETRIEVAL_DIMENSIONS = 256
+DEFAULT_RETRIEVAL_TOP_K = 3
+DEFAULT_RETRIEVAL_SNIPPET_CHARS = 300
+DEFAULT_RETRIEVAL_CACHE_MAX_USERS = 256
+# Hashed cosine and BM25 scores live on different scales.
+DEFAULT_MIN_COSINE_SCORE = 0.15
+DEFAULT_MIN_BM25_SCORE = 1.0
+
+# Notes are not messages; they share one id that every cutoff keeps.
+NOTE_MESSAGE_ID = 0
+NOTE_ROLE = "note"
+
+_SNIPPETS_FILE_NAME = "snippets.jsonl"
+_ROWS_FILE_NAME = "rows.i64"
+# (message id, byte offset of the snippet line) per indexed row.
+_ROW_WIDTH = 2
+_ROW_BYTES = _ROW_WIDTH * 8
+_FLOAT_BYTES = 4
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Too common to tell messages apart.
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can could did do does for from had has have he "
+    "her him his how i if in is it its just me my of on or our she so that the "
+    "their them then there they this to was we were what when where which who "
+    "why will with would you your".split()
+)
+
+
+def _load_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def resolve_retrieval_mode(mode: str) -> str:
+    normalized = mode.strip().lower()
+    if normalized not in SUPPORTED_RETRIEVAL_MODES:
+        supported = ", ".join(SUPPORTED_RETRIEVAL_MODES)
+        raise ValueError(
+            f"Unsupported memory retrieval mode: {normalized}. Supported: {supported}"
+        )
+    if normalized == RETRIEVAL_MODE_AUTO:
+        return RETRIEVAL_MODE_HASHED if _load_numpy() is not None else RETRIEVAL_MODE_BM25
+    if normalized == RETRIEVAL_MODE_HASHED and _load_numpy() is None:
+        raise ValueError("hashed retrieval requires the 'numpy' package.")
+    return normalized
+
+
+def tokenize(text: str) -> list[str]:
+    tokens: list[str] = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if word.isascii():
+            if word not in _STOPWORDS:
+                tokens.append(word)
+            continue
+        # Scripts written without spaces come out as one long "word"; their
+        # character bigrams still match across different phrasings.
+        tokens.append(word)
+        tokens.extend(word[index : index + 2] for index in range(len(word) - 1))
+    return tokens
+
+
+@dataclass(frozen=True)
+class RetrievedSnippet:
+    message_id: int
+    role: str
+    text: str
+    score: float
+
+
+class _UserIndex(ABC):
+    def __init__(self, user_dir: Path) -> None:
+        self.user_dir = user_dir
+        self._snippets_path = user_dir / _SNIPPETS_FILE_NAME
+        self._note_texts: set[str] | None = None
+        self._dir_ready = False
+
+    @abstractmethod
+    def add(self, message_id: int, role: str, text: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(
+        self, query: str, k: int, max_message_id: int | None, min_score: float
+    ) -> list[tuple[int, float]]:
+        raise NotImplementedError
+
+    def note_texts(self) -> set[str]:
+        if self._note_texts is None:
+            self._note_texts = {
+                text
+                for _, message_id, role, text in self._read_snippets()
+                if message_id == NOTE_MESSAGE_ID and role == NOTE_ROLE
+            }
+        return self._note_texts
+
+    def close(self) -> None:
+        return None
+
+    def _append_snippet(self, message_id: int, role: str, text: str) -> int:
+        if not self._dir_ready:
+            self.user_dir.mkdir(parents=True, exist_ok=True)
+            self._dir_ready = True
+        line = json.dumps(
+            {"id": message_id, "role": role, "text": text},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        with self._snippets_path.open("ab") as handle:
+            offset = handle.tell()
+            handle.write(line.encode("utf-8") + b"\n")
+        if self._note_texts is not None and role == NOTE_ROLE:
+            self._note_texts.add(text)
+        return offset
+
+    def _read_snippets(self) -> list[tuple[int, int, str, str]]:
+        if not self._snippets_path.exists():
+            return []
+        snippets: list[tuple[int, int, str, str]] = []
+        offset = 0
+        with self._snippets_path.open("rb") as handle:
+            for raw_line in handle:
+                line_offset, offset = offset, offset + len(raw_line)
+                if not raw_line.endswith(b"\n"):
+                    # A torn last line from a crash mid-append.
+                    break
+                try:
+                    record = json.loads(raw_line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and isinstance(record.get("text"), str):
+                    snippets.append(
+                        (
+                            line_offset,
+                            int(record.get("id", NOTE_MESSAGE_ID)),
+                            str(record.get("role", "")),
+                            record["text"],
+                        )
+                    )
+        return snippets
+
+    def read_snippet(self, offset: int) -> tuple[int, str, str]:
+        with self._snippets_path.open("rb") as handle:
+            handle.seek(offset)
+            record = json.loads(handle.readline())
+        return (
+            int(record.get("id", NOTE_MESSAGE_ID)),
+            str(record.get("role", "")),
+            str(record.get("text", "")),
+        )
+
+
+class _HashedVectorIndex(_UserIndex):
+    def __init__(self, user_dir: Path, dimensions: int) -> None:
+        super().__init__(user_dir)
+        self._numpy = _load_numpy()
+        self._dimensions = dimensions
+        # The width is part of the name so a changed dimension rebuilds
+        # instead of misreading the old matrix.
+        self._vectors_path = user_dir / f"vectors-{dimensions}.f32"
+        self._rows_path = user_dir / _ROWS_FILE_NAME
+        self._vectors: Any = None
+        self._rows: Any = None
+        self._row_count = 0
+        self._document_frequency: Any = None
+        self._opened = False
+
+    def add(self, message_id: int, role: str, text: str) -> None:
+        self._ensure_open()
+        offset = self._append_snippet(message_id, role, text)
+        np = self._numpy
+        vector = self._embed(tokenize(text))
+        self._document_frequency += vector != 0
+        # The row is written last: a crash before it leaves an unreferenced
+        # vector that the next append truncates away.
+        with self._vectors_path.open("ab") as handle:
+            handle.write(vector.tobytes())
+        with self._rows_path.open("ab") as handle:
+            handle.write(np.array([message_id, offset], dtype=np.int64).tobytes())
+        self._row_count += 1
+        self._vectors = None
+        self._rows = None
+
+    def search(
+        self, query: str, k: int, max_message_id: int | None, min_score: float
+    ) -> list[tuple[int, float]]:
+        self._ensure_open()
+        if not self._row_count or k <= 0:
+            return []
+        np = self._numpy
+        query_vector = self._embed(tokenize(query))
+        # Query vectors have only a handful of non-zero dimensions, so only
+        # those columns of the matrix are read.
+        columns = np.flatnonzero(query_vector)
+        if not columns.size:
+            return []
+        # Hashed dimensions shared by most messages are down-weighted, which
+        # stands in for the IDF a real vocabulary would provide.
+        weights = query_vector[columns] * np.log1p(
+            self._row_count / (1.0 + self._document_frequency[columns])
+        )
+        weights /= np.linalg.norm(weights)
+        vectors, rows = self._mapped()
+        scores = vectors[:, columns] @ weights
+        # Most rows share no dimension with the query and score zero; ranking
+        # only the rows above the threshold avoids partitioning all those ties.
+        candidates = np.flatnonzero(scores >= min_score)
+        if max_message_id is not None:
+            candidates = candidates[rows[candidates, 0] <= max_message_id]
+        if candidates.size > k:
+            candidates = candidates[
+                np.argpartition(scores[candidates], candidates.size - k)[-k:]
+            ]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(int(rows[row, 1]), float(scores[row])) for row in candidates]
+
+    def close(self) -> None:
+        self._vectors = None
+        self._rows = None
+
+    def _ensure_open(self) -> None:
+        if self._opened:
+            return
+        self._opened = True
+        np = self._numpy
+        row_bytes = self._rows_path.stat().st_size if self._rows_path.exists() else 0
+        vector_bytes = (
+            self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        )
+        row_count = min(
+            row_bytes // _ROW_BYTES,
+            vector_bytes // (self._dimensions * _FLOAT_BYTES),
+        )
+        if row_count == 0 and self._snippets_path.exists():
+            self._rebuild()
+        else:
+            self._truncate(row_count)
+        self._document_frequency = np.zeros(self._dimensions, dtype=np.int64)
+        if self._row_count:
+            vectors, _ = self._mapped()
+            self._document_frequency += np.count_nonzero(vectors, axis=0)
+
+    def _rebuild(self) -> None:
+        # Snippets were indexed by BM25 or at another width; embed them again.
+        snippets = self._read_snippets()
+        np = self._numpy
+        matrix = np.zeros((len(snippets), self._dimensions), dtype=np.float32)
+        rows = np.zeros((len(snippets), _ROW_WIDTH), dtype=np.int64)
+        for index, (offset, message_id, _, text) in enumerate(snippets):
+            matrix[index] = self._embed(tokenize(text))
+            rows[index] = (message_id, offset)
+        self._vectors_path.write_bytes(matrix.tobytes())
+        self._rows_path.write_bytes(rows.tobytes())
+        for stale in self.user_dir.glob("vectors-*.f32"):
+            if stale != self._vectors_path:
+                stale.unlink(missing_ok=True)
+        self._row_count = len(snippets)
+
+    def _truncate(self, row_count: int) -> None:
+        for path, size in (
+            (self._rows_path, row_count * _ROW_BYTES),
+            (self._vectors_path, row_count * self._dimensions * _FLOAT_BYTES),
+        ):
+            if path.exists() and path.stat().st_size != size:
+                with path.open("r+b") as handle:
+                    handle.truncate(size)
+        self._row_count = row_count
+
+    def _mapped(self) -> tuple[Any, Any]:
+        if self._vectors is None or self._rows is None:
+            np = self._numpy
+            # Plain ndarray views over the maps: arithmetic on the memmap
+            # subclass itself is noticeably slower.
+            self._vectors = np.asarray(
+                np.memmap(
+                    self._vectors_path,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self._row_count, self._dimensions),
+                )
+            )
+            self._rows = np.asarray(
+                np.memmap(
+                    self._rows_path,
+                    dtype=np.int64,
+                    mode="r",
+                    shape=(self._row_count, _ROW_WIDTH),
+                )
+            )
+        return self._vectors, self._rows
+
+    def _embed(self, tokens: list[str]) -> Any:
+        np = self._numpy
+        vector = np.zeros(self._dimensions, dtype=np.float32)
+        if not tokens:
+            return vector
+        indices: list[int] = []
+        weights: list[float] = []
+        for token, count in Counter(tokens).items():
+            token_hash = zlib.crc32(token.encode("utf-8"))
+            indices.append(token_hash % self._dimensions)
+            sign = 1.0 if token_hash & 0x80000000 else -1.0
+            weights.append(sign * (1.0 + math.log(count)))
+        np.add.at(vector, indices, weights)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+class _Bm25Index(_UserIndex):
+    def __init__(self, user_dir: Path) -> None:
+        super().__init__(user_dir)
+        self._message_ids: list[int] = []
+        self._offsets: list[int] = []
+        self._lengths: list[int] = []
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._total_length = 0
+        self._opened = False
+
+    def add(self, message_id: int, role: str, text: str) -> None:
+        self._ensure_open()
+        offset = self._append_snippet(message_id, role, text)
+        self._index(offset, message_id, text)
+
+    def search(
+        self, query: str, k: int, max_message_id: int | None, min_score: float
+    ) -> list[tuple[int, float]]:
+        self._ensure_open()
+        document_count = len(self._message_ids)
+        if not document_count or k <= 0:
+            return []
+        average_length = self._total_length / document_count
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            frequency = len(postings)
+            # Terms in most documents barely move the ranking but cost a full
+            # pass over their postings, so they are skipped.
+            if document_count > 10 and frequency * 2 > document_count:
+                continue
+            idf = math.log(1 + (document_count - frequency + 0.5) / (frequency + 0.5))
+            for row, term_count in postings:
+                if (
+                    max_message_id is not None
+                    and self._message_ids[row] > max_message_id
+                ):
+                    continue
+                length_norm = 1 - _BM25_B + _BM25_B * self._lengths[row] / average_length
+                scores[row] = scores.get(row, 0.0) + idf * term_count * (_BM25_K1 + 1) / (
+                    term_count + _BM25_K1 * length_norm
+                )
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self._offsets[row], score) for row, score in best if score >= min_score]
+
+    def _ensure_open(self) -> None:
+        if self._opened:
+            return
+        self._opened = True
+        for offset, message_id, _, text in self._read_snippets():
+            self._index(offset, message_id, text)
+
+    def _index(self, offset: int, message_id: int, text: str) -> None:
+        row = len(self._message_ids)
+        tokens = tokenize(text)
+        self._message_ids.append(message_id)
+        self._offsets.append(offset)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        for term, term_count in Counter(tokens).items():
+            self._postings.setdefault(term, []).append((row, term_count))
+
+
+class RetrievalIndex:
+    def __init__(
+        self,
+        index_dir: Path,
+        *,
+        mode: str = DEFAULT_RETRIEVAL_MODE,
+        dimensions: int = DEFAULT_RETRIEVAL_DIMENSIONS,
+        snippet_chars: int = DEFAULT_RETRIEVAL_SNIPPET_CHARS,
+        cache_max_users: int = DEFAULT_RETRIEVAL_CACHE_MAX_USERS,
+    ) -> None:
+        self._index_dir = index_dir
+        self._mode = resolve_retrieval_mode(mode)
+        self._dimensions = max(8, dimensions)
+        self._snippet_chars = max(20, snippet_chars)
+        self._cache_max_users = max(1, cache_max_users)
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[str, _UserIndex] = OrderedDict()
+        # Kept apart from the evictable cache: an evicted index can still be in
+        # use, and the one that replaces it must wait for that to finish. An
+        # entry lives only while a thread holds or waits on it.
+        self._user_locks = ThreadLockRegistry("retrieval_index")
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @property
+    def enabled(self) -> bool:
+        return self._mode != RETRIEVAL_MODE_OFF
+
+    @property
+    def min_score(self) -> float:
+        if self._mode == RETRIEVAL_MODE_HASHED:
+            return DEFAULT_MIN_COSINE_SCORE
+        return DEFAULT_MIN_BM25_SCORE
+
+    def add_message(self, user_id: str, message: dict[str, Any]) -> None:
+        self.add_messages(user_id, [message])
+
+    def add_messages(self, user_id: str, messages: Iterable[dict[str, Any]]) -> int:
+        if not self.enabled:
+            return 0
+        added = 0
+        with self._user_locks.lock(self._index_dir / user_id):
+            user_index = self._user_index(user_id)
+            for message in messages:
+                message_id = message.get("id")
+                content = message.get("content")
+                if (
+                    not isinstance(message_id, int)
+                    or not isinstance(content, str)
+                    or not content.strip()
+                ):
+                    continue
+                user_index.add(
+                    message_id, str(message.get("role", "")), self._snippet(content)
+                )
+                added += 1
+        return added
+
+    def add_notes(self, user_id: str, note_texts: list[str]) -> int:
+        if not self.enabled or not note_texts:
+            return 0
+        added = 0
+        with self._user_locks.lock(self._index_dir / user_id):
+            user_index = self._user_index(user_id)
+            for note_text in note_texts:
+                snippet = self._snippet(note_text)
+                if not snippet or snippet in user_index.note_texts():
+                    continue
+                user_index.add(NOTE_MESSAGE_ID, NOTE_ROLE, snippet)
+                added += 1
+        return added
+
+    def search(
+        self,
+        user_id: str,
+        query: str,
+        *,
+        k: int = DEFAULT_RETRIEVAL_TOP_K,
+        max_message_id: int | None = None,
+        exclude_texts: Collection[str] = (),
+    ) -> list[RetrievedSnippet]:
+        if not self.enabled or not query.strip() or k <= 0:
+            return []
+        if not (self._index_dir / user_id).is_dir():
+            return []
+        excluded = {self._snippet(text) for text in exclude_texts}
+        with self._user_locks.lock(self._index_dir / user_id):
+            user_index = self._user_index(user_id)
+            # Excluded snippets are already in front of the model; extra hits
+            # are fetched so they do not eat into k.
+            hits = user_index.search(
+                query, k + len(excluded), max_message_id, self.min_score
+            )
+            snippets: list[RetrievedSnippet] = []
+            for offset, score in hits:
+                if len(snippets) == k:
+                    break
+                message_id, role, text = user_index.read_snippet(offset)
+                if text in excluded:
+                    continue
+                snippets.append(
+                    RetrievedSnippet(
+                        message_id=message_id,
+                        role=role,
+                        text=text,
+                        score=score,
+                    )
+                )
+        return snippets
+
+    def reset(self, user_id: str) -> None:
+        with self._user_locks.lock(self._index_dir / user_id):
+            with self._lock:
+                user_index = self._indexes.pop(user_id, None)
+            if user_index is not None:
+                user_index.close()
+            shutil.rmtree(self._index_dir / user_id, ignore_errors=True)
+
+    def close(self) -> None:
+        with self._lock:
+            indexes = list(self._indexes.values())
+            self._indexes.clear()
+        for user_index in indexes:
+            user_index.close()
+
+    def _user_index(self, user_id: str) -> _UserIndex:
+        with self._lock:
+            user_index = self._indexes.get(user_id)
+            if user_index is not None:
+                self._indexes.move_to_end(user_id)
+                return user_index
+            user_dir = self._index_dir / user_id
+            if self._mode == RETRIEVAL_MODE_HASHED:
+                user_index = _HashedVectorIndex(user_dir, self._dimensions)
+            else:
+                user_index = _Bm25Index(user_dir)
+            self._indexes[user_id] = user_index
+            while len(self._indexes) > self._cache_max_users:
+                _, evicted = self._indexes.popitem(last=False)
+                evicted.close()
+            return user_index
+
+    def _snippet(self, text: str) -> str:
+        collapsed = " ".join(text.split())
+        if len(collapsed) <= self._snippet_chars:
+            return collapsed
+        return collapsed[: self._snippet_chars - 3].rstrip() + "..."
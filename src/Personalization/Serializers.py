@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+
+SERIALIZER_JSON = "json"
+SERIALIZER_ORJSON = "orjson"
+SERIALIZER_MSGPACK = "msgpack"
+SUPPORTED_SERIALIZERS = (SERIALIZER_JSON, SERIALIZER_ORJSON, SERIALIZER_MSGPACK)
+
+DEFAULT_SERIALIZER = SERIALIZER_JSON
+
+_JSON_LEADING_BYTES = frozenset(b"{[ \t\r\n")
+
+
+def _load_orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def _load_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+class Serializer:
+    def __init__(self, name: str = DEFAULT_SERIALIZER) -> None:
+        normalized = name.strip().lower()
+        if normalized not in SUPPORTED_SERIALIZERS:
+            supported = ", ".join(SUPPORTED_SERIALIZERS)
+            raise ValueError(
+                f"Unsupported memory serializer: {normalized}. Supported: {supported}"
+            )
+        if normalized == SERIALIZER_MSGPACK and _load_msgpack() is None:
+            raise ValueError("msgpack serialization requires the 'msgpack' package.")
+        # orjson writes the same bytes as compact JSON, so when it is missing
+        # the stdlib codec is a drop-in fallback rather than an error.
+        if normalized == SERIALIZER_ORJSON and _load_orjson() is None:
+            normalized = SERIALIZER_JSON
+        self._name = normalized
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def dumps(self, data: Any) -> bytes:
+        if self._name == SERIALIZER_MSGPACK:
+            return _load_msgpack().packb(data, use_bin_type=True)
+        if self._name == SERIALIZER_ORJSON:
+            return _load_orjson().dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+    def loads(self, raw: bytes) -> Any:
+        # Files are sniffed rather than trusted to the configured format, so a
+        # directory written under an older setting keeps loading.
+        if not raw or raw[0] in _JSON_LEADING_BYTES:
+            orjson = _load_orjson()
+            if orjson is not None:
+                return orjson.loads(raw)
+            return json.loads(raw)
+        msgpack = _load_msgpack()
+        if msgpack is None:
+            # Not a ValueError: the file is intact and must not be treated as
+            # corrupt just because this process lacks the codec.
+            raise RuntimeError("Reading msgpack memory files requires 'msgpack'.")
+        return msgpack.unpackb(raw, raw=False)
@@ -0,0 +1,689 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from Personalization.DurableWrites import (
+    DEFAULT_FSYNC_POLICY,
+    DEFAULT_GROUP_COMMIT_WINDOW_MS,
+    FSYNC_ALWAYS,
+    FSYNC_NEVER,
+    GroupCommitWriter,
+)
+from Personalization.MessageLog import AppendOnlyMessageLog
+from Personalization.Serializers import DEFAULT_SERIALIZER, Serializer
+from Utils.Metrics import Metrics
+
+
+RECENT_CONTEXT_DIR_NAME = "recent_context"
+PERSONALIZATION_PROFILE_DIR_NAME = "personalization_profile"
+DEFAULT_SQLITE_FILE_NAME = "memory.sqlite3"
+
+_SQLITE_SYNCHRONOUS_BY_FSYNC_POLICY = {FSYNC_ALWAYS: "FULL", FSYNC_NEVER: "OFF"}
+
+RECENT_CONTEXT_VERSION = 1
+
+_MESSAGE_COLUMNS = ("id", "role", "content", "timestamp")
+
+
+def _utc_now_compact() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def is_valid_message(message: Any) -> bool:
+    return (
+        isinstance(message, dict)
+        and isinstance(message.get("role"), str)
+        and isinstance(message.get("content"), str)
+    )
+
+
+def coerce_next_message_id(value: Any) -> int:
+    if isinstance(value, int) and value >= 1:
+        return value
+    return 1
+
+
+class MemoryBackend(ABC):
+    name: str = ""
+
+    @abstractmethod
+    def load_recent_context(self, user_id: str) -> dict[str, Any] | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_recent_context(self, user_id: str, data: dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_message(self, user_id: str, message: dict[str, Any]) -> dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def tail_messages(self, user_id: str, limit: int) -> list[dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def messages_after(self, user_id: str, message_id: int) -> list[dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset_messages(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_messages(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_rolling_summary(self, user_id: str) -> dict[str, Any] | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_profile(self, user_id: str) -> dict[str, Any] | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_profile(self, user_id: str, data: dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_user_ids(self) -> list[str]:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+class JsonFileBackend(MemoryBackend):
+    name = "json"
+
+    def __init__(
+        self,
+        memory_dir: Path,
+        *,
+        writer: GroupCommitWriter | None = None,
+        serializer: Serializer | None = None,
+    ) -> None:
+        self._memory_dir = memory_dir
+        self._writer = writer or GroupCommitWriter()
+        self._serializer = serializer or Serializer()
+        self._recent_context_dir = memory_dir / RECENT_CONTEXT_DIR_NAME
+        self._personalization_profile_dir = memory_dir / PERSONALIZATION_PROFILE_DIR_NAME
+        self._recent_context_dir.mkdir(parents=True, exist_ok=True)
+        self._personalization_profile_dir.mkdir(parents=True, exist_ok=True)
+
+    def load_recent_context(self, user_id: str) -> dict[str, Any] | None:
+        return self._read_json(self._recent_context_path(user_id))
+
+    def save_recent_context(self, user_id: str, data: dict[str, Any]) -> None:
+        self._write_json(self._recent_context_path(user_id), data)
+
+    def append_message(self, user_id: str, message: dict[str, Any]) -> dict[str, Any]:
+        data = self.load_recent_context(user_id)
+        if not isinstance(data, dict):
+            data = {}
+        messages = data.get("messages")
+        cleaned = (
+            [item for item in messages if is_valid_message(item)]
+            if isinstance(messages, list)
+            else []
+        )
+        stored = {**message, "id": coerce_next_message_id(data.get("next_message_id"))}
+        cleaned.append(stored)
+        self.save_recent_context(
+            user_id,
+            {
+                **data,
+                "version": RECENT_CONTEXT_VERSION,
+                "user_id": user_id,
+                "next_message_id": stored["id"] + 1,
+                "messages": cleaned,
+            },
+        )
+        return stored
+
+    def tail_messages(self, user_id: str, limit: int) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        return self._stored_messages(user_id)[-limit:]
+
+    def messages_after(self, user_id: str, message_id: int) -> list[dict[str, Any]]:
+        return [
+            message
+            for message in self._stored_messages(user_id)
+            if isinstance(message.get("id"), int) and message["id"] > message_id
+        ]
+
+    def reset_messages(self, user_id: str) -> None:
+        data = self.load_recent_context(user_id)
+        next_message_id = (
+            coerce_next_message_id(data.get("next_message_id"))
+            if isinstance(data, dict)
+            else 1
+        )
+        self.save_recent_context(
+            user_id,
+            {
+                "version": RECENT_CONTEXT_VERSION,
+                "user_id": user_id,
+                "next_message_id": next_message_id,
+                "messages": [],
+            },
+        )
+
+    def count_messages(self, user_id: str) -> int:
+        return len(self._stored_messages(user_id))
+
+    def load_rolling_summary(self, user_id: str) -> dict[str, Any] | None:
+        data = self.load_recent_context(user_id)
+        if isinstance(data, dict) and isinstance(data.get("rolling_summary"), dict):
+            return data["rolling_summary"]
+        return None
+
+    def load_profile(self, user_id: str) -> dict[str, Any] | None:
+        return self._read_json(self._personalization_profile_path(user_id))
+
+    def save_profile(self, user_id: str, data: dict[str, Any]) -> None:
+        self._write_json(self._personalization_profile_path(user_id), data)
+
+    def list_user_ids(self) -> list[str]:
+        user_ids = {
+            path.stem
+            for directory in (
+                self._recent_context_dir,
+                self._personalization_profile_dir,
+            )
+            for path in [*directory.glob("*.json"), *self._writer.pending_paths()]
+            if path.parent == directory
+            and path.suffix == ".json"
+            and not path.name.endswith(".header.json")
+        }
+        return sorted(user_ids)
+
+    def flush(self) -> None:
+        self._writer.flush()
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def _stored_messages(self, user_id: str) -> list[dict[str, Any]]:
+        data = self.load_recent_context(user_id)
+        if not isinstance(data, dict) or not isinstance(data.get("messages"), list):
+            return []
+        return [message for message in data["messages"] if is_valid_message(message)]
+
+    def _recent_context_path(self, user_id: str) -> Path:
+        return self._recent_context_dir / f"{user_id}.json"
+
+    def _personalization_profile_path(self, user_id: str) -> Path:
+        return self._personalization_profile_dir / f"{user_id}.json"
+
+    def _read_json(self, path: Path) -> dict[str, Any] | None:
+        pending = self._writer.read(path)
+        if pending is not None:
+            return self._serializer.loads(pending)
+        if not path.exists():
+            return None
+        try:
+            return self._serializer.loads(path.read_bytes())
+        except (OSError, ValueError):
+            backup_path = path.with_name(f"{path.name}.corrupt-{_utc_now_compact()}")
+            try:
+                path.replace(backup_path)
+            except OSError:
+                pass
+            return None
+
+    def _write_json(self, path: Path, data: dict[str, Any]) -> None:
+        self._writer.write(path, self._serializer.dumps(data))
+
+
+class JsonlLogBackend(JsonFileBackend):
+    name = "jsonl"
+
+    def load_recent_context(self, user_id: str) -> dict[str, Any] | None:
+        message_log = self._message_log(user_id)
+        if not message_log.exists():
+            return None
+        data = {
+            "next_message_id": message_log.next_message_id(),
+            "messages": message_log.read_all(),
+        }
+        rolling_summary = message_log.read_header().get("rolling_summary")
+        if rolling_summary:
+            data["rolling_summary"] = rolling_summary
+        return data
+
+    def save_recent_context(self, user_id: str, data: dict[str, Any]) -> None:
+        messages = data.get("messages")
+        rolling_summary = data.get("rolling_summary")
+        self._message_log(user_id).rewrite(
+            messages if isinstance(messages, list) else [],
+            coerce_next_message_id(data.get("next_message_id")),
+            rolling_summary=rolling_summary if isinstance(rolling_summary, dict) else None,
+        )
+
+    def append_message(self, user_id: str, message: dict[str, Any]) -> dict[str, Any]:
+        message_log = self._message_log(user_id)
+        stored = {**message, "id": message_log.next_message_id()}
+        message_log.append(stored)
+        return stored
+
+    def tail_messages(self, user_id: str, limit: int) -> list[dict[str, Any]]:
+        return self._message_log(user_id).read_tail(limit)
+
+    def messages_after(self, user_id: str, message_id: int) -> list[dict[str, Any]]:
+        return self._message_log(user_id).read_after(message_id)
+
+    def reset_messages(self, user_id: str) -> None:
+        message_log = self._message_log(user_id)
+        message_log.reset(message_log.next_message_id())
+
+    def count_messages(self, user_id: str) -> int:
+        return self._message_log(user_id).line_count()
+
+    def load_rolling_summary(self, user_id: str) -> dict[str, Any] | None:
+        return self._message_log(user_id).read_header().get("rolling_summary")
+
+    def list_user_ids(self) -> list[str]:
+        log_user_ids = {
+            path.name.removesuffix(".jsonl")
+            for path in self._recent_context_dir.glob("*.jsonl")
+        }
+        return sorted(log_user_ids | set(super().list_user_ids()))
+
+    def _message_log(self, user_id: str) -> AppendOnlyMessageLog:
+        message_log = AppendOnlyMessageLog(
+            self._recent_context_dir / f"{user_id}.jsonl",
+            self._recent_context_dir / f"{user_id}.header.json",
+            user_id,
+            writer=self._writer,
+        )
+        legacy_path = self._recent_context_path(user_id)
+        if not message_log.exists() and legacy_path.exists():
+            legacy_data = self._read_json(legacy_path)
+            if isinstance(legacy_data, dict):
+                messages = legacy_data.get("messages")
+                rolling_summary = legacy_data.get("rolling_summary")
+                message_log.rewrite(
+                    [item for item in messages if is_valid_message(item)]
+                    if isinstance(messages, list)
+                    else [],
+                    coerce_next_message_id(legacy_data.get("next_message_id")),
+                    rolling_summary=(
+                        rolling_summary if isinstance(rolling_summary, dict) else None
+                    ),
+                )
+        return message_log
+
+
+class SqliteBackend(MemoryBackend):
+    name = "sqlite"
+
+    def __init__(
+        self, database_path: Path, *, fsync_policy: str = DEFAULT_FSYNC_POLICY
+    ) -> None:
+        database_path.parent.mkdir(parents=True, exist_ok=True)
+        self._database_path = database_path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            database_path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL syncs at checkpoints, which is SQLite's own group
+        # commit; "always" and "never" map to FULL and OFF.
+        synchronous = _SQLITE_SYNCHRONOUS_BY_FSYNC_POLICY.get(fsync_policy, "NORMAL")
+        self._connection.execute(f"PRAGMA synchronous={synchronous}")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                user_id TEXT PRIMARY KEY,
+                next_message_id INTEGER NOT NULL DEFAULT 1,
+                rolling_summary TEXT
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                user_id TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL DEFAULT '',
+                metadata TEXT,
+                PRIMARY KEY (user_id, message_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS profiles (
+                user_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+            """
+        )
+        conversation_columns = {
+            row["name"]
+            for row in self._connection.execute("PRAGMA table_info(conversations)")
+        }
+        if "rolling_summary" not in conversation_columns:
+            self._connection.execute(
+                "ALTER TABLE conversations ADD COLUMN rolling_summary TEXT"
+            )
+
+    @property
+    def database_path(self) -> Path:
+        return self._database_path
+
+    def load_recent_context(self, user_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT next_message_id, rolling_summary FROM conversations "
+                "WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            rows = self._connection.execute(
+                "SELECT * FROM messages WHERE user_id = ? ORDER BY message_id",
+                (user_id,),
+            ).fetchall()
+        data = {
+            "next_message_id": row["next_message_id"],
+            "messages": [self._row_to_message(item) for item in rows],
+        }
+        rolling_summary = self._decode_json_object(row["rolling_summary"])
+        if rolling_summary is not None:
+            data["rolling_summary"] = rolling_summary
+        return data
+
+    def save_recent_context(self, user_id: str, data: dict[str, Any]) -> None:
+        messages = data.get("messages")
+        cleaned = (
+            [item for item in messages if is_valid_message(item)]
+            if isinstance(messages, list)
+            else []
+        )
+        next_message_id = coerce_next_message_id(data.get("next_message_id"))
+        with self._lock, self._transaction():
+            self._connection.execute(
+                "DELETE FROM messages WHERE user_id = ?", (user_id,)
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO messages "
+                "(user_id, message_id, role, content, timestamp, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._message_to_row(user_id, item) for item in cleaned],
+            )
+            highest_id = max(
+                (item["id"] for item in cleaned if isinstance(item.get("id"), int)),
+                default=0,
+            )
+            self._set_next_message_id(user_id, max(next_message_id, highest_id + 1))
+            rolling_summary = data.get("rolling_summary")
+            self._connection.execute(
+                "UPDATE conversations SET rolling_summary = ? WHERE user_id = ?",
+                (
+                    json.dumps(rolling_summary, ensure_ascii=False)
+                    if isinstance(rolling_summary, dict)
+                    else None,
+                    user_id,
+                ),
+            )
+
+    def append_message(self, user_id: str, message: dict[str, Any]) -> dict[str, Any]:
+        with self._lock, self._transaction():
+            row = self._connection.execute(
+                "SELECT next_message_id FROM conversations WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+            message_id = row["next_message_id"] if row is not None else 1
+            stored = {**message, "id": message_id}
+            self._connection.execute(
+                "INSERT INTO messages "
+                "(user_id, message_id, role, content, timestamp, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._message_to_row(user_id, stored),
+            )
+            self._set_next_message_id(user_id, message_id + 1)
+        return stored
+
+    def tail_messages(self, user_id: str, limit: int) -> list[dict[str, Any]]:
+        if limit <= 0:
+            return []
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM messages WHERE user_id = ? "
+                "ORDER BY message_id DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        return [self._row_to_message(item) for item in reversed(rows)]
+
+    def messages_after(self, user_id: str, message_id: int) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM messages WHERE user_id = ? AND message_id > ? "
+                "ORDER BY message_id",
+                (user_id, message_id),
+            ).fetchall()
+        return [self._row_to_message(item) for item in rows]
+
+    def reset_messages(self, user_id: str) -> None:
+        with self._lock, self._transaction():
+            self._connection.execute(
+                "DELETE FROM messages WHERE user_id = ?", (user_id,)
+            )
+            self._connection.execute(
+                "UPDATE conversations SET rolling_summary = NULL WHERE user_id = ?",
+                (user_id,),
+            )
+
+    def count_messages(self, user_id: str) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT COUNT(*) AS total FROM messages WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row["total"]
+
+    def load_rolling_summary(self, user_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT rolling_summary FROM conversations WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._decode_json_object(row["rolling_summary"])
+
+    def load_profile(self, user_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._decode_json_object(row["data"])
+
+    def save_profile(self, user_id: str, data: dict[str, Any]) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO profiles (user_id, data) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+                (user_id, json.dumps(data, ensure_ascii=False)),
+            )
+
+    def list_user_ids(self) -> list[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT user_id FROM conversations "
+                "UNION SELECT user_id FROM profiles ORDER BY user_id"
+            ).fetchall()
+        return [row["user_id"] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _transaction(self):
+        return _SqliteTransaction(self._connection)
+
+    def _set_next_message_id(self, user_id: str, next_message_id: int) -> None:
+        self._connection.execute(
+            "INSERT INTO conversations (user_id, next_message_id) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET next_message_id = excluded.next_message_id",
+            (user_id, next_message_id),
+        )
+
+    def _message_to_row(self, user_id: str, message: dict[str, Any]) -> tuple:
+        metadata = {
+            key: value for key, value in message.items() if key not in _MESSAGE_COLUMNS
+        }
+        timestamp = message.get("timestamp")
+        return (
+            user_id,
+            message.get("id"),
+            message["role"],
+            message["content"],
+            timestamp if isinstance(timestamp, str) else "",
+            json.dumps(metadata, ensure_ascii=False) if metadata else None,
+        )
+
+    def _decode_json_object(self, raw: str | None) -> dict[str, Any] | None:
+        if not raw:
+            return None
+        try:
+            decoded = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        return decoded if isinstance(decoded, dict) else None
+
+    def _row_to_message(self, row: sqlite3.Row) -> dict[str, Any]:
+        message: dict[str, Any] = {
+            "id": row["message_id"],
+            "role": row["role"],
+            "content": row["content"],
+            "timestamp": row["timestamp"],
+        }
+        if row["metadata"]:
+            try:
+                metadata = json.loads(row["metadata"])
+            except json.JSONDecodeError:
+                metadata = None
+            if isinstance(metadata, dict):
+                message.update(metadata)
+        return message
+
+
+class _SqliteTransaction:
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._connection.execute("BEGIN IMMEDIATE")
+        return self._connection
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self._connection.execute("COMMIT")
+        else:
+            self._connection.execute("ROLLBACK")
+
+
+class TimedMemoryBackend(MemoryBackend):
+    def __init__(self, backend: MemoryBackend, metrics: Metrics) -> None:
+        self.name = backend.name
+        self._backend = backend
+        self._metrics = metrics
+
+    def load_recent_context(self, user_id: str) -> dict[str, Any] | None:
+        with self._span("load_recent_context"):
+            return self._backend.load_recent_context(user_id)
+
+    def save_recent_context(self, user_id: str, data: dict[str, Any]) -> None:
+        with self._span("save_recent_context"):
+            self._backend.save_recent_context(user_id, data)
+
+    def append_message(self, user_id: str, message: dict[str, Any]) -> dict[str, Any]:
+        with self._span("append_message"):
+            return self._backend.append_message(user_id, message)
+
+    def tail_messages(self, user_id: str, limit: int) -> list[dict[str, Any]]:
+        with self._span("tail_messages"):
+            return self._backend.tail_messages(user_id, limit)
+
+    def messages_after(self, user_id: str, message_id: int) -> list[dict[str, Any]]:
+        with self._span("messages_after"):
+            return self._backend.messages_after(user_id, message_id)
+
+    def reset_messages(self, user_id: str) -> None:
+        with self._span("reset_messages"):
+            self._backend.reset_messages(user_id)
+
+    def count_messages(self, user_id: str) -> int:
+        with self._span("count_messages"):
+            return self._backend.count_messages(user_id)
+
+    def load_rolling_summary(self, user_id: str) -> dict[str, Any] | None:
+        with self._span("load_rolling_summary"):
+            return self._backend.load_rolling_summary(user_id)
+
+    def load_profile(self, user_id: str) -> dict[str, Any] | None:
+        with self._span("load_profile"):
+            return self._backend.load_profile(user_id)
+
+    def save_profile(self, user_id: str, data: dict[str, Any]) -> None:
+        with self._span("save_profile"):
+            self._backend.save_profile(user_id, data)
+
+    def list_user_ids(self) -> list[str]:
+        with self._span("list_user_ids"):
+            return self._backend.list_user_ids()
+
+    def flush(self) -> None:
+        with self._span("flush"):
+            self._backend.flush()
+
+    def close(self) -> None:
+        self._backend.close()
+
+    def _span(self, operation: str):
+        return self._metrics.span("storage", backend=self.name, operation=operation)
+
+
+def build_memory_backend(
+    storage_mode: str,
+    memory_dir: Path,
+    *,
+    sqlite_path: Path | None = None,
+    fsync_policy: str = DEFAULT_FSYNC_POLICY,
+    group_commit_window_ms: int = DEFAULT_GROUP_COMMIT_WINDOW_MS,
+    serializer: str = DEFAULT_SERIALIZER,
+) -> MemoryBackend:
+    if storage_mode == SqliteBackend.name:
+        return SqliteBackend(
+            sqlite_path or memory_dir / DEFAULT_SQLITE_FILE_NAME,
+            fsync_policy=fsync_policy,
+        )
+    writer = GroupCommitWriter(
+        fsync_policy=fsync_policy, window_seconds=group_commit_window_ms / 1000
+    )
+    file_serializer = Serializer(serializer)
+    if storage_mode == JsonFileBackend.name:
+        return JsonFileBackend(memory_dir, writer=writer, serializer=file_serializer)
+    if storage_mode == JsonlLogBackend.name:
+        return JsonlLogBackend(memory_dir, writer=writer, serializer=file_serializer)
+    supported = ", ".join(SUPPORTED_STORAGE_MODES)
+    raise ValueError(
+        f"Unsupported memory storage mode: {storage_mode}. Supported modes: {supported}"
+    )
+
+
+SUPPORTED_STORAGE_MODES = (
+    JsonFileBackend.name,
+    JsonlLogBackend.name,
+    SqliteBackend.name,
+)
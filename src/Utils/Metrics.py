@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, TextIO
+
+from Utils.CommonUtils import get_env_bool, get_env_int
+
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 9464
+DEFAULT_METRICS_NAMESPACE = "soulmate"
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# A collector returns (name, kind, labels, value) samples read at scrape time,
+# where kind is "gauge" or "counter".
+Sample = tuple[str, str, dict[str, str], float]
+Collector = Callable[[], Iterable[Sample]]
+
+
+def _label_key(labels: dict[str, str]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_key: Iterable[tuple[str, str]]) -> str:
+    pairs = [f'{key}="{_escape_label_value(value)}"' for key, value in label_key]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class _Span:
+    __slots__ = ("_metrics", "_name", "_labels", "_started")
+
+    def __init__(self, metrics: Metrics, name: str, labels: dict[str, str]) -> None:
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+        self._started = 0.0
+
+    def __enter__(self) -> _Span:
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self._metrics.observe(
+            self._name, time.perf_counter() - self._started, **self._labels
+        )
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(
+        self,
+        *,
+        namespace: str = DEFAULT_METRICS_NAMESPACE,
+        json_logs: bool = False,
+        log_stream: TextIO | None = None,
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        self._namespace = namespace
+        self._json_logs = json_logs
+        self._log_stream = log_stream or sys.stderr
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple[tuple[str, str], ...], float]] = {}
+        self._histograms: dict[str, dict[tuple[tuple[str, str], ...], _Histogram]] = {}
+        self._collectors: list[Collector] = []
+
+    def span(self, name: str, **labels: str) -> _Span:
+        return _Span(self, name, labels)
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self._buckets)
+            histogram.observe(seconds)
+        if self._json_logs:
+            self._log({"metric": name, "seconds": round(seconds, 6), **labels})
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def register_collector(self, collector: Collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {
+                    key: (list(histogram.counts), histogram.total, histogram.count)
+                    for key, histogram in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+            collectors = list(self._collectors)
+
+        lines: list[str] = []
+        for name, series in sorted(counters.items()):
+            metric = f"{self._namespace}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{metric}{_format_labels(key)} {_format_value(value)}")
+        for name, series in sorted(histograms.items()):
+            metric = f"{self._namespace}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for key, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    (*self._buckets, float("inf")), counts
+                ):
+                    cumulative += bucket_count
+                    bucket_labels = _format_labels((*key, ("le", _format_value(bound))))
+                    lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{metric}_count{_format_labels(key)} {count}")
+
+        collected: dict[str, tuple[str, list[str]]] = {}
+        for collector in collectors:
+            try:
+                samples = list(collector())
+            except Exception as error:
+                print(f"Metrics collector failed: {error!r}", file=sys.stderr)
+                continue
+            for name, kind, labels, value in samples:
+                suffix = "_total" if kind == "counter" else ""
+                metric = f"{self._namespace}_{name}{suffix}"
+                _, sample_lines = collected.setdefault(metric, (kind, []))
+                sample_lines.append(
+                    f"{metric}{_format_labels(_label_key(labels))} {_format_value(value)}"
+                )
+        for metric, (kind, sample_lines) in sorted(collected.items()):
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(sample_lines)
+        return "\n".join(lines) + "\n"
+
+    def _log(self, record: dict[str, Any]) -> None:
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        line = json.dumps({"ts": timestamp, **record}, separators=(",", ":"))
+        with self._lock:
+            print(line, file=self._log_stream, flush=True)
+
+
+class NoopMetrics:
+    enabled = False
+
+    def span(self, name: str, **labels: str) -> _NoopSpan:
+        return _NOOP_SPAN
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        return None
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        return None
+
+    def register_collector(self, collector: Collector) -> None:
+        return None
+
+    def render_prometheus(self) -> str:
+        return ""
+
+
+def _build_metrics() -> Metrics | NoopMetrics:
+    json_logs = get_env_bool("METRICS_JSON_LOGS", False)
+    if not (get_env_bool("METRICS_ENABLED", False) or json_logs):
+        return NoopMetrics()
+    return Metrics(
+        namespace=os.getenv("METRICS_NAMESPACE", "").strip() or DEFAULT_METRICS_NAMESPACE,
+        json_logs=json_logs,
+    )
+
+
+_metrics = _build_metrics()
+
+
+def get_metrics() -> Metrics | NoopMetrics:
+    return _metrics
+
+
+def counter_samples(
+    name: str, counters: dict[str, Any], **labels: str
+) -> list[Sample]:
+    return [
+        (name, "counter", {**labels, "kind": key}, float(value))
+        for key, value in counters.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+
+class MetricsServer:
+    def __init__(self, metrics: Metrics, host: str, port: int) -> None:
+        render = metrics.render_prometheus
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return None
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def start_metrics_server() -> MetricsServer | None:
+    metrics = get_metrics()
+    if not isinstance(metrics, Metrics) or not get_env_bool("METRICS_ENABLED", False):
+        return None
+    port = get_env_int("METRICS_PORT", DEFAULT_METRICS_PORT, minimum=0)
+    if port:
+        # Sharded workers each serve their own port next to the configured one.
+        port += get_env_int("METRICS_PORT_OFFSET", 0, minimum=0)
+    return MetricsServer(
+        metrics, os.getenv("METRICS_HOST", "").strip() or DEFAULT_METRICS_HOST, port
+    )
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+
+def usage_from_message(message: Any) -> dict[str, int] | None:
+    usage = getattr(message, "usage_metadata", None)
+    if not isinstance(usage, dict):
+        return None
+    input_details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": int(usage.get("input_tokens") or 0),
+        "cached_tokens": int(input_details.get("cache_read") or 0),
+        "output_tokens": int(usage.get("output_tokens") or 0),
+    }
+
+
+class PromptCacheStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0,
+            "calls_with_usage": 0,
+            "calls_with_cache_hit": 0,
+            "input_tokens": 0,
+            "cached_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    def record(self, usage: dict[str, int] | None) -> None:
+        with self._lock:
+            self._counters["calls"] += 1
+            if usage is None:
+                return
+            self._counters["calls_with_usage"] += 1
+            if usage["cached_tokens"]:
+                self._counters["calls_with_cache_hit"] += 1
+            for key in ("input_tokens", "cached_tokens", "output_tokens"):
+                self._counters[key] += usage[key]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        input_tokens = counters["input_tokens"]
+        return {
+            **counters,
+            "cached_token_ratio": (
+                counters["cached_tokens"] / input_tokens if input_tokens else 0.0
+            ),
+        }
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import Any, Callable
+
+# Approximate framing overhead the chat format adds around each message.
+MESSAGE_OVERHEAD_TOKENS = 4
+_ESTIMATED_BYTES_PER_TOKEN = 4
+
+
+def _estimate_tokens(text: str) -> int:
+    byte_count = len(text.encode("utf-8"))
+    return -(-byte_count // _ESTIMATED_BYTES_PER_TOKEN)
+
+
+@lru_cache(maxsize=1)
+def _resolve_counter() -> Callable[[str], int]:
+    # tiktoken downloads its BPE files on first use, so it is opt-in and any
+    # failure falls back to the byte-based estimate.
+    encoding_name = os.getenv("TOKEN_COUNTER_ENCODING", "").strip()
+    if not encoding_name:
+        return _estimate_tokens
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception:
+        return _estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: Any) -> int:
+    if not isinstance(text, str) or not text:
+        return 0
+    return _resolve_counter()(text)
+
+
+def count_message_tokens(message: dict[str, Any]) -> int:
+    cached = message.get("tokens")
+    if isinstance(cached, int) and cached >= 0:
+        return cached
+    return count_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
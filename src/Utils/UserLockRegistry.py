@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Hashable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+
+from Utils.Metrics import get_metrics
+
+
+@dataclass
+class _LockEntry:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    holders: int = 0
+
+
+@dataclass
+class _ThreadLockEntry:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    holders: int = 0
+
+
+class UserLockRegistry:
+    def __init__(self, name: str = "user") -> None:
+        self._name = name
+        self._entries: dict[Hashable, _LockEntry] = {}
+        self._created = 0
+        self._metrics = get_metrics()
+
+    @asynccontextmanager
+    async def lock(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _LockEntry()
+            self._created += 1
+        # The count covers waiters as well as the holder, so an entry is only
+        # dropped when nobody can still be queued on its lock.
+        entry.holders += 1
+        try:
+            started = time.perf_counter()
+            async with entry.lock:
+                self._metrics.observe(
+                    "lock_wait", time.perf_counter() - started, lock=self._name
+                )
+                yield
+        finally:
+            entry.holders -= 1
+            if entry.holders == 0 and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        return {"active": len(self._entries), "created": self._created}
+
+
+class ThreadLockRegistry:
+    def __init__(self, name: str = "user") -> None:
+        self._name = name
+        self._entries: dict[Hashable, _ThreadLockEntry] = {}
+        self._entries_lock = threading.Lock()
+        self._created = 0
+        self._metrics = get_metrics()
+
+    @contextmanager
+    def lock(self, key: Hashable) -> Iterator[None]:
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _ThreadLockEntry()
+                self._created += 1
+            entry.holders += 1
+        try:
+            started = time.perf_counter()
+            with entry.lock:
+                self._metrics.observe(
+                    "lock_wait", time.perf_counter() - started, lock=self._name
+                )
+                yield
+        finally:
+            with self._entries_lock:
+                entry.holders -= 1
+                if entry.holders == 0 and self._entries.get(key) is entry:
+                    del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._entries_lock:
+            return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        with self._entries_lock:
+            return {"active": len(self._entries), "created": self._created}
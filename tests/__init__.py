@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The application imports its packages from src/ as top-level modules.
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
@@ -0,0 +1,154 @@
+import asyncio
+import unittest
+from typing import Any
+
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from LLM_Providers.FailoverRouting import (
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    DEFAULT_BREAKER_FAILURE_THRESHOLD,
+    CircuitBreaker,
+    RoutedChatModel,
+    RoutedEndpoint,
+)
+
+
+class _ScriptedChatModel(BaseChatModel):
+    # "ok" answers, "hang" blocks until cancelled, anything else is raised.
+    behaviour: Any = "ok"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.behaviour != "ok":
+            raise self.behaviour
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.behaviour == "hang":
+            await asyncio.Event().wait()
+        return self._generate(messages)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for text in ("o", "k"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+
+def _half_open_endpoint(behaviour: Any) -> RoutedEndpoint:
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    return RoutedEndpoint(
+        name="primary",
+        model=_ScriptedChatModel(behaviour=behaviour),
+        breaker=breaker,
+    )
+
+
+def _status_error(error_type: type, status_code: int) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://example.invalid/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    return error_type("scripted", response=response, body=None)
+
+
+class CircuitBreakerTrialTest(unittest.TestCase):
+    def test_non_retryable_error_during_trial_releases_it_without_a_failure(
+        self,
+    ) -> None:
+        endpoint = _half_open_endpoint(_status_error(openai.BadRequestError, 400))
+        model = RoutedChatModel(endpoints=[endpoint])
+        self.assertEqual(endpoint.breaker.state, BREAKER_HALF_OPEN)
+
+        with self.assertRaises(openai.BadRequestError):
+            model.invoke([HumanMessage(content="hi")])
+
+        self.assertEqual(endpoint.counters["failures"], 0)
+        self.assertEqual(endpoint.counters["rejected"], 1)
+        self.assertEqual(endpoint.breaker.state, BREAKER_HALF_OPEN)
+        self.assertTrue(endpoint.breaker.allow_request())
+
+    def test_retryable_error_during_trial_records_failure(self) -> None:
+        endpoint = _half_open_endpoint(_status_error(openai.InternalServerError, 500))
+        model = RoutedChatModel(endpoints=[endpoint])
+
+        with self.assertRaises(Exception):
+            model.invoke([HumanMessage(content="hi")])
+
+        # The failure reopened the breaker; with a zero reset it is half-open
+        # again and admits a new trial instead of refusing forever.
+        self.assertEqual(endpoint.counters["failures"], 1)
+        self.assertTrue(endpoint.breaker.allow_request())
+
+    def test_repeated_bad_requests_leave_the_breaker_closed(self) -> None:
+        endpoint = RoutedEndpoint(
+            name="primary",
+            model=_ScriptedChatModel(
+                behaviour=_status_error(openai.BadRequestError, 400)
+            ),
+        )
+        model = RoutedChatModel(endpoints=[endpoint])
+
+        for _ in range(DEFAULT_BREAKER_FAILURE_THRESHOLD * 3):
+            with self.assertRaises(openai.BadRequestError):
+                model.invoke([HumanMessage(content="too long")])
+
+        self.assertEqual(endpoint.breaker.state, BREAKER_CLOSED)
+        self.assertEqual(endpoint.counters["failures"], 0)
+        endpoint.model.behaviour = "ok"
+        self.assertEqual(model.invoke([HumanMessage(content="hi")]).content, "ok")
+
+    def test_cancelled_trial_is_released_without_a_failure(self) -> None:
+        endpoint = _half_open_endpoint("hang")
+        model = RoutedChatModel(endpoints=[endpoint])
+
+        async def cancel_trial() -> None:
+            task = asyncio.ensure_future(model.ainvoke([HumanMessage(content="hi")]))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        self.assertEqual(endpoint.counters["failures"], 0)
+        self.assertEqual(endpoint.breaker.state, BREAKER_HALF_OPEN)
+        endpoint.model.behaviour = "ok"
+        self.assertEqual(model.invoke([HumanMessage(content="hi")]).content, "ok")
+        self.assertEqual(endpoint.breaker.state, BREAKER_CLOSED)
+
+    def test_abandoned_stream_releases_the_trial(self) -> None:
+        endpoint = _half_open_endpoint("ok")
+        model = RoutedChatModel(endpoints=[endpoint])
+
+        stream = model.stream([HumanMessage(content="hi")])
+        next(stream)
+        stream.close()
+
+        self.assertEqual(endpoint.breaker.state, BREAKER_HALF_OPEN)
+        self.assertTrue(endpoint.breaker.allow_request())
+
+    def test_only_one_trial_is_admitted_while_half_open(self) -> None:
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+        self.assertEqual(breaker.acquire(), BREAKER_CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.acquire(), BREAKER_HALF_OPEN)
+        self.assertIsNone(breaker.acquire())
+        breaker.release_trial()
+        self.assertEqual(breaker.acquire(), BREAKER_HALF_OPEN)
+
+    def test_release_leaves_an_open_breaker_open(self) -> None:
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        breaker.record_failure()
+        breaker.release_trial()
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import tempfile
+import unittest
+
+from Personalization.MemoryStore import CompactionPlan, MemoryStore
+from Personalization.PromptBuilder import build_personalized_system_prompt
+from Personalization.RetrievalIndex import RETRIEVAL_MODE_BM25, RETRIEVAL_MODE_HASHED
+
+
+class ResetRecentContextTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def _store_with_archived_history(self, retrieval_mode: str) -> MemoryStore:
+        store = MemoryStore(
+            f"{self._temp_dir.name}/{retrieval_mode}",
+            storage_mode="json",
+            retrieval_mode=retrieval_mode,
+        )
+        messages = [
+            store.append_message("42", "user", "I adopted a tortoise named Basil"),
+            store.append_message("42", "assistant", "That sounds lovely"),
+            store.append_message("42", "user", "What should I cook tonight?"),
+        ]
+        plan = CompactionPlan(
+            user_id="42", archived_messages=messages[:2], previous_summary=""
+        )
+        self.assertTrue(store.commit_compaction(plan, "Talked about a pet."))
+        store.rebuild_retrieval_index("42")
+        return store
+
+    def test_reset_purges_archive_and_retrieval_index(self) -> None:
+        for retrieval_mode in (RETRIEVAL_MODE_BM25, RETRIEVAL_MODE_HASHED):
+            with self.subTest(retrieval_mode=retrieval_mode):
+                try:
+                    store = self._store_with_archived_history(retrieval_mode)
+                except ValueError as error:
+                    self.skipTest(str(error))
+                self.assertEqual(len(store.get_archived_messages("42")), 2)
+                self.assertTrue(store.retrieval_index.search("42", "tortoise Basil"))
+
+                store.reset_recent_context("42")
+
+                self.assertEqual(store.get_archived_messages("42"), [])
+                self.assertEqual(store.load_recent_context("42")["messages"], [])
+                self.assertEqual(store.retrieval_index.search("42", "tortoise Basil"), [])
+                self.assertEqual(store.rebuild_retrieval_index("42"), 0)
+                self.assertEqual(store.retrieval_index.search("42", "tortoise Basil"), [])
+                store.close()
+
+
+class PrepareTurnTest(unittest.TestCase):
+    def test_prepare_turn_stores_user_messages_before_reading_context(self) -> None:
+        with tempfile.TemporaryDirectory() as memory_dir:
+            store = MemoryStore(memory_dir, storage_mode="json", retrieval_mode="off")
+            store.append_message("42", "assistant", "Hi there")
+            turn = store.prepare_turn(
+                "42",
+                lambda profile: "system prompt",
+                user_messages=["first", "second"],
+            )
+            self.assertEqual(turn.system_prompt, "system prompt")
+            self.assertEqual(
+                [message["content"] for message in turn.messages[-3:]],
+                ["Hi there", "first", "second"],
+            )
+            self.assertEqual(
+                [message["role"] for message in store.load_recent_context("42")["messages"]],
+                ["assistant", "user", "user"],
+            )
+            store.close()
+
+
+class PromptBlockLimitsTest(unittest.TestCase):
+    def test_store_renders_the_prompt_block_with_its_own_limits(self) -> None:
+        with tempfile.TemporaryDirectory() as memory_dir:
+            store = MemoryStore(
+                memory_dir,
+                storage_mode="json",
+                retrieval_mode="off",
+                prompt_max_notes=1,
+                prompt_max_chars=40,
+            )
+            profile = store.load_personalization_profile("42")
+            profile["summary"] = "Enjoys long walks along the river every weekend"
+            profile["notes"] = ["likes tea", "plays chess"]
+            store.save_personalization_profile("42", profile)
+
+            block = store.load_personalization_profile("42")["prompt_block"]["text"]
+            self.assertLessEqual(len(block), 40)
+            self.assertTrue(block.startswith("- Summary: Enjoys"))
+            store.close()
+
+            reopened = MemoryStore(
+                memory_dir,
+                storage_mode="json",
+                retrieval_mode="off",
+                prompt_max_notes=1,
+            )
+            profile = reopened.load_personalization_profile("42")
+            self.assertIn("- Notes: plays chess", profile["prompt_block"]["text"])
+            self.assertNotIn("likes tea", profile["prompt_block"]["text"])
+            self.assertIn(
+                profile["prompt_block"]["text"],
+                build_personalized_system_prompt("base", profile),
+            )
+            reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from Personalization.ProfileUpdatePolicy import (
+    TRIGGER_FORCED,
+    TRIGGER_IDLE,
+    ProfileUpdatePolicy,
+)
+
+
+def _message(role: str, content: str, at: datetime) -> dict:
+    return {"role": role, "content": content, "timestamp": at.isoformat()}
+
+
+class ProfileUpdatePolicyTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.policy = ProfileUpdatePolicy(
+            max_user_messages=50, min_new_tokens=0, idle_seconds=900
+        )
+        self.now = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+    def test_forced_call_returns_a_reason_even_without_messages(self) -> None:
+        self.assertEqual(self.policy.trigger_reason([], force=True), TRIGGER_FORCED)
+        self.assertIsNone(self.policy.trigger_reason([]))
+
+    def test_idle_gap_needs_a_pause_inside_the_backlog_on_the_reply_path(self) -> None:
+        just_now = [_message("user", "hey", self.now)]
+        self.assertIsNone(self.policy.trigger_reason(just_now, now=self.now))
+
+        after_a_break = [
+            _message("user", "morning", self.now - timedelta(hours=2)),
+            _message("user", "back again", self.now),
+        ]
+        self.assertEqual(
+            self.policy.trigger_reason(after_a_break, now=self.now), TRIGGER_IDLE
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
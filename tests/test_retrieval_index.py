@@ -0,0 +1,105 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from Personalization.RetrievalIndex import (
+    RETRIEVAL_MODE_BM25,
+    RETRIEVAL_MODE_HASHED,
+    RetrievalIndex,
+    _UserIndex,
+)
+
+
+class RetrievalIndexTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.index_dir = Path(self._temp_dir.name)
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def _index(self, mode: str, **kwargs) -> RetrievalIndex:
+        try:
+            return RetrievalIndex(self.index_dir / mode, mode=mode, **kwargs)
+        except ValueError as error:
+            self.skipTest(str(error))
+
+    def test_user_index_is_abstract(self) -> None:
+        with self.assertRaises(TypeError):
+            _UserIndex(self.index_dir)
+
+    def test_search_finds_messages_and_notes_after_reopening(self) -> None:
+        for mode in (RETRIEVAL_MODE_BM25, RETRIEVAL_MODE_HASHED):
+            with self.subTest(mode=mode):
+                index = self._index(mode)
+                index.add_messages(
+                    "u1",
+                    [
+                        {"id": 1, "role": "user", "content": "My sister Priya lives in Lisbon"},
+                        {"id": 2, "role": "assistant", "content": "That sounds nice"},
+                        {"id": 3, "role": "user", "content": "Work was stressful today"},
+                    ],
+                )
+                index.add_notes("u1", ["Allergic to peanuts"])
+                index.close()
+
+                reopened = self._index(mode)
+                hits = reopened.search("u1", "Priya in Lisbon")
+                self.assertEqual([hit.message_id for hit in hits][:1], [1])
+                self.assertEqual(reopened.search("u1", "Priya Lisbon", max_message_id=0), [])
+                self.assertEqual(
+                    [hit.text for hit in reopened.search("u1", "peanuts allergic")],
+                    ["Allergic to peanuts"],
+                )
+                self.assertEqual(reopened.search("u2", "Priya Lisbon"), [])
+
+    def test_concurrent_writes_stay_aligned_across_cache_evictions(self) -> None:
+        index = self._index(
+            RETRIEVAL_MODE_HASHED, cache_max_users=1, dimensions=4096
+        )
+        user_ids = ["u1", "u2", "u3"]
+        writes_per_thread = 40
+
+        def write(thread_number: int) -> None:
+            for offset in range(writes_per_thread):
+                user_id = user_ids[(thread_number + offset) % len(user_ids)]
+                message_id = thread_number * writes_per_thread + offset + 1
+                index.add_message(
+                    user_id,
+                    {"id": message_id, "role": "user", "content": f"token{message_id} word"},
+                )
+
+        threads = [threading.Thread(target=write, args=(number,)) for number in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Per-user locks are dropped once nothing holds or waits on them.
+        self.assertEqual(len(index._user_locks), 0)
+        index.close()
+
+        total_rows = 0
+        for user_id in user_ids:
+            user_dir = self.index_dir / RETRIEVAL_MODE_HASHED / user_id
+            snippet_count = len(
+                (user_dir / "snippets.jsonl").read_bytes().splitlines()
+            )
+            row_count = (user_dir / "rows.i64").stat().st_size // 16
+            self.assertEqual(row_count, snippet_count)
+            total_rows += row_count
+        self.assertEqual(total_rows, 6 * writes_per_thread)
+
+        reopened = self._index(RETRIEVAL_MODE_HASHED, dimensions=4096)
+        for message_id in (1, 77, 240):
+            hits = [
+                hit
+                for user_id in user_ids
+                for hit in reopened.search(user_id, f"token{message_id}", k=1)
+            ]
+            self.assertEqual([hit.message_id for hit in hits], [message_id])
+            self.assertEqual(hits[0].text, f"token{message_id} word")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from Personalization.DurableWrites import (
+    FSYNC_ALWAYS,
+    FSYNC_BATCHED,
+    GroupCommitWriter,
+)
+from Personalization.StorageBackends import (
+    JsonFileBackend,
+    SUPPORTED_STORAGE_MODES,
+    build_memory_backend,
+)
+
+
+class StorageBackendRoundTripTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.memory_dir = Path(self._temp_dir.name)
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_messages_and_profile_survive_reopening(self) -> None:
+        for mode in SUPPORTED_STORAGE_MODES:
+            with self.subTest(mode=mode):
+                memory_dir = self.memory_dir / mode
+                backend = build_memory_backend(mode, memory_dir)
+                first = backend.append_message("u1", {"role": "user", "content": "hi"})
+                second = backend.append_message(
+                    "u1", {"role": "assistant", "content": "hello"}
+                )
+                backend.save_profile("u1", {"summary": "likes tea"})
+                backend.close()
+
+                backend = build_memory_backend(mode, memory_dir)
+                self.assertEqual(second["id"], first["id"] + 1)
+                self.assertEqual(
+                    [message["content"] for message in backend.tail_messages("u1", 10)],
+                    ["hi", "hello"],
+                )
+                self.assertEqual(
+                    [message["id"] for message in backend.messages_after("u1", first["id"])],
+                    [second["id"]],
+                )
+                self.assertEqual(backend.count_messages("u1"), 2)
+                self.assertEqual(backend.load_profile("u1"), {"summary": "likes tea"})
+                self.assertEqual(backend.list_user_ids(), ["u1"])
+                backend.close()
+
+    def test_reset_clears_messages_without_reusing_ids(self) -> None:
+        for mode in SUPPORTED_STORAGE_MODES:
+            with self.subTest(mode=mode):
+                backend = build_memory_backend(mode, self.memory_dir / mode)
+                before = backend.append_message("u1", {"role": "user", "content": "old"})
+                backend.reset_messages("u1")
+                self.assertEqual(backend.tail_messages("u1", 10), [])
+                self.assertEqual(backend.count_messages("u1"), 0)
+                after = backend.append_message("u1", {"role": "user", "content": "new"})
+                self.assertGreater(after["id"], before["id"])
+                backend.close()
+
+    def test_default_writer_group_commits(self) -> None:
+        writer = GroupCommitWriter()
+        self.assertEqual(writer.fsync_policy, FSYNC_BATCHED)
+        self.assertTrue(writer.buffered)
+        writer.close()
+
+    def test_batched_writer_coalesces_writes_within_a_window(self) -> None:
+        writer = GroupCommitWriter(fsync_policy=FSYNC_BATCHED, window_seconds=60)
+        backend = JsonFileBackend(self.memory_dir, writer=writer)
+        backend.save_profile("u1", {"summary": "first"})
+        backend.save_profile("u1", {"summary": "second"})
+        self.assertEqual(backend.load_profile("u1"), {"summary": "second"})
+        backend.close()
+
+        stats = writer.stats()
+        self.assertEqual((stats["coalesced"], stats["flushes"]), (1, 1))
+        reopened = JsonFileBackend(self.memory_dir)
+        self.assertEqual(reopened.load_profile("u1"), {"summary": "second"})
+
+    def test_always_policy_writes_through(self) -> None:
+        writer = GroupCommitWriter(fsync_policy=FSYNC_ALWAYS)
+        backend = JsonFileBackend(self.memory_dir, writer=writer)
+        backend.save_profile("u1", {"summary": "on disk"})
+        self.assertTrue((self.memory_dir / "personalization_profile" / "u1.json").exists())
+        self.assertEqual(writer.stats()["pending"], 0)
+        backend.close()
+
+    def test_batched_writer_flushes_on_close(self) -> None:
+        writer = GroupCommitWriter(fsync_policy=FSYNC_BATCHED, window_seconds=60)
+        backend = JsonFileBackend(self.memory_dir, writer=writer)
+        backend.save_profile("u1", {"summary": "buffered"})
+        self.assertEqual(writer.stats()["pending"], 1)
+        backend.close()
+
+        reopened = JsonFileBackend(self.memory_dir)
+        self.assertEqual(reopened.load_profile("u1"), {"summary": "buffered"})
+        self.assertEqual(writer.stats()["pending"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
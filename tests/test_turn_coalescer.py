@@ -0,0 +1,151 @@
+import asyncio
+import unittest
+from dataclasses import dataclass
+
+from Bots.TurnCoalescer import TurnCoalescer
+
+
+@dataclass(eq=False)
+class _Message:
+    message_id: int
+    text: str
+
+
+class _Conversation:
+    def __init__(self) -> None:
+        self.history: list[tuple[str, str]] = []
+        self.contexts: list[list[tuple[str, str]]] = []
+        self.release = asyncio.Event()
+        self._next_message_id = 1
+
+    def message(self, text: str) -> _Message:
+        message = _Message(self._next_message_id, text)
+        self._next_message_id += 1
+        return message
+
+    def coalescer(self, **kwargs) -> TurnCoalescer[_Message]:
+        return TurnCoalescer(
+            self.run_turn,
+            item_key=lambda message: message.message_id,
+            begin_turn=self.begin_turn,
+            **kwargs,
+        )
+
+    async def begin_turn(
+        self, user_id: int, messages: list[_Message]
+    ) -> list[tuple[str, str]]:
+        # Stores the new messages and reads the context in one step.
+        self.history.extend(("user", message.text) for message in messages)
+        return list(self.history)
+
+    async def run_turn(
+        self, user_id: int, messages: list[_Message], context: list[tuple[str, str]]
+    ) -> None:
+        self.contexts.append(context)
+        await self.release.wait()
+        texts = " + ".join(message.text for message in messages)
+        self.history.append(("assistant", f"reply to {texts}"))
+
+
+class TurnCoalescerOrderingTest(unittest.TestCase):
+    def test_message_sent_during_a_turn_is_stored_after_its_reply(self) -> None:
+        async def scenario() -> _Conversation:
+            conversation = _Conversation()
+            coalescer = conversation.coalescer(quiet_window_seconds=0)
+            coalescer.submit(1, conversation.message("first"))
+            await asyncio.sleep(0.01)
+            coalescer.submit(1, conversation.message("second during"))
+            await asyncio.sleep(0.01)
+            conversation.release.set()
+            await asyncio.sleep(0.05)
+            await coalescer.aclose()
+            return conversation
+
+        conversation = asyncio.run(scenario())
+        self.assertEqual(
+            conversation.history,
+            [
+                ("user", "first"),
+                ("assistant", "reply to first"),
+                ("user", "second during"),
+                ("assistant", "reply to second during"),
+            ],
+        )
+        # The follow-up turn sees a context that ends on the new user message.
+        self.assertEqual(conversation.contexts[-1][-1], ("user", "second during"))
+
+    def test_cancelled_batch_is_not_stored_twice(self) -> None:
+        async def scenario() -> _Conversation:
+            conversation = _Conversation()
+            coalescer = conversation.coalescer(
+                quiet_window_seconds=0, cancel_in_flight=True
+            )
+            coalescer.submit(1, conversation.message("first"))
+            await asyncio.sleep(0.01)
+            coalescer.submit(1, conversation.message("second"))
+            await asyncio.sleep(0.01)
+            conversation.release.set()
+            await asyncio.sleep(0.05)
+            await coalescer.aclose()
+            return conversation
+
+        conversation = asyncio.run(scenario())
+        self.assertEqual(
+            conversation.history,
+            [
+                ("user", "first"),
+                ("user", "second"),
+                ("assistant", "reply to first + second"),
+            ],
+        )
+
+    def test_repeated_text_is_stored_once_per_message(self) -> None:
+        async def scenario() -> _Conversation:
+            conversation = _Conversation()
+            coalescer = conversation.coalescer(
+                quiet_window_seconds=0, cancel_in_flight=True
+            )
+            coalescer.submit(1, conversation.message("ok"))
+            await asyncio.sleep(0.01)
+            coalescer.submit(1, conversation.message("ok"))
+            await asyncio.sleep(0.01)
+            conversation.release.set()
+            await asyncio.sleep(0.05)
+            await coalescer.aclose()
+            return conversation
+
+        conversation = asyncio.run(scenario())
+        self.assertEqual(
+            conversation.history,
+            [("user", "ok"), ("user", "ok"), ("assistant", "reply to ok + ok")],
+        )
+
+    def test_default_window_starts_a_single_message_turn_at_once(self) -> None:
+        async def scenario() -> _Conversation:
+            conversation = _Conversation()
+            coalescer = conversation.coalescer()
+            coalescer.submit(1, conversation.message("hello"))
+            await asyncio.sleep(0.01)
+            started = list(conversation.contexts)
+            conversation.release.set()
+            await coalescer.aclose()
+            self.assertEqual(started, [[("user", "hello")]])
+            return conversation
+
+        asyncio.run(scenario())
+
+    def test_pending_messages_are_stored_on_close(self) -> None:
+        async def scenario() -> _Conversation:
+            conversation = _Conversation()
+            coalescer = conversation.coalescer(quiet_window_seconds=60)
+            coalescer.submit(1, conversation.message("never answered"))
+            await coalescer.aclose()
+            return conversation
+
+        conversation = asyncio.run(scenario())
+        self.assertEqual(conversation.history, [("user", "never answered")])
+        self.assertEqual(conversation.contexts, [])
+
+
+if __name__ == "__main__":
+    unittest.main()